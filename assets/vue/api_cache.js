@@ -0,0 +1,37 @@
+import axios from 'axios';
+
+const responseCache = new Map();
+
+/*
+ * Performs GET request sending ETag of the previously received response,
+ * so unchanged data is not transferred again (server responds with 304)
+ * and the cached data is returned instead.
+ */
+function getRevalidated (url, config = {}) {
+  const cacheKey = axios.getUri({ url, params: config.params });
+  const cached = responseCache.get(cacheKey);
+  const headers = Object.assign({}, config.headers);
+
+  if (cached) {
+    headers['If-None-Match'] = cached.etag;
+  }
+
+  return axios.get(url, Object.assign({}, config, {
+    headers,
+    validateStatus: (status) => (
+      (status >= 200 && status < 300) || status === 304
+    ),
+  })).then((response) => {
+    if (response.status === 304 && cached) {
+      response.data = cached.data;
+    } else if (response.headers.etag) {
+      responseCache.set(
+        cacheKey, { etag: response.headers.etag, data: response.data }
+      );
+    }
+    return response;
+  });
+}
+
+
+export { getRevalidated };
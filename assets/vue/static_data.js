@@ -1,6 +1,8 @@
 const apiUrls = {
   institutions: '/api/institutions/',
+  institutionsCompare: '/api/institutions/compare/',
   policyCategories: '/api/policy-categories/',
+  rankingBootstrap: '/api/ranking-bootstrap/',
   messageTemplates: '/api/message-templates/',
   contactMessage: '/api/contact/message/',
 };
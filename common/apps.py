@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CommonConfig(AppConfig):
     name = 'common'
+
+    def ready(self):
+        from . import placeholders
+        placeholders.connect_plugin_receivers()
@@ -0,0 +1,15 @@
+from autoslug import AutoSlugField
+
+
+class BulkAutoSlugField(AutoSlugField):
+    """
+    AutoSlugField which keeps slugs of new instances marked by
+    "_slug_is_unique" attribute. Bulk importers ensure uniqueness of slugs
+    of the whole chunk in memory, the check of AutoSlugField would cost
+    query per instance.
+    """
+
+    def pre_save(self, instance, add):
+        if add and getattr(instance, '_slug_is_unique', False):
+            return self.value_from_object(instance)
+        return super().pre_save(instance, add)
@@ -1,14 +1,51 @@
 import codecs
+import copy
 import csv
 import io
 import zipfile
 import re
+from collections import namedtuple
+
 import markdown
 
 from PIL import UnidentifiedImageError
 
 from django.db import transaction
 from django.core.validators import URLValidator
+from django.utils import timezone
+
+
+def index_by_key(objects, get_key):
+    """
+    Returns dictionary of objects by key, objects sharing a key are stored
+    in a list, so the ambiguity can be reported when the key is looked up.
+    """
+    index = {}
+    for obj in objects:
+        key = get_key(obj)
+        found = index.get(key)
+        if found is None:
+            index[key] = obj
+        elif isinstance(found, list):
+            found.append(obj)
+        else:
+            index[key] = [found, obj]
+    return index
+
+
+def count_csv_rows(csv_file, delimiter=';'):
+    """
+    Returns number of rows of CSV file without the header (None when
+    the file can not be read).
+    """
+    csv_file.seek(0)
+    reader = csv.reader(
+        codecs.iterdecode(csv_file, 'utf-8-sig'), delimiter=delimiter
+    )
+    try:
+        return max(sum(1 for _row in reader) - 1, 0)
+    except (UnicodeDecodeError, csv.Error):
+        return None
 
 
 class CsvImportError(Exception):
@@ -59,46 +96,73 @@ class CsvColumnBase(object):
         self.save_globally = save_globally
         self.do_assign = do_assign
 
-    def is_valid(self, value):
-        if self.required and not (value and value.strip()):
-            return False, 'Value is required.'
+    def get_validator(self):
+        """
+        Returns function returning error message for invalid raw value
+        (or None), specialized for the column settings.
+        """
+        required = self.required
+        is_number = self.data_type == self.DT_NUMBER
+
+        def validate(value):
+            if required and not (value and value.strip()):
+                return 'Value is required.'
+            # Links are not validated, URL validation is to strict.
+            if is_number and value:
+                try:
+                    int(value)
+                except ValueError:
+                    return 'Value is not a number.'
+            return None
 
-        if self.data_type == self.DT_LINK:
-            pass  # URL validation is to strict.
-            # try:
-            #     self.url_validator(value)
-            # except ValidationError as e:
-            #     return False, e.message
-        elif self.data_type == self.DT_NUMBER and value:
-            try:
-                int(value)
-            except ValueError:
-                return False, 'Value is not a number.'
+        return validate
 
-        return True, ''
+    def is_valid(self, value):
+        error = self.get_validator()(value)
+        return error is None, error or ''
 
-    def process_value(self, raw_value):
+    def get_value_processor(self):
         """
-        Cleans raw value according to specified data_type
-        :param raw_value: value to be processed
-        :return: processed value
+        Returns function cleaning raw value according to specified data_type.
         """
-        value = raw_value.strip() if isinstance(raw_value, str) else raw_value
+        default = self.default
 
-        if self.data_type == self.DT_NUMBER:
-            value = int(value) if value else self.default
-        elif self.data_type == self.DT_LINK:
-            if value and not (
-                value.startswith('http://') or value.startswith('https://')
-            ):
+        def process_text(raw_value):
+            if isinstance(raw_value, str):
+                return raw_value.strip()
+            return raw_value
+
+        def process_number(raw_value):
+            value = process_text(raw_value)
+            return int(value) if value else default
+
+        def process_link(raw_value):
+            value = process_text(raw_value)
+            if value and not value.startswith(('http://', 'https://')):
                 value = f'https://{value}'
+            return value
 
-        elif self.data_type == self.DT_MARKDOWN:
-            value = markdown.markdown(
-                value, extensions=['nl2br', 'sane_lists', 'smarty']
+        if self.data_type == self.DT_NUMBER:
+            return process_number
+        if self.data_type == self.DT_LINK:
+            return process_link
+        if self.data_type == self.DT_MARKDOWN:
+            # converter is reused, creating it for every value is expensive
+            converter = markdown.Markdown(
+                extensions=['nl2br', 'sane_lists', 'smarty']
             )
+            return lambda raw_value: converter.reset().convert(
+                process_text(raw_value)
+            )
+        return process_text
 
-        return value
+    def process_value(self, raw_value):
+        """
+        Cleans raw value according to specified data_type
+        :param raw_value: value to be processed
+        :return: processed value
+        """
+        return self.get_value_processor()(raw_value)
 
     def assign_data(self, value, instance, global_data):
         """
@@ -113,6 +177,14 @@ class CsvColumnBase(object):
         raise NotImplementedError(
             'This method should be implemented in derived class.')
 
+    def assign_bulk_data(self, value, instance, global_data, chunk):
+        """
+        Performs assigning cleaned value in bulk mode, where objects which
+        would be saved have to be collected in the chunk instead.
+        :param chunk: [CsvImportChunk] chunk of the currently processed row
+        """
+        self.assign_data(value, instance, global_data)
+
 
 class CsvFieldColumn(CsvColumnBase):
     """
@@ -161,6 +233,8 @@ class CsvFKColumn(CsvColumnBase):
     """
     This column sets foreign key to related model based on the value.
     """
+    # lookups resolved in memory (iexact compares casefolded values)
+    MEMORY_LOOKUPS = ('exact', 'iexact')
 
     def __init__(
         self,
@@ -176,14 +250,50 @@ class CsvFKColumn(CsvColumnBase):
         self.related_model = related_model
         self.key_field_name = key_field_name
         self.key_field_lookup = key_field_lookup
+        self.lookup = None
 
-    def assign_data(self, value, instance, global_data):
-        try:
-            related = self.related_model.objects.get(
+    def get_lookup_key(self, value):
+        value = str(value)
+        return value.casefold() if self.key_field_lookup == 'iexact' else value
+
+    def load_lookup(self):
+        """
+        Loads all related instances by lookup key (only primary and key
+        fields are loaded, other fields are deferred).
+        """
+        return index_by_key(
+            self.related_model.objects.only('pk', self.key_field_name),
+            lambda obj: self.get_lookup_key(
+                getattr(obj, self.key_field_name)
+            )
+        )
+
+    def get_related(self, value):
+        """
+        Returns related instance matching the value. Exact and iexact
+        lookups are resolved from table loaded on the first call (columns
+        are copied per importer, so the table lives for single import),
+        other lookups query the database.
+        """
+        if self.key_field_lookup not in self.MEMORY_LOOKUPS:
+            return self.related_model.objects.get(
                 **{
                     f'{self.key_field_name}__{self.key_field_lookup}': value
                 }
             )
+
+        if self.lookup is None:
+            self.lookup = self.load_lookup()
+        related = self.lookup.get(self.get_lookup_key(value))
+        if related is None:
+            raise self.related_model.DoesNotExist
+        if isinstance(related, list):
+            raise self.related_model.MultipleObjectsReturned
+        return related
+
+    def assign_data(self, value, instance, global_data):
+        try:
+            related = self.get_related(value)
         except self.related_model.DoesNotExist:
             raise RowCsvImportError(
                 f'{self.related_model.__name__} instance with '
@@ -226,28 +336,34 @@ class CsvRelatedColumn(CsvColumnBase):
         self.separator = separator
         self.related_data = related_data or {}
 
-    def process_value(self, value):
+    def get_value_processor(self):
         """
-        Always returns list of values, even if empty or with single element.
+        Returns function which always returns list of values, even if empty
+        or with single element.
         """
-        value = super().process_value(value)
-        if not value:
-            return []
-        if self.many:
-            values_list = value.split(self.separator)
-        else:
-            values_list = [value]
-
-        processed_list = []
-        for val in values_list:
-            data = self.related_data.copy()
-            data[self.field_name] = super().process_value(val)
-            processed_list.append({
-                'model': self.related_model,
-                'fk_name': self.fk_name,
-                'data': data
-            })
-        return processed_list
+        process = super().get_value_processor()
+
+        def process_related(raw_value):
+            value = process(raw_value)
+            if not value:
+                return []
+            if self.many:
+                values_list = value.split(self.separator)
+            else:
+                values_list = [value]
+
+            processed_list = []
+            for val in values_list:
+                data = self.related_data.copy()
+                data[self.field_name] = process(val)
+                processed_list.append({
+                    'model': self.related_model,
+                    'fk_name': self.fk_name,
+                    'data': data
+                })
+            return processed_list
+
+        return process_related
 
     def assign_data(self, value, instance, global_data):
         """
@@ -267,6 +383,76 @@ class CsvRelatedColumn(CsvColumnBase):
         if self.save_globally:
             global_data[self.name] = related_objs
 
+    def assign_bulk_data(self, value, instance, global_data, chunk):
+        """
+        Collects unsaved related objects in the chunk, they are created
+        (with foreign key set) after the instance is saved.
+        """
+        related_objs = []
+        for item in [i for i in value if i]:
+            related_obj = item['model'](**item['data'])
+            chunk.add_related(instance, self, related_obj)
+            related_objs.append(related_obj)
+
+        if self.save_globally:
+            global_data[self.name] = related_objs
+
+
+class CsvImportChunk(object):
+    """
+    Instances of rows processed in bulk mode and their related objects,
+    which are written to database together.
+    """
+
+    def __init__(self):
+        self.instances = {}
+        self.related = {}
+
+    def __len__(self):
+        return len(self.instances)
+
+    def add(self, instance):
+        """
+        Adds instance of the processed row. Related objects collected for
+        the same instance by an earlier row are discarded, as the row
+        replaces them.
+        """
+        self.instances[id(instance)] = instance
+        self.related[id(instance)] = []
+
+    def add_related(self, instance, column, related_obj):
+        self.related[id(instance)].append((column, related_obj))
+
+    def get_related_objects(self):
+        """
+        Returns dictionary of related objects by model with foreign keys
+        set to their (already saved) instances.
+        """
+        objects = {}
+        for key, items in self.related.items():
+            instance = self.instances[key]
+            for column, related_obj in items:
+                setattr(related_obj, column.fk_name, instance)
+                objects.setdefault(column.related_model, []).append(
+                    related_obj
+                )
+        return objects
+
+
+# Execution plan of CsvImporter compiled from CSV header.
+# cells - tuple of (index, column, validate, process) for every recognized
+#  column of the header, see CsvColumnBase.get_validator() and
+#  CsvColumnBase.get_value_processor()
+# stages - tuple of CsvImportStage in order of priority
+# key_column - column identifying existing instances or None
+CsvImportPlan = namedtuple('CsvImportPlan', ['cells', 'stages', 'key_column'])
+
+# Columns and processors of single priority, save_instance - the instance
+# is saved after the stage (outside of bulk mode).
+CsvImportStage = namedtuple(
+    'CsvImportStage', ['priority', 'columns', 'processors', 'save_instance']
+)
+
 
 class CsvImporter(object):
     model = None
@@ -275,14 +461,32 @@ class CsvImporter(object):
     processors = {}
     # instance will be saved after processing columns with this priority
     save_instance_at_priority = [5]
+    # In bulk mode existing instances are loaded by key at once and rows
+    # are written in chunks of chunk_size with bulk queries. Model save()
+    # is not called and model signals are not sent (see pre_chunk_save
+    # and post_chunk_save).
+    bulk = False
+    chunk_size = 500
+    # functions called with list of instances of each chunk in bulk mode
+    # after the instances are saved, before related objects are created
+    chunk_processors = []
+    # model fields set outside of columns, saved in bulk mode
+    bulk_update_fields = []
+    # number of invalid rows reported before the import is stopped, rows
+    # after the first error are only processed to report their errors
+    max_errors = 1
 
     def __init__(self):
         self.header = None
+        self.plan = None
         self.global_data = {}
+        self.errors = []
+        self.instances_by_key = None
+        # columns may keep state of single import (e.g. lookup tables)
+        self.columns = [copy.copy(column) for column in self.columns]
 
-    @classmethod
-    def get_column_by_name(cls, name):
-        for column in cls.columns:
+    def get_column_by_name(self, name):
+        for column in self.columns:
             if column.name.lower() == name.lower():
                 return column
         return None
@@ -293,14 +497,198 @@ class CsvImporter(object):
         """
         pass
 
+    def pre_chunk_save(self, instances):
+        """
+        Override this method to prepare instances of chunk before they are
+        saved in bulk mode (e.g. to set fields computed by model save()).
+        """
+        pass
+
+    def post_chunk_save(self, instances, created):
+        """
+        Override this method to perform work of model signals skipped
+        in bulk mode.
+        :param instances: [list of Model] saved instances of the chunk
+        :param created: [list of Model] newly created instances of the chunk
+        """
+        pass
+
+    def load_instances(self):
+        """
+        Loads existing instances by key for bulk mode. Instances sharing
+        a key are stored as list, so their rows can be reported.
+        """
+        key_column = self.plan.key_column
+        if key_column is None:
+            return
+        self.instances_by_key = index_by_key(
+            self.model.objects.all(),
+            lambda instance: getattr(instance, key_column.field_name)
+        )
+
+    def get_instance(self, cleaned_data, override_existing=False):
+        """
+        Returns existing instance matching the key column value (if it may
+        be overridden) or a new instance.
+        """
+        key_column = self.plan.key_column
+        if key_column is None:
+            return self.model()
+
+        key = cleaned_data[key_column.name]
+        if self.instances_by_key is not None:
+            instance = self.instances_by_key.get(key)
+            if isinstance(instance, list):
+                raise self.model.MultipleObjectsReturned(
+                    f'get() returned more than one {self.model.__name__} '
+                    f'-- it returned {len(instance)}!'
+                )
+        else:
+            try:
+                instance = self.model.objects.get(
+                    **{key_column.field_name: key}
+                )
+            except self.model.DoesNotExist:
+                instance = None
+
+        if instance:
+            # Instance already present in database
+            if not override_existing:
+                raise RowCsvImportError(
+                    f'Institution with {key_column.field_name} '
+                    f'"{key}" '
+                    'already exists.'
+                )
+        else:
+            # New instance has to be created
+            instance = self.model()
+            if self.instances_by_key is not None:
+                self.instances_by_key[key] = instance
+        return instance
+
+    def get_bulk_update_fields(self):
+        """
+        Returns names of fields saved for existing instances in bulk mode:
+        fields assigned by columns, bulk_update_fields and fields updated
+        automatically on save.
+        """
+        fields = list(self.bulk_update_fields)
+        for column in self.columns:
+            field_name = getattr(column, 'field_name', None)
+            if (
+                column.do_assign and field_name and '__' not in field_name and
+                not isinstance(column, CsvRelatedColumn)
+            ):
+                fields.append(field_name)
+        for field in self.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                fields.append(field.name)
+        return list(dict.fromkeys(fields))
+
+    def load_created_pks(self, created):
+        """
+        Sets primary keys of bulk created instances if the database does
+        not return them (instances are found by their keys, so they stay
+        unset without key column).
+        """
+        key_column = self.plan.key_column
+        if key_column is None or all(
+            instance.pk is not None for instance in created
+        ):
+            return
+        field_name = key_column.field_name
+        pks = dict(self.model.objects.filter(**{
+            f'{field_name}__in': [
+                getattr(instance, field_name) for instance in created
+            ]
+        }).values_list(field_name, 'pk'))
+        for instance in created:
+            instance.pk = pks[getattr(instance, field_name)]
+            instance._state.adding = False
+
+    def save_chunk(self, chunk):
+        """
+        Writes instances of the chunk and their related objects with
+        constant number of bulk queries.
+        """
+        instances = list(chunk.instances.values())
+        if not instances:
+            return
+        self.pre_chunk_save(instances)
+
+        created, updated = [], []
+        for instance in instances:
+            (created if instance.pk is None else updated).append(instance)
+        if created:
+            self.model.objects.bulk_create(created)
+            self.load_created_pks(created)
+        if updated:
+            now = timezone.now()
+            for field in self.model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for instance in updated:
+                        setattr(instance, field.attname, now)
+            self.model.objects.bulk_update(
+                updated, self.get_bulk_update_fields()
+            )
+
+        for processor_fn in self.chunk_processors:
+            processor_fn(instances, self.global_data)
+        related = chunk.get_related_objects()
+        if related and any(instance.pk is None for instance in created):
+            raise ConfigCsvImportError(
+                'Related columns in bulk mode require key_column_name '
+                'on this database.'
+            )
+        for model, related_objs in related.items():
+            model.objects.bulk_create(related_objs)
+
+        self.post_chunk_save(instances, created)
+
+    def compile_plan(self):
+        """
+        Returns CsvImportPlan for the current header, so rows are processed
+        without looking up columns, sorting priorities and dispatching on
+        data types again.
+        """
+        cells = tuple(
+            (i, column, column.get_validator(), column.get_value_processor())
+            for i, column in enumerate(self.header)
+            if isinstance(column, CsvColumnBase)
+        )
+
+        priorities = {}
+        for column in self.columns:
+            priorities.setdefault(column.priority, []).append(column)
+        for priority in self.processors:
+            priorities.setdefault(priority, [])
+        stages = tuple(
+            CsvImportStage(
+                priority=priority,
+                columns=tuple(columns),
+                processors=tuple(self.processors.get(priority, ())),
+                save_instance=priority in self.save_instance_at_priority
+            )
+            for priority, columns in sorted(priorities.items())
+        )
+
+        key_column = None
+        if self.key_column_name and self.key_column_name != 'dummy':
+            key_column = self.get_column_by_name(self.key_column_name)
+        return CsvImportPlan(cells, stages, key_column)
+
     def process_header(self, header_row):
         """
         Setting self.header to contain corresponding columns if definition
-         is found or otherwise the value of the column as string from csv file.
+         is found or otherwise the value of the column as string from csv file
+         and compiles self.plan for it.
         """
-        self.header = []
-        for i, name in enumerate(header_row):
-            self.header.append(self.get_column_by_name(name) or name)
+        columns_by_name = {}
+        for column in self.columns:
+            columns_by_name.setdefault(column.name.lower(), column)
+        self.header = [
+            columns_by_name.get(name.lower(), name) for name in header_row
+        ]
 
         # checking if all required columns are present in csv file
         for column in self.columns:
@@ -309,31 +697,34 @@ class CsvImporter(object):
                     f'Required column "{column.name}" missing in csv header row.'
                 )
 
+        self.plan = self.compile_plan()
+
     def clean_row(self, row_index, row):
         """
         Tries to validate values existing in the row, if corresponding column
          is defined. Otherwise ignore the value.
         """
         cleaned_data = {}
-
-        for i, value in enumerate(row):
-            if i < len(self.header):
-                column = self.header[i]
-
-                if isinstance(column, CsvColumnBase):
-                    is_valid, error = column.is_valid(value)
-                    if not is_valid:
-                        raise RowCsvImportError(
-                            f'Row {row_index + 1} has invalid value "{value}" '
-                            f'in column {i} "{self.header[i].name}". '
-                            f'Error: {error}'
-                        )
-
-                    cleaned_data[column.name] = column.process_value(value)
+        row_length = len(row)
+
+        for i, column, validate, process in self.plan.cells:
+            if i >= row_length:
+                break
+            value = row[i]
+            error = validate(value)
+            if error is not None:
+                raise RowCsvImportError(
+                    f'Row {row_index + 1} has invalid value "{value}" '
+                    f'in column {i} "{column.name}". '
+                    f'Error: {error}'
+                )
+            cleaned_data[column.name] = process(value)
 
         return cleaned_data
 
-    def process_row(self, row_index, row, override_existing=False):
+    def process_row(
+        self, row_index, row, override_existing=False, chunk=None
+    ):
         """
         Performs data assign for single CSV row.
         :param row_index: [int] number of the row in CSV file
@@ -341,67 +732,95 @@ class CsvImporter(object):
         :param override_existing: [bool] should existing model instances
          be overridden? Works only when key_column_name is set on CsvImporter
          derived class
+        :param chunk: [CsvImportChunk] chunk collecting the instance instead
+         of saving it (bulk mode)
         :return: [Model] updated model instance
         """
         cleaned_data = self.clean_row(row_index, row)
+        instance = self.get_instance(cleaned_data, override_existing)
+        global_data = self.global_data
+        if chunk is not None:
+            chunk.add(instance)
+
+        for stage in self.plan.stages:
+            for column in stage.columns:
+                if chunk is None:
+                    column.assign_data(
+                        cleaned_data[column.name], instance, global_data
+                    )
+                else:
+                    column.assign_bulk_data(
+                        cleaned_data[column.name], instance, global_data,
+                        chunk
+                    )
 
-        # Trying to get existing instance
-        if self.key_column_name and self.key_column_name != 'dummy':
-            key_column = self.get_column_by_name(self.key_column_name)
-            try:
-                instance = self.model.objects.get(
-                    **{key_column.field_name: cleaned_data[key_column.name]}
-                )
-            except self.model.DoesNotExist:
-                instance = None
-        else:
-            key_column = None
-            instance = None
+            for processor_fn in stage.processors:
+                processor_fn(instance, global_data)
 
-        if instance:
-            # Instance already present in database
-            if not override_existing:
-                raise RowCsvImportError(
-                    f'Institution with {key_column.field_name} '
-                    f'"{cleaned_data[key_column.name]}" '
-                    'already exists.'
-                )
-        else:
-            # New instance has to be created
-            instance = self.model()
+            if chunk is None and stage.save_instance:
+                instance.save()
 
-        priorities = {}
-        for column in self.columns:
-            if column.priority not in priorities:
-                priorities[column.priority] = []
-            priorities[column.priority].append(column)
+        return instance
 
-        for priority, _processor in self.processors.items():
-            if priority not in priorities:
-                priorities[priority] = []
+    def add_row_error(self, error):
+        """
+        Records error of invalid row, raises it when max_errors is reached.
+        """
+        self.errors.append(str(error))
+        if len(self.errors) >= self.max_errors:
+            raise error
 
-        priorities = dict(sorted(priorities.items()))
+    def import_rows(self, rows, override_existing=False, progress=None):
+        """
+        Processes rows of CSV file, in chunks in bulk mode.
+        :param rows: [iterable] pairs of row number and row data
+        :param progress: [callable] called with number of processed rows
+         after every chunk_size rows
+        :return: [list of Model] list of updated instances
+        """
+        instances = []
+        chunk = CsvImportChunk() if self.bulk else None
+        if self.bulk:
+            self.load_instances()
 
-        for priority, columns in priorities.items():
-            for column in columns:
-                column.assign_data(
-                    cleaned_data[column.name], instance, self.global_data
+        row_count = 0
+        for row_count, (row_index, row) in enumerate(rows, start=1):
+            try:
+                instance = self.process_row(
+                    row_index, row, override_existing, chunk
                 )
+            except RowCsvImportError as err:
+                self.add_row_error(err)
+            else:
+                instances.append(instance)
+
+            if row_count % self.chunk_size == 0:
+                if chunk is not None:
+                    # chunks are dropped after an error, the import fails
+                    if not self.errors:
+                        self.save_chunk(chunk)
+                    chunk = CsvImportChunk()
+                if progress is not None:
+                    progress(row_count)
+
+        if self.errors:
+            raise RowCsvImportError(
+                f'{self.errors[0]} ({len(self.errors)} invalid rows)'
+            )
+        if chunk is not None:
+            self.save_chunk(chunk)
+        if progress is not None:
+            progress(row_count)
+        return instances
 
-            if priority in self.processors:
-                for processor_fn in self.processors[priority]:
-                    processor_fn(instance, self.global_data)
-
-            if priority in self.save_instance_at_priority:
-                instance.save()
-
-        return instance
-
-    def import_data(self, csv_file, override_existing=False, delimiter=';'):
+    def import_data(
+        self, csv_file, override_existing=False, delimiter=';', progress=None
+    ):
         """
         Main method called to perform import operation.
         :param csv_file: opened CSV file containing data to be imported
         :param override_existing: [bool] should existing records be overridden?
+        :param progress: [callable] called with number of processed rows
         :return: [list of Model] list of updated instances
         """
         if override_existing and not self.key_column_name:
@@ -418,19 +837,18 @@ class CsvImporter(object):
         header_row = next(reader, None)
         self.process_header(header_row)
 
-        instances = []
         with transaction.atomic():
             self.pre_import(override_existing=override_existing)
             try:
-                for row_index, row in enumerate(reader, start=1):
-                    instance = self.process_row(
-                        row_index, row, override_existing
-                    )
-                    instances.append(instance)
+                instances = self.import_rows(
+                    enumerate(reader, start=1), override_existing, progress
+                )
             except UnicodeDecodeError as err:
                 raise ConfigCsvImportError(
                     'The file must be UTF-8 encoded. Details: ' + str(err)
                 )
+            except CsvImportError:
+                raise
             except Exception as err:
                 raise ConfigCsvImportError(
                     'Unexpected exception occurred. Details: ' + str(err)
@@ -459,14 +877,22 @@ class ZipImporter(object):
         assert isinstance(allowed_ext, (list, tuple))
         self.allowed_ext = allowed_ext
 
-    def import_data(self, zip_file):
+    def import_data(self, zip_file, progress=None):
+        """
+        Returns number of saved files, list of files which could not be
+        processed and list of files without matching model instance.
+        :param progress: [callable] called with number of processed files
+        """
         imported_count = 0
         errors_list = []
         unrecog_list = []
 
         with zipfile.ZipFile(zip_file, 'r') as archive:
+            names = archive.namelist()
 
-            for raw_name in archive.namelist():
+            for file_index, raw_name in enumerate(names):
+                if progress is not None:
+                    progress(file_index)
                 if self.allowed_ext:
                     pattern = r'\.({})$'.format('|'.join(self.allowed_ext))
                     name = re.sub(pattern, '', raw_name)
@@ -492,4 +918,6 @@ class ZipImporter(object):
                     else:
                         imported_count += 1
 
+        if progress is not None:
+            progress(len(names))
         return imported_count, errors_list, unrecog_list
@@ -1,7 +1,67 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 
 class ActivableModelQuerySet(models.QuerySet):
 
     def active(self):
         return self.filter(is_active=True)
+
+
+class DataVersionQuerySet(models.QuerySet):
+
+    # keys bumped with single query (limited by SQLite query parameters)
+    BUMP_CHUNK_SIZE = 500
+
+    def bump(self, *keys):
+        """
+        Increments versions of data identified by given keys with constant
+        number of queries per BUMP_CHUNK_SIZE keys.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = timezone.now()
+        for i in range(0, len(keys), self.BUMP_CHUNK_SIZE):
+            chunk = keys[i:i + self.BUMP_CHUNK_SIZE]
+            updated = self.filter(key__in=chunk).update(
+                version=F('version') + 1, modification_timestamp=now
+            )
+            if updated == len(chunk):
+                continue
+            # missing keys are created with version 0 and incremented, so
+            # keys created concurrently by other processes are bumped too
+            existing = set(self.filter(key__in=chunk).values_list(
+                'key', flat=True
+            ))
+            missing = [key for key in chunk if key not in existing]
+            self.bulk_create(
+                [self.model(key=key, version=0) for key in missing],
+                ignore_conflicts=True
+            )
+            self.filter(key__in=missing).update(
+                version=F('version') + 1, modification_timestamp=now
+            )
+
+    def get_signature(self, *keys):
+        """
+        Returns tuple of current versions of data identified by given keys.
+        Unknown keys have version 0.
+        """
+        versions = dict(
+            self.filter(key__in=keys).values_list('key', 'version')
+        )
+        return tuple(versions.get(key, 0) for key in keys)
+
+    def get_state(self, *keys):
+        """
+        Returns tuple of current versions of data identified by given keys
+        and time of the latest change of any of them (None if unknown).
+        """
+        versions, last_modified = {}, None
+        for key, version, timestamp in self.filter(key__in=keys).values_list(
+            'key', 'version', 'modification_timestamp'
+        ):
+            versions[key] = version
+            if last_modified is None or timestamp > last_modified:
+                last_modified = timestamp
+        return tuple(versions.get(key, 0) for key in keys), last_modified
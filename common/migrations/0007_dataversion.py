@@ -0,0 +1,26 @@
+# Generated by Django 3.1.13 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0006_cookieconsentpluginmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='key')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='version')),
+                ('modification_timestamp', models.DateTimeField(auto_now=True, verbose_name='Modification time stamp')),
+            ],
+            options={
+                'verbose_name': 'Data version',
+                'verbose_name_plural': 'Data versions',
+            },
+        ),
+    ]
@@ -7,7 +7,7 @@ from cms.models.fields import PlaceholderField
 from djangocms_bootstrap4.fields import AttributesField, TagTypeField
 from filer.fields.image import FilerImageField
 
-from common.managers import ActivableModelQuerySet
+from common.managers import ActivableModelQuerySet, DataVersionQuerySet
 
 
 # Abstract base models
@@ -62,6 +62,28 @@ class OrderedModel(models.Model):
         super().save(*args, **kwargs)
 
 
+class DataVersion(models.Model):
+    """
+    Counter incremented each time data identified by the key changes
+    (key is usually a label of the model). Allows processes to detect
+    whether their in-memory data is outdated with single cheap query.
+    """
+    key = models.CharField(_('key'), max_length=100, unique=True)
+    version = models.PositiveIntegerField(_('version'), default=0)
+    modification_timestamp = models.DateTimeField(
+        _('Modification time stamp'), auto_now=True
+    )
+
+    objects = DataVersionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Data version')
+        verbose_name_plural = _('Data versions')
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
+
+
 def content_placeholder_slotname(instance):
     return instance.slug
 
@@ -0,0 +1,231 @@
+"""
+Process-wide registry of ContentPlaceholder instances and cache of their
+rendered content.
+
+Placeholders are resolved by slug once per process (created if missing) and
+their rendered HTML is cached per language. Both are invalidated when
+a content placeholder or any plugin in it changes, other processes notice
+the change by ContentPlaceholder data version.
+
+Changes of CMS pages (menu) and static placeholders shared by all pages are
+tracked by CMS_VERSION_KEY data version, so pages rendered outside of CMS
+can be cached as well.
+"""
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from cms.models import CMSPlugin, Page, StaticPlaceholder, Title
+from cms.signals import (
+    post_placeholder_operation, post_publish, post_unpublish
+)
+from cms.toolbar.utils import get_toolbar_from_request
+from cms.utils.placeholder import restore_sekizai_context
+from sekizai.helpers import Watcher
+
+from .models import ContentPlaceholder, DataVersion
+
+
+__all__ = (
+    'ContentPlaceholderRegistry', 'placeholder_registry',
+    'placeholders_changed', 'VERSION_KEY', 'CMS_VERSION_KEY'
+)
+
+
+VERSION_KEY = ContentPlaceholder._meta.label_lower
+
+CMS_VERSION_KEY = 'cms.content'
+
+
+# Sent after committed changes of content placeholders or their plugins.
+placeholders_changed = Signal()
+
+
+class ContentPlaceholderRegistry(object):
+    # Changes made by other processes are noticed after this many seconds.
+    REVALIDATE_INTERVAL = 1.0
+
+    def __init__(self):
+        self._placeholders = None
+        self._version = None
+        self._validated_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._placeholders = None
+        self._validated_at = None
+
+    def _revalidate(self):
+        validated_at = self._validated_at
+        if (
+            validated_at is not None and
+            time.monotonic() - validated_at < self.REVALIDATE_INTERVAL
+        ):
+            return
+
+        with self._lock:
+            version = DataVersion.objects.get_signature(VERSION_KEY)[0]
+            if self._placeholders is None or version != self._version:
+                self._placeholders = {
+                    obj.slug: obj
+                    for obj in ContentPlaceholder.objects.select_related(
+                        'placeholder'
+                    )
+                }
+                self._version = version
+            self._validated_at = time.monotonic()
+
+    @property
+    def version(self):
+        self._revalidate()
+        return self._version
+
+    @property
+    def placeholder_ids(self):
+        self._revalidate()
+        return {obj.placeholder_id for obj in self._placeholders.values()}
+
+    def get(self, slug):
+        """
+        Returns ContentPlaceholder of the given slug (created if missing).
+        """
+        self._revalidate()
+        placeholders = self._placeholders
+        if slug not in placeholders:
+            with self._lock:
+                obj = ContentPlaceholder.objects.select_related(
+                    'placeholder'
+                ).get_or_create(slug=slug)[0]
+                self._placeholders = dict(placeholders, **{slug: obj})
+            return obj
+        return placeholders[slug]
+
+    def get_cache_key(self, slug, language):
+        return f'content-placeholder:{slug}:{language}:{self.version}'
+
+    def render(self, context, slug, language=None):
+        """
+        Returns rendered content of placeholder of the given slug.
+        Content is cached unless the request comes from staff user
+        or CMS toolbar session (placeholders have to be editable then).
+        """
+        request = context['request']
+        toolbar = get_toolbar_from_request(request)
+        renderer = toolbar.get_content_renderer()
+        placeholder = self.get(slug).placeholder
+        language = language or get_language()
+
+        if toolbar.show_toolbar or toolbar.edit_mode_active:
+            return renderer.render_placeholder(
+                placeholder, context, language=language, editable=True
+            )
+
+        cache = caches[settings.CONTENT_PLACEHOLDER_CACHE_ALIAS]
+        key = self.get_cache_key(slug, language)
+        cached = cache.get(key)
+        if cached is not None:
+            restore_sekizai_context(context, cached['sekizai'])
+            return mark_safe(cached['content'])
+
+        watcher = Watcher(context)
+        content = renderer.render_placeholder(
+            placeholder, context, language=language
+        )
+        cache.set(key, {
+            'content': str(content),
+            'sekizai': watcher.get_changes()
+        })
+        return content
+
+
+placeholder_registry = ContentPlaceholderRegistry()
+
+
+class _PendingBump(threading.local):
+
+    def __init__(self):
+        self.keys = set()
+
+
+_pending = _PendingBump()
+
+
+def _bump_version():
+    keys = _pending.keys
+    if not keys:  # already bumped by previous callback
+        return
+    _pending.keys = set()
+    DataVersion.objects.bump(*sorted(keys))
+    placeholder_registry.invalidate()
+    placeholders_changed.send(sender=ContentPlaceholder)
+
+
+def schedule_version_bump(key=VERSION_KEY):
+    """
+    Increments data version of content placeholders (or CMS content) once
+    the current transaction is committed (or immediately outside
+    of transaction). Repeated calls within the same transaction are merged
+    into single bump.
+    """
+    _pending.keys.add(key)
+    transaction.on_commit(_bump_version)
+
+
+@receiver(post_save, sender=ContentPlaceholder)
+@receiver(post_delete, sender=ContentPlaceholder)
+def content_placeholder_changed(sender, **kwargs):
+    schedule_version_bump()
+
+
+def plugin_changed(sender, instance, **kwargs):
+    if instance.placeholder_id in placeholder_registry.placeholder_ids:
+        schedule_version_bump()
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+@receiver(post_save, sender=StaticPlaceholder)
+@receiver(post_delete, sender=StaticPlaceholder)
+def cms_content_changed(sender, **kwargs):
+    # menu and static placeholders (published on save) change with these
+    schedule_version_bump(CMS_VERSION_KEY)
+
+
+@receiver(post_publish)
+@receiver(post_unpublish)
+def cms_page_published(sender, **kwargs):
+    schedule_version_bump(CMS_VERSION_KEY)
+
+
+def connect_plugin_receivers():
+    """
+    Connects plugin_changed to CMSPlugin and all its subclasses (called once
+    models are loaded). Receivers of all senders would disable fast deletes
+    of unrelated models.
+    """
+    for model in apps.get_models():
+        if issubclass(model, CMSPlugin):
+            post_save.connect(plugin_changed, sender=model)
+            post_delete.connect(plugin_changed, sender=model)
+
+
+@receiver(post_placeholder_operation)
+def placeholder_operation_done(sender, operation, **kwargs):
+    # covers operations which update plugins without saving them
+    # (e.g. moving or clearing)
+    placeholder_ids = placeholder_registry.placeholder_ids
+    for name in ('placeholder', 'source_placeholder', 'target_placeholder'):
+        placeholder = kwargs.get(name)
+        if placeholder is not None and placeholder.pk in placeholder_ids:
+            schedule_version_bump()
+            return
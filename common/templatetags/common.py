@@ -1,5 +1,7 @@
 from django import template
 
+from common.placeholders import placeholder_registry
+
 
 register = template.Library()
 
@@ -25,3 +27,14 @@ def get_value(obj, key, default=None):
 
     else:
         return getattr(obj, key, default)
+
+
+@register.simple_tag(takes_context=True)
+def render_content_placeholder(context, slug, language=None):
+    """
+    Renders content of common.models.ContentPlaceholder of the given slug
+    (created if it does not exist yet). Rendered content is cached.
+    :param slug: [str] slug of the content placeholder
+    :param language: [str] language code (defaults to the current language)
+    """
+    return placeholder_registry.render(context, slug, language)
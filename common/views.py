@@ -1,3 +1,139 @@
-from django.shortcuts import render
+import hashlib
 
-# Create your views here.
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from .models import DataVersion
+
+
+__all__ = ('DataVersionMixin', 'ConditionalGetMixin', 'CachedResponseMixin')
+
+
+class DataVersionMixin(object):
+    """
+    Provides state of common.models.DataVersion of data_models,
+    loaded once per request.
+    """
+    data_models = ()
+
+    def get_data_state(self):
+        """
+        Returns tuple of data versions and time of the latest change.
+        """
+        if getattr(self, '_data_state', None) is None:
+            self._data_state = DataVersion.objects.get_state(
+                *[model._meta.label_lower for model in self.data_models]
+            )
+        return self._data_state
+
+    def get_data_signature(self):
+        return ','.join(str(version) for version in self.get_data_state()[0])
+
+
+class ConditionalGetMixin(DataVersionMixin):
+    """
+    Adds ETag and Last-Modified headers to GET responses of the view based on
+    data versions of data_models and answers requests with matching
+    validators with 304 Not Modified before any data is loaded
+    or serialized.
+    Use only for read-only views which are not restricted by permissions.
+    """
+
+    def get_conditional_validators(self, request):
+        """
+        Returns ETag and Last-Modified timestamp of the response.
+        """
+        etag_source = '|'.join([
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+            request.META.get('HTTP_ACCEPT_LANGUAGE', ''),
+            self.get_data_signature()
+        ])
+        etag = quote_etag(hashlib.md5(etag_source.encode('utf-8')).hexdigest())
+        last_modified = self.get_data_state()[1]
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+        return etag, last_modified
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag, last_modified = self.get_conditional_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            return response
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # browsers have to revalidate the response each time
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class CachedResponseMixin(DataVersionMixin):
+    """
+    Stores rendered bytes of successful GET responses in the cache
+    configured with settings.API_CACHE_ALIAS. Responses are keyed by scheme,
+    host (responses contain absolute URLs), path, normalized query
+    parameters, language, Accept header and data versions of data_models,
+    so they are never served after the data has changed.
+    Use only for read-only views which are not restricted by permissions.
+    """
+    cached_headers = ('Content-Type', 'Vary', 'Allow', 'Content-Language')
+
+    def get_cache_query(self, request):
+        """
+        Returns normalized query parameters the response depends on.
+        """
+        return '&'.join(
+            f'{key}={value}'
+            for key, values in sorted(request.GET.lists())
+            for value in values
+            if value != ''
+        )
+
+    def get_response_cache_key(self, request):
+        key_source = '|'.join([
+            request.scheme,
+            request.get_host(),
+            request.path,
+            self.get_cache_query(request),
+            get_language() or '',
+            request.META.get('HTTP_ACCEPT', ''),
+            self.get_data_signature()
+        ])
+        return 'response:' + hashlib.md5(key_source.encode('utf-8')).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = caches[settings.API_CACHE_ALIAS]
+        cache_key = self.get_response_cache_key(request)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200:
+            if hasattr(response, 'render'):
+                response.render()
+            cache.set(cache_key, (response.content, {
+                header: response[header] for header in self.cached_headers
+                if response.has_header(header)
+            }))
+        return response
@@ -1,16 +1,26 @@
 from django import forms
-from django.contrib import admin, messages
-from django.urls import path
-from django.shortcuts import redirect, render
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.urls import path, reverse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
 
+from autoslug.utils import crop_slug
+
 from common.import_tools import (
-    CsvImporter, CsvFieldColumn, CsvRelatedColumn, CsvImportError,
-    ZipImporter, CsvFKColumn
+    CsvImporter, CsvFieldColumn, CsvRelatedColumn, CsvFKColumn
 )
 from common.form_validators import validate_csv_ext, validate_zip_ext
 
+from .import_jobs import get_job_progress
 from .models import *
+from .search import schedule_index_update
+from .signals import (
+    schedule_institution_version_bump, schedule_summary_refresh,
+    schedule_version_bump
+)
 
 
 class PolicyCriterionAdmin(admin.ModelAdmin):
@@ -79,14 +89,15 @@ class ArchiveImportForm(forms.Form):
     archive_file = forms.FileField(validators=[validate_zip_ext])
 
 
-def remove_institution_related_data(instance, global_data):
-    instance.social_media_links.all().delete()
-    instance.emails.all().delete()
+def remove_institutions_related_data(instances, global_data):
+    InstitutionEmail.objects.filter(institution__in=instances).delete()
+    SocialMediaLink.objects.filter(institution__in=instances).delete()
 
 
 class CsvInstitutionImporter(CsvImporter):
     model = Institution
     key_column_name = 'name'
+    bulk = True
 
     columns = [
         CsvFieldColumn(name='name', field_name='name', required=True),
@@ -134,40 +145,73 @@ class CsvInstitutionImporter(CsvImporter):
         )
     ]
 
-    processors = {
-        4: [remove_institution_related_data]
-    }
-
-
-def process_institution_score(instance, global_data):
-    institution = global_data['institution name']
-    criterion = global_data['criterion']
-    try:
-        score = InstitutionScore.objects.get(
-            institution=institution, criterion=criterion
+    chunk_processors = [remove_institutions_related_data]
+    bulk_update_fields = ['region_ref', 'country_ref']
+
+    def load_instances(self):
+        super().load_instances()
+        self.slugs = set(Institution.objects.values_list('slug', flat=True))
+
+    def get_unique_slug(self, name):
+        """
+        Returns slug of the name unique among existing and already imported
+        institutions (like AutoSlugField, which checks only the database).
+        """
+        field = Institution._meta.get_field('slug')
+        original_slug = slug = crop_slug(
+            field, field.slugify(name)
+        ) or Institution._meta.model_name
+        index = 1
+        while slug in self.slugs:
+            index += 1
+            tail = f'{field.index_sep}{index}'
+            slug = original_slug[:field.max_length - len(tail)] + tail
+        self.slugs.add(slug)
+        return slug
+
+    def pre_chunk_save(self, instances):
+        # done by Institution.save() and AutoSlugField outside of bulk mode
+        regions = Region.objects.get_for_names(
+            instance.region for instance in instances
         )
-    except InstitutionScore.DoesNotExist:
-        score = InstitutionScore(
-            institution=institution,
-            criterion=criterion
+        countries = Country.objects.get_for_names(
+            instance.country for instance in instances
+        )
+        for instance in instances:
+            instance.region_ref = regions.get(
+                Region.objects.get_key(instance.region)
+            )
+            instance.country_ref = countries.get(
+                Country.objects.get_key(instance.country)
+            )
+            if instance.pk is None and not instance.slug:
+                instance.slug = self.get_unique_slug(instance.name)
+                instance._slug_is_unique = True  # see BulkAutoSlugField
+
+    def post_chunk_save(self, instances, created):
+        # done by model signals outside of bulk mode
+        institution_ids = [instance.pk for instance in instances]
+        schedule_summary_refresh([instance.pk for instance in created])
+        schedule_version_bump(
+            Country, Institution, InstitutionEmail, Region, SocialMediaLink
+        )
+        schedule_index_update(institution_ids=institution_ids)
+        schedule_institution_version_bump(
+            slugs=[instance.slug for instance in instances]
         )
-
-    score_val = global_data.get('score')
-    if score_val is not None:
-        score.score = score_val
-
-    comment = global_data.get('comment')
-    if comment is not None:
-        score.comment = comment
-
-    score.save()
-
-    instance.score = score
 
 
 class CsvPolicyImporter(CsvImporter):
+    """
+    Imports policies in bulk mode. Scores of policies are resolved from
+    in-memory map by institution and criterion, rows of the same score are
+    merged and scores are written once per chunk, so score queries depend
+    on the number of chunks, not rows.
+    """
     model = InstitutionPolicy
     key_column_name = 'dummy'
+    bulk = True
+    score_fields = ('score', 'comment')
 
     columns = [
         CsvFKColumn(
@@ -203,14 +247,107 @@ class CsvPolicyImporter(CsvImporter):
         )
     ]
 
-    processors = {
-        4: [process_institution_score]
-    }
+    def __init__(self):
+        super().__init__()
+        self.processors = {
+            4: [self.process_institution_score]
+        }
+        # InstitutionScore by (institution id, criterion id)
+        self.scores = {}
+        # changed score fields of the current chunk by score key
+        self.score_changes = {}
+        # score keys of policies of the current chunk by id of the policy
+        self.policy_score_keys = {}
+        # scores inserted or updated by the current chunk
+        self.saved_scores = []
 
     def pre_import(self, override_existing=False):
         if override_existing:
             InstitutionPolicy.objects.all().delete()
 
+    def process_institution_score(self, instance, global_data):
+        key = (
+            global_data['institution name'].pk, global_data['criterion'].pk
+        )
+        changes = self.score_changes.setdefault(key, {})
+        for field in self.score_fields:
+            value = global_data.get(field)
+            if value is not None:  # later rows override earlier ones
+                changes[field] = value
+        self.policy_score_keys[id(instance)] = key
+
+    def load_scores(self, keys):
+        """
+        Loads existing scores of given keys into self.scores.
+        """
+        keys = set(keys)
+        for score in InstitutionScore.objects.filter(
+            institution_id__in={institution_id for institution_id, _ in keys},
+            criterion_id__in={criterion_id for _, criterion_id in keys}
+        ):
+            key = (score.institution_id, score.criterion_id)
+            if key in keys:
+                self.scores[key] = score
+
+    def save_scores(self):
+        """
+        Upserts scores changed by rows of the current chunk: missing scores
+        are inserted (ignoring conflicts with scores created meanwhile),
+        then scores which values differ are updated.
+        """
+        changes, self.score_changes = self.score_changes, {}
+        missing = [key for key in changes if key not in self.scores]
+        if missing:
+            self.load_scores(missing)
+            missing = [key for key in missing if key not in self.scores]
+        if missing:
+            InstitutionScore.objects.bulk_create([
+                InstitutionScore(
+                    institution_id=institution_id, criterion_id=criterion_id,
+                    **changes[(institution_id, criterion_id)]
+                )
+                for institution_id, criterion_id in missing
+            ], ignore_conflicts=True)
+            self.load_scores(missing)
+
+        changed = []
+        for key, fields in changes.items():
+            score = self.scores[key]
+            if any(
+                getattr(score, field) != value
+                for field, value in fields.items()
+            ):
+                for field, value in fields.items():
+                    setattr(score, field, value)
+                changed.append(score)
+        if changed:
+            now = timezone.now()
+            for score in changed:
+                score.modification_timestamp = now
+            InstitutionScore.objects.bulk_update(
+                changed, list(self.score_fields) + ['modification_timestamp']
+            )
+        return [self.scores[key] for key in missing] + changed
+
+    def pre_chunk_save(self, instances):
+        self.saved_scores = self.save_scores()
+        for instance in instances:
+            instance.score = self.scores[
+                self.policy_score_keys.pop(id(instance))
+            ]
+
+    def post_chunk_save(self, instances, created):
+        # done by model signals outside of bulk mode
+        institution_ids = {
+            instance.score.institution_id for instance in instances
+        }
+        schedule_summary_refresh(
+            {score.institution_id for score in self.saved_scores}
+        )
+        schedule_version_bump(InstitutionPolicy, InstitutionScore)
+        schedule_index_update(institution_ids=institution_ids)
+        schedule_institution_version_bump(institution_ids=institution_ids)
+
 
 class InstitutionAdmin(admin.ModelAdmin):
     list_display = [
@@ -218,7 +355,7 @@ class InstitutionAdmin(admin.ModelAdmin):
         'creation_timestamp', 'modification_timestamp'
     ]
     list_display_links = ['id', 'slug', 'name']
-    list_filter = ['is_active', 'region',
+    list_filter = ['is_active', 'region_ref', 'country_ref',
                    'creation_timestamp', 'modification_timestamp']
     search_fields = ['id', 'name', 'region', 'country']
     change_list_template = 'comparer/admin/institution_changelist.html'
@@ -232,49 +369,44 @@ class InstitutionAdmin(admin.ModelAdmin):
         return [
             path(
                 'import-institutions-csv/',
-                self.import_institutions_csv,
+                self.admin_site.admin_view(self.import_institutions_csv),
                 name='import-institutions-csv'
             ),
             path(
                 'import-policies-csv/',
-                self.import_policies_csv,
+                self.admin_site.admin_view(self.import_policies_csv),
                 name='import-policies-csv'
             ),
             path(
                 'import-logo-zip/',
-                self.import_logo_zip,
+                self.admin_site.admin_view(self.import_logo_zip),
                 name='import-logo-zip'
             ),
         ] + super().get_urls()
 
+    def enqueue_import_job(self, request, kind, file, **options):
+        """
+        Stores uploaded file as ImportJob processed by the import worker
+        and redirects to the status page of the job.
+        """
+        job = ImportJob.objects.create(
+            kind=kind, file=file, created_by=request.user, **options
+        )
+        self.message_user(
+            request, _('The file has been queued for import.')
+        )
+        return redirect('admin:comparer_importjob_status', job.pk)
+
     def import_logo_zip(self, request):
         if request.method == 'POST':
             form = ArchiveImportForm(request.POST, request.FILES)
 
             if form.is_valid():
-                importer = ZipImporter(
-                    model=Institution, file_fname='logo', query_fname='name',
-                    allowed_ext=['bmp', 'gif', 'png', 'jpg', 'jpeg', 'ico']
-                )
-                imported_count, errors_list, unrecog_list = importer.import_data(
+                return self.enqueue_import_job(
+                    request, ImportJob.LOGOS,
                     form.cleaned_data['archive_file']
                 )
 
-                message = _(
-                    'Successfully assigned logo files to {} institutions.'
-                ).format(imported_count)
-                if errors_list:
-                    message += _(
-                        ' Encountered errors while processing: "{}".'
-                    ).format('", "'.join(errors_list))
-                if unrecog_list:
-                    message += _(
-                        ' Unrecognized files in the archive: "{}".'
-                    ).format('", "'.join(unrecog_list))
-                self.message_user(request, message)
-
-                return redirect("..")
-
         else:  # GET
             form = ArchiveImportForm()
 
@@ -295,26 +427,12 @@ class InstitutionAdmin(admin.ModelAdmin):
             form = CsvImportForm(request.POST, request.FILES)
 
             if form.is_valid():
-                importer = CsvInstitutionImporter()
-                try:
-                    institutions = importer.import_data(
-                        form.cleaned_data['csv_file'],
-                        delimiter=form.cleaned_data['delimiter'],
-                        override_existing=form.cleaned_data['override_existing']
-                    )
-                except CsvImportError as e:
-                    self.message_user(
-                        request,
-                        f'Institution import failed: {e}',
-                        level=messages.ERROR
-                    )
-                else:
-                    self.message_user(
-                        request,
-                        f'{len(institutions)} institutions has been '
-                        'successfully imported from csv file.'
-                    )
-                return redirect("..")
+                return self.enqueue_import_job(
+                    request, ImportJob.INSTITUTIONS,
+                    form.cleaned_data['csv_file'],
+                    delimiter=form.cleaned_data['delimiter'],
+                    override_existing=form.cleaned_data['override_existing']
+                )
 
         else:  # GET
             form = CsvImportForm()
@@ -336,26 +454,12 @@ class InstitutionAdmin(admin.ModelAdmin):
             form = CsvImportForm(request.POST, request.FILES)
 
             if form.is_valid():
-                importer = CsvPolicyImporter()
-                try:
-                    policies = importer.import_data(
-                        form.cleaned_data['csv_file'],
-                        delimiter=form.cleaned_data['delimiter'],
-                        override_existing=form.cleaned_data['override_existing']
-                    )
-                except CsvImportError as e:
-                    self.message_user(
-                        request,
-                        f'Policies import failed: {e}',
-                        level=messages.ERROR
-                    )
-                else:
-                    self.message_user(
-                        request,
-                        f'{len(policies)} policies has been successfully '
-                        'imported from csv file.'
-                    )
-                return redirect("..")
+                return self.enqueue_import_job(
+                    request, ImportJob.POLICIES,
+                    form.cleaned_data['csv_file'],
+                    delimiter=form.cleaned_data['delimiter'],
+                    override_existing=form.cleaned_data['override_existing']
+                )
 
         else:  # GET
             form = CsvImportForm()
@@ -409,6 +513,72 @@ class SocialMediaLinkAdmin(admin.ModelAdmin):
     search_fields = ['institution__name', 'url']
 
 
+class ImportJobAdmin(admin.ModelAdmin):
+    """
+    Jobs are created by import views of InstitutionAdmin and processed by
+    the import worker, they can be only viewed and deleted.
+    """
+    list_display = [
+        'id', 'kind', 'status', 'rows_processed', 'rows_total', 'created_by',
+        'creation_timestamp', 'finished_at', 'status_link'
+    ]
+    list_filter = ['kind', 'status', 'creation_timestamp']
+    search_fields = ['message', 'created_by__username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/status/',
+                self.admin_site.admin_view(self.status_view),
+                name='comparer_importjob_status'
+            ),
+        ] + super().get_urls()
+
+    def status_link(self, obj):
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('admin:comparer_importjob_status', args=[obj.pk]),
+            _('show')
+        )
+    status_link.short_description = _('status page')
+
+    def status_view(self, request, pk):
+        job = get_object_or_404(ImportJob, pk=pk)
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+
+        title = _('Import job status')
+        context = {
+            'opts': self.model._meta,
+            'title': title,
+            'view_name': title,
+            'job': job,
+            'progress': get_job_progress(job),
+        }
+        return render(
+            request, 'comparer/admin/import_job_status.html', context
+        )
+
+
+class LookupNameAdmin(admin.ModelAdmin):
+    """
+    Region and Country are maintained automatically with institutions.
+    """
+    list_display = ['id', 'name', 'key']
+    list_display_links = ['id', 'name']
+    search_fields = ['name']
+    readonly_fields = ['key']
+
+    def has_add_permission(self, request):
+        return False
+
+
 class MessageTemplateAdmin(admin.ModelAdmin):
     list_display = [
         'id', 'kind', 'call_to_action', 'min_score', 'max_score'
@@ -420,9 +590,12 @@ class MessageTemplateAdmin(admin.ModelAdmin):
 
 admin.site.register(PolicyCategory, PolicyCategoryAdmin)
 admin.site.register(PolicyCriterion, PolicyCriterionAdmin)
+admin.site.register(Region, LookupNameAdmin)
+admin.site.register(Country, LookupNameAdmin)
 admin.site.register(Institution, InstitutionAdmin)
 admin.site.register(SocialMediaLink, SocialMediaLinkAdmin)
 admin.site.register(InstitutionEmail)
 admin.site.register(InstitutionScore, InstitutionScoreAdmin)
 admin.site.register(InstitutionPolicy, InstitutionPolicyAdmin)
 admin.site.register(MessageTemplate, MessageTemplateAdmin)
+admin.site.register(ImportJob, ImportJobAdmin)
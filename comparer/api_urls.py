@@ -4,6 +4,21 @@ from .api_views import *
 
 
 urlpatterns = (
+    path(
+        'institutions/facets/',
+        InstitutionFacetsView.as_view(),
+        name='institution-facets'
+    ),
+    path(
+        'institutions/autocomplete/',
+        InstitutionAutocompleteView.as_view(),
+        name='institution-autocomplete'
+    ),
+    path(
+        'ranking-bootstrap/',
+        RankingBootstrapView.as_view(),
+        name='ranking-bootstrap'
+    ),
     path(
         'message-templates/',
         MessageTemplateList.as_view(),
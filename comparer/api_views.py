@@ -1,42 +1,410 @@
-from django.conf import settings
+from collections import OrderedDict
+
+from django.db.models import Prefetch
+from django.urls import reverse
 
 from rest_framework import viewsets, generics
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.response import Response
+
+from common.views import CachedResponseMixin, ConditionalGetMixin
 
+from comparer.autocomplete import autocomplete_index
 from comparer.models import *
+from comparer.pagination import RankingCursorPagination
+from comparer.ranking import RANKING_MODELS, ranking_engine
+from comparer.registry import category_registry
+from comparer.search import search_index
 from comparer.serializers import *
 
 
 __all__ = (
-    'PolicyCategoryViewSet', 'InstitutionViewSet', 'MessageTemplateList',
-    'MessageTemplateListForScore'
+    'PolicyCategoryViewSet', 'InstitutionViewSet', 'InstitutionFacetsView',
+    'InstitutionAutocompleteView', 'RankingBootstrapView', 'MessageTemplateList', 'MessageTemplateListForScore'
 )
 
 
-class PolicyCategoryViewSet(viewsets.ModelViewSet):
+def get_active_categories():
+    return PolicyCategory.objects.active().prefetch_related(
+        Prefetch(
+            'criterions', queryset=PolicyCriterion.objects.active(),
+            to_attr='active_criterions'
+        )
+    )
+
+
+class PolicyCategoryViewSet(
+    ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet
+):
+    data_models = (PolicyCategory, PolicyCriterion)
     queryset = PolicyCategory.objects.active()
     serializer_class = PolicyCategorySerializer
 
+    def get_queryset(self):
+        return get_active_categories()
+
 
-class InstitutionViewSet(viewsets.ModelViewSet):
+class RankingListMixin(object):
     """
-    A simple ViewSet for viewing and editing the accounts
-    associated with the user.
+    Lists institutions from in-memory ranking snapshot with support
+    of ordering, full-text search, region and country filter (comma
+    separated ids of Region / Country, e.g. ?country=1,2), sparse fields
+    and cursor pagination parameters.
     """
-    queryset = Institution.objects.active().with_scores()
     search_fields = ['name', 'region', 'country']
-    ordering_fields = ['name', 'country', 'score_total'] + \
-        [f'score_{s}' for s in settings.POLICY_CATEGORY_SLUGS]
     ordering = ['-score_total', 'name']
+    filter_params = {'region': 'region_ids', 'country': 'country_ids'}
+
+    @property
+    def ordering_fields(self):
+        return ['name', 'country'] + category_registry.score_fields
+
+    def get_filter_ids(self, request):
+        """
+        Returns keyword arguments of RankingSnapshot.query() with ids
+        given in filter parameters.
+        """
+        filters = {}
+        for param, argument in self.filter_params.items():
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                filters[argument] = [
+                    int(pk) for pk in value.split(',') if pk.strip()
+                ]
+            except ValueError:
+                raise ValidationError({
+                    param: 'Comma separated ids are required.'
+                })
+        return filters
+
+    def get_search_filter(self, request, limit=None):
+        """
+        Returns keyword arguments of RankingSnapshot.query() matching search
+        parameter: ids of institutions found in full-text search index
+        (ordered by relevance) or search terms matched by the snapshot
+        itself if the database does not support full-text search.
+        """
+        terms = SearchFilter().get_search_terms(request)
+        if not terms:
+            return {}
+        if not search_index.is_available:
+            return {'search_terms': terms}
+        return {'institution_ids': [
+            pk for pk, _relevance in search_index.search(terms, limit)
+        ]}
+
+    def get_ranking_data(self, request, pages_path=None):
+        """
+        Returns serialized institution list or page (if pagination
+        is requested).
+        :param pages_path: [str] path used in next page links
+        """
+        snapshot = ranking_engine.get_snapshot()
+        ordering = [
+            item for item in OrderingFilter().get_ordering(
+                request, Institution.objects.none(), self
+            ) or []
+            if item.lstrip('-') in snapshot.ranks
+        ]
+        filter_ids = self.get_filter_ids(request)
+        rows = snapshot.query(
+            ordering=ordering,
+            **self.get_search_filter(request),
+            **filter_ids
+        )
+        # ranks among institutions of filtered regions and countries, like
+        # InstitutionQuerySet.with_ranks() (search does not change ranks)
+        positions = snapshot.get_positions(
+            snapshot.get_filter_mask(**filter_ids)
+        ) if filter_ids else None
+
+        fields = get_sparse_fields(
+            request, InstitutionListSerializer.Meta.fields
+        )
+        paginator = RankingCursorPagination(request, pages_path)
+        if paginator.is_enabled():
+            page = paginator.paginate_rows(snapshot, rows, ordering)
+            return paginator.get_paginated_data(
+                snapshot.serialize(page, request, fields, positions)
+            )
+        return snapshot.serialize(rows, request, fields, positions)
+
+
+class InstitutionViewSet(
+    ConditionalGetMixin, CachedResponseMixin, RankingListMixin,
+    viewsets.ModelViewSet
+):
+    """
+    A simple ViewSet for viewing and editing the accounts
+    associated with the user.
+    """
+    data_models = RANKING_MODELS + (
+        InstitutionEmail, InstitutionPolicy, SocialMediaLink
+    )
+    queryset = Institution.objects.active()
+    max_compare_count = 50
+    max_search_count = 20
+
+    def get_queryset(self):
+        """
+        Loads only columns required by fields requested with "fields" and
+        "omit" query parameters.
+        """
+        queryset = super().get_queryset().with_scores()
+        fields = get_sparse_fields(
+            self.request, self.get_serializer_class().Meta.fields
+        )
+
+        columns = {'id'}
+        for name in fields:
+            if name == 'logo_thumb':
+                columns.add('logo')
+            elif name in ('social_media_links', 'emails'):
+                queryset = queryset.prefetch_related(name)
+            elif name not in ('scores', 'ranks'):
+                columns.add(name)
+        return queryset.only(*columns)
+
+    def get_object(self):
+        """
+        Annotates the institution with ranks from the ranking snapshot
+        (ranks computed for single institution query would be always 1).
+        """
+        snapshot = ranking_engine.get_snapshot()
+        return snapshot.annotate_ranks(super().get_object())
 
     def get_serializer_class(self):
         if self.action == 'list':
             return InstitutionListSerializer
         if self.action == 'retrieve':
             return InstitutionDetailSerializer
+        if self.action == 'compare':
+            return InstitutionComparisonSerializer
         return InstitutionListSerializer
 
+    def get_compare_ids(self, request):
+        try:
+            ids = [
+                int(pk) for pk in request.query_params.get('ids', '').split(',')
+                if pk.strip()
+            ]
+        except ValueError:
+            raise ValidationError({'ids': 'Comma separated ids are required.'})
+        if not ids:
+            raise ValidationError({'ids': 'At least one id is required.'})
+        if len(ids) > self.max_compare_count:
+            raise ValidationError({
+                'ids': f'At most {self.max_compare_count} institutions '
+                       'can be compared at once.'
+            })
+        return list(dict.fromkeys(ids))
+
+    @action(detail=False)
+    def compare(self, request, *args, **kwargs):
+        """
+        Returns category and criterion scores, social media links and
+        e-mails of institutions given with "ids" parameter
+        (e.g. ?ids=1,2,3) with constant number of queries.
+        """
+        ids = self.get_compare_ids(request)
+        institutions = Institution.objects.active().with_scores().filter(
+            pk__in=ids
+        ).prefetch_related(
+            Prefetch(
+                'scores',
+                queryset=InstitutionScore.objects.active().filter(
+                    criterion__is_active=True,
+                    criterion__category__is_active=True
+                ),
+                to_attr='active_scores'
+            ),
+            Prefetch(
+                'social_media_links',
+                queryset=SocialMediaLink.objects.active(),
+                to_attr='active_social_media_links'
+            ),
+            Prefetch(
+                'emails',
+                queryset=InstitutionEmail.objects.active(),
+                to_attr='active_emails'
+            )
+        )
+        snapshot = ranking_engine.get_snapshot()
+        institutions = sorted(
+            (snapshot.annotate_ranks(obj) for obj in institutions),
+            key=lambda obj: ids.index(obj.pk)
+        )
+        serializer = self.get_serializer(institutions, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False)
+    def search(self, request, *args, **kwargs):
+        """
+        Returns at most max_search_count institutions matching "search"
+        parameter in names, places, policy titles and texts, the most
+        relevant first (sparse fields parameters are supported).
+        """
+        snapshot = ranking_engine.get_snapshot()
+        search_filter = self.get_search_filter(request, self.max_search_count)
+        if 'institution_ids' in search_filter:
+            rows = [
+                index for index in map(
+                    snapshot.get_index, search_filter['institution_ids']
+                )
+                if index is not None
+            ]
+        else:
+            rows = snapshot.query(
+                self.ordering, **search_filter
+            )[:self.max_search_count]
+
+        fields = get_sparse_fields(
+            request, InstitutionListSerializer.Meta.fields
+        )
+        return Response(snapshot.serialize(rows, request, fields))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Answers list requests from in-memory ranking snapshot.
+        Results are paginated only if requested (see RankingCursorPagination).
+        """
+        return Response(self.get_ranking_data(request))
+
+
+class InstitutionFacetsView(
+    ConditionalGetMixin, CachedResponseMixin, RankingListMixin,
+    generics.GenericAPIView
+):
+    """
+    Returns numbers of institutions matching search, region and country
+    parameters of the institution list per region, country and score bucket
+    (tenths of max score) of the total score ("scores") and of every
+    category score ("category_scores" keyed by category slug), computed
+    from the ranking snapshot. Counts per region and country ignore their
+    own parameter.
+    """
+    data_models = RANKING_MODELS + (InstitutionPolicy, Region, Country)
+    bucket_count = 10
+
+    def get_cache_query(self, request):
+        """
+        Responses depend on normalized search terms and filters only.
+        Called before the request is wrapped by REST framework.
+        """
+        search = request.GET.get(SearchFilter.search_param, '')
+        signature = [sorted(set(search.lower().replace(',', ' ').split()))]
+        for param in self.filter_params:
+            value = request.GET.get(param)
+            signature.append(None if value is None else sorted({
+                pk.strip() for pk in value.split(',') if pk.strip()
+            }))
+        return repr(signature)
+
+    @staticmethod
+    def get_named_counts(model, counts):
+        return [
+            OrderedDict([('id', pk), ('name', name), ('count', counts[pk])])
+            for pk, name in model.objects.filter(
+                pk__in=counts
+            ).values_list('id', 'name')
+        ]
+
+    def get_buckets(self, counts):
+        return [
+            OrderedDict([
+                ('from', i * 100 // self.bucket_count),
+                ('to', (i + 1) * 100 // self.bucket_count),
+                ('count', count)
+            ])
+            for i, count in enumerate(counts)
+        ]
+
+    def get(self, request, *args, **kwargs):
+        max_scores = {
+            category.slug: category.max_score
+            for category in category_registry.get_categories()
+        }
+        max_scores['total'] = category_registry.max_score
+        facets = ranking_engine.get_snapshot().get_facets(
+            max_scores,
+            bucket_count=self.bucket_count,
+            **self.get_search_filter(request),
+            **self.get_filter_ids(request)
+        )
+        score_buckets = facets['score_buckets'].copy()
+        return Response(OrderedDict([
+            ('count', facets['count']),
+            ('regions', self.get_named_counts(Region, facets['regions'])),
+            ('countries', self.get_named_counts(
+                Country, facets['countries']
+            )),
+            ('scores', self.get_buckets(score_buckets.pop('total'))),
+            ('category_scores', OrderedDict([
+                (slug, self.get_buckets(counts))
+                for slug, counts in score_buckets.items()
+            ])),
+        ]))
+
+
+class InstitutionAutocompleteView(generics.GenericAPIView):
+    """
+    Returns id, name, slug and total score of the best ranked institutions
+    which names contain words starting with words of "q" parameter
+    (at most "limit", default_limit by default). Answered from in-memory
+    prefix index without database queries, so responses are not cached.
+    """
+    default_limit = 10
+    max_limit = 50
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.max_limit:
+            raise ValidationError({
+                'limit': f'Number from 1 to {self.max_limit} is required.'
+            })
+        return limit
+
+    def get(self, request, *args, **kwargs):
+        return Response(autocomplete_index.suggest(
+            request.query_params.get('q', ''), self.get_limit(request)
+        ))
+
+
+class RankingBootstrapView(
+    ConditionalGetMixin, CachedResponseMixin, RankingListMixin,
+    generics.GenericAPIView
+):
+    """
+    Returns all data required to display the ranking browser in single
+    response: active categories with criterions, total max score and
+    institution list (accepting the same parameters as institution list).
+    """
+    data_models = RANKING_MODELS + (InstitutionPolicy, )
+
+    def get(self, request, *args, **kwargs):
+        categories = PolicyCategorySerializer(
+            get_active_categories(), many=True
+        ).data
+        return Response(OrderedDict([
+            ('categories', categories),
+            ('max_score', sum(c['max_score'] for c in categories)),
+            ('institutions', self.get_ranking_data(
+                request, pages_path=reverse('institution-list')
+            )),
+        ]))
+
 
-class MessageTemplateList(generics.ListAPIView):
+class MessageTemplateList(
+    ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView
+):
+    data_models = (MessageTemplate, )
     serializer_class = MessageTemplateSerializer
     queryset = MessageTemplate.objects.active()
 
@@ -5,3 +5,8 @@ from django.utils.translation import ugettext_lazy as _
 class ComparerConfig(AppConfig):
     name = 'comparer'
     verbose_name = _('Institution comparer')
+
+    def ready(self):
+        from . import (  # noqa: F401
+            signals, ranking, page_cache, search, autocomplete
+        )
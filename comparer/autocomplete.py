@@ -0,0 +1,138 @@
+"""
+In-memory prefix index of institution names for typeahead suggestions.
+
+Every word of every institution name (normalized by search.normalize_text)
+is stored in a sorted array together with position of the institution in
+the default ranking order, so words starting with a prefix form a single
+range found by binary search and the best ranked matches are the smallest
+positions. The index is built from the ranking snapshot and rebuilt when
+the snapshot is replaced. Lookups do not query the database, data version
+is checked at most once per REVALIDATE_INTERVAL.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+from django.dispatch import receiver
+
+from .ranking import RANKING_MODELS, ranking_engine
+from .search import get_words
+from .signals import data_changed
+
+
+__all__ = ('AutocompleteIndex', 'autocomplete_index')
+
+
+# Ordering of suggestions of equally matching names.
+SUGGESTION_ORDERING = ('-score_total', 'name')
+
+# Greater than any character of normalized words.
+MAX_CHAR = '\U0010ffff'
+
+
+class PrefixIndex(object):
+    """
+    Sorted words with positions of institutions which names contain them.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.order = snapshot.get_order(SUGGESTION_ORDERING)
+        names = snapshot.texts['name']
+        entries = sorted({
+            (word, position)
+            for position, index in enumerate(self.order)
+            for word in get_words([names[index]])
+        })
+        self.words = [word for word, _position in entries]
+        self.positions = np.array(
+            [position for _word, position in entries], dtype=np.int64
+        )
+
+    def find_positions(self, prefix):
+        """
+        Returns sorted unique positions of names with a word starting
+        with the prefix.
+        """
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + MAX_CHAR, start)
+        return np.unique(self.positions[start:end])
+
+    def find(self, words, limit):
+        """
+        Returns snapshot row indexes of at most limit best ranked names
+        containing prefixes of all words.
+        """
+        positions = None
+        for word in sorted(set(words), key=len, reverse=True):
+            found = self.find_positions(word)
+            positions = found if positions is None else np.intersect1d(
+                positions, found, assume_unique=True
+            )
+            if not len(positions):
+                break
+        if positions is None:
+            return []
+        return self.order[positions[:limit]]
+
+
+class AutocompleteIndex(object):
+    # Changes made by other processes are noticed after this many seconds.
+    REVALIDATE_INTERVAL = 1.0
+
+    def __init__(self):
+        self._index = None
+        self._validated_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._validated_at = None
+
+    def get_index(self):
+        validated_at = self._validated_at
+        if (
+            validated_at is not None and
+            time.monotonic() - validated_at < self.REVALIDATE_INTERVAL
+        ):
+            return self._index
+
+        with self._lock:
+            snapshot = ranking_engine.get_snapshot()
+            if self._index is None or self._index.snapshot is not snapshot:
+                self._index = PrefixIndex(snapshot)
+            self._validated_at = time.monotonic()
+        return self._index
+
+    def suggest(self, query, limit=10):
+        """
+        Returns list of dictionaries with id, name, slug and total score
+        of at most limit best ranked institutions which names contain words
+        starting with all words of the query (accents and case are ignored).
+        """
+        words = get_words([query])
+        if not words:
+            return []
+        index = self.get_index()
+        snapshot = index.snapshot
+        names = snapshot.texts['name']
+        slugs = snapshot.texts['slug']
+        return [
+            {
+                'id': int(snapshot.ids[i]),
+                'name': names[i],
+                'slug': slugs[i],
+                'score_total': snapshot.get_scores(i)['total'],
+            }
+            for i in index.find(words, limit)
+        ]
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+@receiver(data_changed)
+def ranking_data_changed(sender, models, **kwargs):
+    if models & set(RANKING_MODELS):
+        autocomplete_index.invalidate()
@@ -1,17 +1,23 @@
 from common.cms_plugins import concat_attrs
-import operator
-from functools import reduce
+import hashlib
 
-from django.utils.translation import gettext as _
-from django.db.models import Q, Sum
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language, gettext as _
 
 from cms.plugin_base import CMSPluginBase
 from cms.plugin_pool import plugin_pool
 from cms.models.pluginmodel import CMSPlugin
 
 from .models import (
-    PolicyCategory, RankingBoxPluginModel, Institution, RankingBrowserPluginModel
+    PolicyCategory, RankingBoxPluginModel, Institution, RankingBrowserPluginModel,
+    Region, Country
 )
+from .ranking import RANKING_MODELS
+from .registry import category_registry
+from .signals import get_data_signature
 
 
 @plugin_pool.register_plugin
@@ -19,64 +25,79 @@ class RankingBoxPluginPublisher(CMSPluginBase):
     model = RankingBoxPluginModel
     module = _('Comparer')
     name = _('Ranking Box')
-    render_template = 'comparer/cms/ranking_box_plugin.html'
+    render_template = 'comparer/cms/cached_content.html'
+    content_template = 'comparer/cms/ranking_box_plugin.html'
+
+    @staticmethod
+    def get_cache_key(instance):
+        """
+        Returns cache key of rendered content, which changes with plugin
+        configuration, language and ranking data.
+        """
+        config = hashlib.md5(repr((
+            instance.title, instance.items_count, instance.region_filter,
+            instance.country_filter, instance.tag_type, instance.attributes,
+            instance.changed_date
+        )).encode('utf-8')).hexdigest()
+        version = ','.join(
+            str(v) for v in get_data_signature(*RANKING_MODELS)
+        )
+        return f'ranking-box:{instance.pk}:{get_language()}:{config}:{version}'
 
-    def render(self, context, instance, placeholder):
-        institutions = Institution.objects.with_scores()
+    @staticmethod
+    def get_institutions(instance):
+        """
+        Returns list of top institutions with positions as "rank_total"
+        (institutions with the same score share the position and following
+        positions are skipped, like ranks of the API).
+        """
+        institutions = Institution.objects.active().with_scores()
 
         if instance.region_filter:
             institutions = institutions.filter(
-                reduce(
-                    operator.or_,
-                    [
-                        Q(region__iexact=c)
-                        for c in instance.region_filter.split(';')
-                    ]
+                region_ref__in=Region.objects.filter_names(
+                    instance.region_filter.split(';')
                 )
             )
 
         if instance.country_filter:
             institutions = institutions.filter(
-                reduce(
-                    operator.or_,
-                    [
-                        Q(country__iexact=c)
-                        for c in instance.country_filter.split(';')
-                    ]
+                country_ref__in=Country.objects.filter_names(
+                    instance.country_filter.split(';')
                 )
             )
 
-        institutions = institutions.order_by(
-            '-score_total'
-        )[:instance.items_count]
-
-        max_score = PolicyCategory.objects.active().aggregate(
-            sum=Sum('max_score')
-        )['sum']
+        return list(institutions.with_ranks().order_by(
+            'rank_total', 'pk'
+        )[:instance.items_count])
 
-        # Calculating and setting positions
-        curr_position = 1
-        prev_score = (
-            institutions[0].score_total
-                if len(institutions)
-                else max_score
-        )
-        for institution in institutions:
-            if (institution.score_total or 0) < prev_score:
-                curr_position += 1
-            institution.position = curr_position
-            prev_score = institution.score_total
-
-        instance.attributes['class'] = concat_attrs(
-            'ranking-box',
-            instance.attributes.get('class'),
-            separator=' '
-        )
+    def render(self, context, instance, placeholder):
+        cache = caches[settings.PLUGIN_CACHE_ALIAS]
+        key = self.get_cache_key(instance)
+        content = cache.get(key)
+
+        if content is None:
+            # stored attributes are part of the cache key, rendered instance
+            # gets a copy with added class
+            attributes = instance.attributes
+            instance.attributes = dict(attributes, **{'class': concat_attrs(
+                'ranking-box',
+                attributes.get('class'),
+                separator=' '
+            )})
+            try:
+                content = render_to_string(self.content_template, {
+                    'instance': instance,
+                    'institutions': self.get_institutions(instance),
+                    'max_score': category_registry.max_score
+                })
+            finally:
+                instance.attributes = attributes
+            cache.set(key, content)
 
         context.update({
             'instance': instance,
-            'institutions': institutions,
-            'max_score': max_score
+            'content': mark_safe(content)
         })
 
         return context
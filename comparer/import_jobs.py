@@ -0,0 +1,85 @@
+"""
+Progress of import jobs processed by the import worker.
+
+Admin import views store uploaded files as ImportJob, the worker (see
+run_import_worker command) claims pending jobs from the database, so no
+message broker is needed. The whole import is a single transaction, so
+progress of a running job is not written to its row (it would not be
+visible before commit and would wait for the write lock on SQLite), it is
+kept in cache shared by processes until the job is finished.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+
+__all__ = (
+    'ImportProgress', 'get_job_progress', 'set_job_progress',
+    'clear_job_progress'
+)
+
+
+ImportProgress = namedtuple('ImportProgress', [
+    'rows_processed', 'rows_total', 'percent', 'throughput', 'eta'
+])
+
+
+def get_progress_cache():
+    return caches[settings.IMPORT_PROGRESS_CACHE_ALIAS]
+
+
+def get_progress_key(job):
+    return f'comparer:import-job:{job.pk}'
+
+
+def set_job_progress(job, rows_processed):
+    """
+    Publishes number of rows processed by the running job.
+    """
+    job.rows_processed = rows_processed
+    get_progress_cache().set(get_progress_key(job), rows_processed)
+
+
+def clear_job_progress(job):
+    get_progress_cache().delete(get_progress_key(job))
+
+
+def get_job_progress(job, now=None):
+    """
+    Returns ImportProgress of the job. Throughput is given in rows per
+    second and ETA as timedelta (both are None when unknown).
+    """
+    rows_processed = job.rows_processed
+    if job.status == job.RUNNING:
+        rows_processed = get_progress_cache().get(
+            get_progress_key(job), rows_processed
+        )
+    rows_total = job.rows_total
+
+    throughput = None
+    if job.started_at is not None and rows_processed:
+        end = job.finished_at or now or timezone.now()
+        elapsed = (end - job.started_at).total_seconds()
+        if elapsed > 0:
+            throughput = rows_processed / elapsed
+
+    percent = eta = None
+    if rows_total:
+        percent = min(100 * rows_processed // rows_total, 100)
+        if throughput and job.status == job.RUNNING:
+            eta = timedelta(seconds=round(
+                max(rows_total - rows_processed, 0) / throughput
+            ))
+    elif rows_total == 0 and job.is_finished:
+        percent = 100
+
+    return ImportProgress(
+        rows_processed=rows_processed,
+        rows_total=rows_total,
+        percent=percent,
+        throughput=throughput,
+        eta=eta
+    )
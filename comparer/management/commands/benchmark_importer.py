@@ -0,0 +1,149 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from common.import_tools import CsvImportChunk
+
+from comparer.admin import CsvInstitutionImporter, CsvPolicyImporter
+
+
+INSTITUTION_HEADER = [
+    'name', 'region', 'country', 'email', 'facebook', 'twitter', 'instagram',
+    'linkedin', 'youtube', 'site'
+]
+
+POLICY_HEADER = [
+    'institution name', 'criterion', 'policy', 'link of policy',
+    'text of policy', 'comment', 'score'
+]
+
+
+def get_institution_rows(count):
+    return [
+        [
+            f'Institution {i}', f'Region {i % 20}', f'Country {i % 5}',
+            f'info@institution-{i}.org;press@institution-{i}.org',
+            f'facebook.com/institution-{i}', '', '', '', '',
+            f'institution-{i}.org'
+        ]
+        for i in range(count)
+    ]
+
+
+def get_policy_rows(count):
+    return [
+        [
+            f'Institution {i // 10}', f'Criterion {i % 10}', f'Policy {i}',
+            f'institution-{i // 10}.org/policy-{i}',
+            f'Policy *{i}* text.\nSecond line with "quotes".', '', str(i % 4)
+        ]
+        for i in range(count)
+    ]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures per-row processing time of CSV importers on generated '
+        'rows: cleaning of rows and (for institutions) assigning values in '
+        'bulk mode without database access, optionally the whole import '
+        'of institutions which is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=20000,
+            help='Number of generated rows (defaults to 20000).'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Number of runs, the best one is reported (defaults to 3).'
+        )
+        parser.add_argument(
+            '--database', action='store_true',
+            help='Measure also the whole institution import into database '
+                 '(rolled back at the end).'
+        )
+
+    def measure(self, name, rows, repeat, fn):
+        best = min(self.time(fn) for _i in range(max(repeat, 1)))
+        self.stdout.write(
+            f'{name}: {best:.3f}s, {best * 1e6 / len(rows):.1f}us per row, '
+            f'{len(rows) / best:.0f} rows/s'
+        )
+
+    @staticmethod
+    def time(fn):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    @staticmethod
+    def get_importer(importer_class, header):
+        importer = importer_class()
+        importer.process_header(header)
+        return importer
+
+    def handle(self, *args, **options):
+        count, repeat = options['rows'], options['repeat']
+        if count < 1:
+            raise CommandError('Number of rows has to be at least 1.')
+        institution_rows = get_institution_rows(count)
+        policy_rows = get_policy_rows(count)
+
+        def clean_rows(importer_class, header, rows):
+            importer = self.get_importer(importer_class, header)
+            for row_index, row in enumerate(rows, start=1):
+                importer.clean_row(row_index, row)
+
+        def process_rows():
+            importer = self.get_importer(
+                CsvInstitutionImporter, INSTITUTION_HEADER
+            )
+            importer.instances_by_key = {}  # no existing institutions
+            chunk = CsvImportChunk()
+            for row_index, row in enumerate(institution_rows, start=1):
+                importer.process_row(row_index, row, chunk=chunk)
+                if len(chunk) >= importer.chunk_size:
+                    chunk = CsvImportChunk()
+
+        self.measure(
+            'clean institution rows', institution_rows, repeat,
+            lambda: clean_rows(
+                CsvInstitutionImporter, INSTITUTION_HEADER, institution_rows
+            )
+        )
+        self.measure(
+            'clean policy rows', policy_rows, repeat,
+            lambda: clean_rows(CsvPolicyImporter, POLICY_HEADER, policy_rows)
+        )
+        self.measure(
+            'process institution rows (bulk mode, no database)',
+            institution_rows, repeat, process_rows
+        )
+
+        if options['database']:
+            content = '\n'.join(
+                ';'.join(row)
+                for row in [INSTITUTION_HEADER] + institution_rows
+            ).encode('utf-8')
+
+            def import_institutions():
+                try:
+                    with transaction.atomic():
+                        CsvInstitutionImporter().import_data(
+                            io.BytesIO(content)
+                        )
+                        raise _Rollback
+                except _Rollback:
+                    pass
+
+            self.measure(
+                'import institutions (rolled back)', institution_rows, 1,
+                import_institutions
+            )
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from comparer.ranking import RANKING_MODELS, RankingSnapshot
+from comparer.signals import get_data_signature
+
+
+class Command(BaseCommand):
+    help = 'Writes ranking snapshot file shared by worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=settings.RANKING_SNAPSHOT_FILE,
+            help='Snapshot file path (defaults to RANKING_SNAPSHOT_FILE).'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            raise CommandError(
+                'Snapshot path is not given and RANKING_SNAPSHOT_FILE '
+                'setting is not set.'
+            )
+
+        start = time.monotonic()
+        snapshot = RankingSnapshot.build(get_data_signature(*RANKING_MODELS))
+        snapshot.save(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ranking snapshot of {len(snapshot.ids)} institutions written '
+            f'to "{path}" in {time.monotonic() - start:.2f}s.'
+        ))
@@ -0,0 +1,323 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count, Max
+from django.test import Client
+from django.urls import reverse
+from django.utils import translation
+
+from cms.models import CMSPlugin, Page
+
+from common.models import DataVersion
+from common.placeholders import CMS_VERSION_KEY, VERSION_KEY
+from comparer.api_views import *
+from comparer.models import *
+from comparer.ranking import RANKING_MODELS
+from comparer.signals import get_data_signature
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+RANKING_PLUGIN_TYPES = (
+    'RankingBoxPluginPublisher', 'RankingBrowserPluginPublisher'
+)
+
+MANIFEST_NAME = '.prerender.json'
+
+JSON_ACCEPT = 'application/json'
+
+
+# kind - group of targets reported together
+# url - rendered URL
+# path - output file path relative to the output directory
+# accept - value of Accept header of the request
+# signature - digest of input data, target is rendered again when changed
+Target = namedtuple('Target', ['kind', 'url', 'path', 'accept', 'signature'])
+
+
+def get_digest(*values):
+    return hashlib.md5(repr(values).encode('utf-8')).hexdigest()
+
+
+def get_output_path(url, extension):
+    return os.path.join(url.strip('/'), f'index.{extension}')
+
+
+def get_institution_signatures():
+    """
+    Returns dictionary of data signatures of active institutions by id.
+    Signature changes with any change of the institution, its scores,
+    policies, e-mails and social media links.
+    """
+    related = defaultdict(list)
+    for model, field in (
+        (InstitutionScore, 'institution_id'),
+        (InstitutionPolicy, 'score__institution_id'),
+        (InstitutionEmail, 'institution_id'),
+        (SocialMediaLink, 'institution_id'),
+    ):
+        for institution_id, timestamp, count in model.objects.values_list(
+            field
+        ).annotate(Max('modification_timestamp'), Count('pk')).order_by():
+            related[institution_id].append((model.__name__, timestamp, count))
+
+    return {
+        pk: (timestamp, sorted(related[pk]))
+        for pk, timestamp in Institution.objects.active().values_list(
+            'id', 'modification_timestamp'
+        )
+    }
+
+
+def get_targets():
+    """
+    Returns list of all targets to render.
+    """
+    targets = []
+    # pages contain content placeholders and CMS menu and static placeholders
+    content_signature = DataVersion.objects.get_signature(
+        VERSION_KEY, CMS_VERSION_KEY
+    )
+    shared_signature = (
+        get_data_signature(PolicyCategory, PolicyCriterion), content_signature
+    )
+    institution_signatures = get_institution_signatures()
+    slugs = dict(Institution.objects.active().values_list('id', 'slug'))
+
+    for language, _name in settings.LANGUAGES:
+        with translation.override(language):
+            for pk, signature in institution_signatures.items():
+                url = reverse('institution-detail', kwargs={'slug': slugs[pk]})
+                targets.append(Target(
+                    'institution pages', url, get_output_path(url, 'html'),
+                    None, get_digest(shared_signature, signature)
+                ))
+
+    ranking_signature = (
+        get_data_signature(*RANKING_MODELS), content_signature
+    )
+    pages = CMSPlugin.objects.filter(
+        plugin_type__in=RANKING_PLUGIN_TYPES,
+        placeholder__page__publisher_is_draft=False
+    ).values_list('placeholder__page', 'language').distinct().order_by()
+    for page_id, language in pages:
+        page = Page.objects.get(pk=page_id)
+        if not page.is_published(language):
+            continue
+        url = page.get_absolute_url(language)
+        targets.append(Target(
+            'ranking pages', url, get_output_path(url, 'html'), None,
+            get_digest(ranking_signature, page.changed_date)
+        ))
+
+    for name, view in (
+        ('ranking-bootstrap', RankingBootstrapView),
+        ('institution-list', InstitutionViewSet),
+        ('policycategory-list', PolicyCategoryViewSet),
+        ('message-templates', MessageTemplateList),
+    ):
+        url = reverse(name)
+        targets.append(Target(
+            'API payloads', url, get_output_path(url, 'json'), JSON_ACCEPT,
+            get_digest(get_data_signature(*view.data_models))
+        ))
+    # payloads contain ranks, which change with scores of any institution
+    ranks_signature = get_data_signature(*RANKING_MODELS)
+    for pk, signature in institution_signatures.items():
+        url = reverse('institution-detail', kwargs={'pk': pk})
+        targets.append(Target(
+            'API payloads', url, get_output_path(url, 'json'), JSON_ACCEPT,
+            get_digest(shared_signature, ranks_signature, signature)
+        ))
+    return targets
+
+
+def write_file(path, content):
+    """
+    Replaces file atomically, so the file server never sees partial content.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def init_worker():
+    django.setup()
+    # connections inherited from the parent process must not be shared
+    connections.close_all()
+
+
+def render_target(target, output_dir, host, secure):
+    """
+    Renders the target and writes it with its gzip and brotli compressed
+    siblings. Runs in worker process.
+    Returns tuple of target, render time and error message (or None).
+    """
+    start = time.monotonic()
+    extra = {'HTTP_ACCEPT': target.accept} if target.accept else {}
+    try:
+        response = Client(HTTP_HOST=host).get(
+            target.url, secure=secure, **extra
+        )
+    except Exception as e:
+        return target, time.monotonic() - start, repr(e)
+    if response.status_code != 200:
+        return (
+            target, time.monotonic() - start,
+            f'HTTP status {response.status_code}'
+        )
+
+    path = os.path.join(output_dir, target.path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    content = response.content
+    write_file(path, content)
+    write_file(f'{path}.gz', gzip.compress(content, 9, mtime=0))
+    if brotli is not None:
+        write_file(f'{path}.br', brotli.compress(content))
+    return target, time.monotonic() - start, None
+
+
+def remove_target_files(output_dir, path):
+    for suffix in ('', '.gz', '.br'):
+        try:
+            os.remove(os.path.join(output_dir, path + suffix))
+        except FileNotFoundError:
+            pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders institution detail pages, CMS pages with ranking plugins '
+        'and API payloads into static files (with gzip and brotli '
+        'compressed siblings) which can be served by a plain file server. '
+        'Only targets which input data changed since the last run '
+        'are rendered.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.PRERENDER_ROOT,
+            help='Output directory (defaults to PRERENDER_ROOT).'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='Number of worker processes (defaults to CPU count).'
+        )
+        parser.add_argument(
+            '--host', default=next((
+                host for host in settings.ALLOWED_HOSTS
+                if host != '*' and not host.startswith('.')
+            ), 'localhost'),
+            help='Host name used in absolute URLs.'
+        )
+        parser.add_argument(
+            '--secure', action='store_true',
+            help='Render as requested over HTTPS.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Render all targets (e.g. after templates changed).'
+        )
+
+    def load_manifest(self, output_dir):
+        try:
+            with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_manifest(self, output_dir, manifest):
+        write_file(
+            os.path.join(output_dir, MANIFEST_NAME),
+            json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8')
+        )
+
+    def handle(self, *args, **options):
+        output_dir = options['output']
+        if not output_dir:
+            raise CommandError(
+                'Output directory is not given and PRERENDER_ROOT '
+                'setting is not set.'
+            )
+        os.makedirs(output_dir, exist_ok=True)
+        if brotli is None:
+            self.stderr.write(self.style.WARNING(
+                'Brotli package is not installed, .br files are not written.'
+            ))
+
+        start = time.monotonic()
+        manifest = {} if options['force'] else self.load_manifest(output_dir)
+        targets = get_targets()
+        changed = [
+            target for target in targets
+            if manifest.get(target.path) != target.signature
+        ]
+
+        current_paths = {target.path for target in targets}
+        for path in list(manifest):
+            if path not in current_paths:
+                remove_target_files(output_dir, path)
+                del manifest[path]
+
+        self.stdout.write(
+            f'{len(changed)} of {len(targets)} targets changed '
+            f'(collected in {time.monotonic() - start:.2f}s).'
+        )
+
+        stats = defaultdict(lambda: {'count': 0, 'time': 0.0, 'failed': 0})
+        render_start = time.monotonic()
+        if changed:
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=max(options['processes'], 1),
+                initializer=init_worker
+            ) as executor:
+                results = executor.map(
+                    partial(
+                        render_target, output_dir=output_dir,
+                        host=options['host'], secure=options['secure']
+                    ),
+                    changed, chunksize=16
+                )
+                for target, elapsed, error in results:
+                    kind_stats = stats[target.kind]
+                    kind_stats['count'] += 1
+                    kind_stats['time'] += elapsed
+                    if error is None:
+                        manifest[target.path] = target.signature
+                    else:
+                        kind_stats['failed'] += 1
+                        manifest.pop(target.path, None)
+                        self.stderr.write(self.style.ERROR(
+                            f'{target.url}: {error}'
+                        ))
+        self.save_manifest(output_dir, manifest)
+
+        for kind, kind_stats in sorted(stats.items()):
+            self.stdout.write(
+                f'{kind}: {kind_stats["count"]} rendered '
+                f'({kind_stats["failed"]} failed), '
+                f'{kind_stats["time"] * 1000 / kind_stats["count"]:.1f}ms '
+                f'per target'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {len(changed)} targets to "{output_dir}" in '
+            f'{time.monotonic() - render_start:.2f}s '
+            f'(total {time.monotonic() - start:.2f}s).'
+        ))
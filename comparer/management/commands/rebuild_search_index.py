@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from comparer.search import search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds full-text search index of institutions and their policies '
+        '(the index is updated on every change, rebuild is needed only '
+        'after changes made bypassing model signals).'
+    )
+
+    def handle(self, *args, **options):
+        if not search_index.is_available:
+            raise CommandError(
+                'Full-text search is not supported by the database.'
+            )
+
+        start = time.monotonic()
+        count = search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index of {count} institutions rebuilt '
+            f'in {time.monotonic() - start:.2f}s.'
+        ))
@@ -0,0 +1,151 @@
+import time
+import traceback
+import zipfile
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from common.import_tools import CsvImportError, ZipImporter, count_csv_rows
+
+from comparer.admin import CsvInstitutionImporter, CsvPolicyImporter
+from comparer.import_jobs import clear_job_progress, set_job_progress
+from comparer.models import ImportJob, Institution
+
+
+LOGO_EXTENSIONS = ['bmp', 'gif', 'png', 'jpg', 'jpeg', 'ico']
+
+
+class ImportJobRunner(object):
+    """
+    Runs importer of the job and records its result. Caches of web
+    processes are not cleared by the worker, they are keyed by data
+    versions bumped by the import (see comparer.page_cache).
+    """
+    # invalid rows of CSV file reported before the import is stopped
+    max_errors = 100
+
+    def run(self, job):
+        """
+        Processes job claimed by ImportJob.objects.claim_next().
+        """
+        handler = {
+            ImportJob.INSTITUTIONS: self.import_institutions,
+            ImportJob.POLICIES: self.import_policies,
+            ImportJob.LOGOS: self.import_logos,
+        }[job.kind]
+        try:
+            with job.file.open('rb') as file:
+                job.message = handler(job, file)
+        except (CsvImportError, zipfile.BadZipFile) as err:
+            job.status = ImportJob.FAILED
+            job.message = f'Import failed: {err}'
+        except Exception as err:
+            job.status = ImportJob.FAILED
+            job.message = f'Unexpected error: {err}'
+            raise
+        else:
+            job.status = ImportJob.DONE
+        finally:
+            job.finished_at = timezone.now()
+            job.save()
+            clear_job_progress(job)
+
+    def import_csv(self, job, file, importer):
+        importer.max_errors = self.max_errors
+        job.rows_total = count_csv_rows(file, job.delimiter)
+        job.save(update_fields=['rows_total'])
+        try:
+            return importer.import_data(
+                file,
+                delimiter=job.delimiter,
+                override_existing=job.override_existing,
+                progress=lambda count: set_job_progress(job, count)
+            )
+        finally:
+            job.errors = importer.errors
+
+    def import_institutions(self, job, file):
+        institutions = self.import_csv(job, file, CsvInstitutionImporter())
+        return (
+            f'{len(institutions)} institutions have been successfully '
+            'imported from csv file.'
+        )
+
+    def import_policies(self, job, file):
+        policies = self.import_csv(job, file, CsvPolicyImporter())
+        return (
+            f'{len(policies)} policies have been successfully imported '
+            'from csv file.'
+        )
+
+    def import_logos(self, job, file):
+        with zipfile.ZipFile(file, 'r') as archive:
+            job.rows_total = len(archive.namelist())
+        job.save(update_fields=['rows_total'])
+
+        importer = ZipImporter(
+            model=Institution, file_fname='logo', query_fname='name',
+            allowed_ext=LOGO_EXTENSIONS
+        )
+        imported_count, errors_list, unrecog_list = importer.import_data(
+            file, progress=lambda count: set_job_progress(job, count)
+        )
+        job.errors = [
+            f'Encountered errors while processing "{name}".'
+            for name in errors_list
+        ] + [
+            f'Unrecognized file in the archive: "{name}".'
+            for name in unrecog_list
+        ]
+        return (
+            f'Successfully assigned logo files to {imported_count} '
+            'institutions.'
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        'Processes import jobs queued by admin import views, one at a time '
+        'in order of creation. Several workers may run at once, every job '
+        'is claimed by single worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when no job is pending instead of waiting for new jobs.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help='Seconds between checks for new jobs.'
+        )
+
+    def handle(self, *args, **options):
+        runner = ImportJobRunner()
+        try:
+            while True:
+                close_old_connections()
+                job = ImportJob.objects.claim_next()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+                self.run_job(runner, job)
+        except KeyboardInterrupt:
+            pass
+
+    def run_job(self, runner, job):
+        self.stdout.write(f'Running job {job.pk} ({job}).')
+        start = time.monotonic()
+        try:
+            runner.run(job)
+        except Exception:
+            self.stderr.write(traceback.format_exc())
+        style = self.style.SUCCESS if job.status == ImportJob.DONE \
+            else self.style.ERROR
+        self.stdout.write(style(
+            f'Job {job.pk} {job.get_status_display()} '
+            f'in {time.monotonic() - start:.2f}s: {job.message}'
+        ))
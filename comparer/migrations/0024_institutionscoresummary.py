@@ -0,0 +1,58 @@
+# Generated by Django 3.1.13 on 2026-10-18 08:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def summary_initial_values(apps, schema_editor):
+    Institution = apps.get_model('comparer', 'Institution')
+    InstitutionScore = apps.get_model('comparer', 'InstitutionScore')
+    InstitutionScoreSummary = apps.get_model(
+        'comparer', 'InstitutionScoreSummary'
+    )
+
+    summaries = {
+        pk: InstitutionScoreSummary(institution_id=pk, category_scores={})
+        for pk in Institution.objects.values_list('pk', flat=True)
+    }
+    grouped_scores = InstitutionScore.objects.filter(
+        is_active=True,
+        criterion__is_active=True,
+        criterion__category__is_active=True
+    ).values(
+        'institution_id', 'criterion__category__slug'
+    ).annotate(sum=models.Sum('score')).order_by()
+
+    for row in grouped_scores:
+        summary = summaries[row['institution_id']]
+        summary.category_scores[row['criterion__category__slug']] = row['sum']
+        summary.score_total = (summary.score_total or 0) + row['sum']
+
+    InstitutionScoreSummary.objects.bulk_create(
+        summaries.values(), batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comparer', '0023_auto_20210922_1933'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstitutionScoreSummary',
+            fields=[
+                ('institution', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score_summary', serialize=False, to='comparer.institution', verbose_name='institution')),
+                ('score_total', models.IntegerField(blank=True, db_index=True, null=True, verbose_name='total score')),
+                ('category_scores', models.JSONField(blank=True, default=dict, help_text='Sums of scores mapped by policy category slug.', verbose_name='category scores')),
+            ],
+            options={
+                'verbose_name': 'Institution score summary',
+                'verbose_name_plural': 'Institution score summaries',
+            },
+        ),
+        migrations.RunPython(
+            summary_initial_values, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.13 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comparer', '0024_institutionscoresummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankingbrowserpluginmodel',
+            name='page_size',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Number of institutions loaded at once while scrolling down (infinite scroll). Set 0 to load all institutions at once.', verbose_name='page size'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.1.13 on 2026-10-18 09:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_regions_and_countries(apps, schema_editor):
+    Institution = apps.get_model('comparer', 'Institution')
+    Region = apps.get_model('comparer', 'Region')
+    Country = apps.get_model('comparer', 'Country')
+
+    lookups = {'region': {}, 'country': {}}
+    institutions = list(Institution.objects.all())
+    for institution in institutions:
+        for field, model in (('region', Region), ('country', Country)):
+            name = getattr(institution, field).strip()
+            if not name:
+                continue
+            key = name.casefold()
+            if key not in lookups[field]:
+                lookups[field][key] = model.objects.create(name=name, key=key)
+            setattr(institution, f'{field}_ref', lookups[field][key])
+    Institution.objects.bulk_update(
+        institutions, ['region_ref', 'country_ref'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comparer', '0025_rankingbrowserpluginmodel_page_size'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Country',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('key', models.CharField(help_text='Case folded name.', max_length=100, unique=True, verbose_name='key')),
+            ],
+            options={
+                'verbose_name': 'Country',
+                'verbose_name_plural': 'Countries',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='name')),
+                ('key', models.CharField(help_text='Case folded name.', max_length=100, unique=True, verbose_name='key')),
+            ],
+            options={
+                'verbose_name': 'Region',
+                'verbose_name_plural': 'Regions',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='institution',
+            name='country_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='institutions', to='comparer.country', verbose_name='country (normalized)'),
+        ),
+        migrations.AddField(
+            model_name='institution',
+            name='region_ref',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='institutions', to='comparer.region', verbose_name='region (normalized)'),
+        ),
+        migrations.RunPython(
+            link_regions_and_countries, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,107 @@
+import unicodedata
+from collections import defaultdict
+
+from django.db import migrations
+
+
+# Copy of the index layout of comparer.search at the time of this migration,
+# the migration must not depend on the current application code.
+TABLE_NAME = 'comparer_search_index'
+
+
+def normalize_text(text):
+    return ''.join(
+        char for char in unicodedata.normalize('NFKD', text.casefold())
+        if not unicodedata.combining(char)
+    )
+
+
+def get_documents(apps):
+    Institution = apps.get_model('comparer', 'Institution')
+    InstitutionPolicy = apps.get_model('comparer', 'InstitutionPolicy')
+
+    titles = defaultdict(list)
+    texts = defaultdict(list)
+    for institution_id, title, text in InstitutionPolicy.objects.filter(
+        is_active=True, score__is_active=True
+    ).values_list('score__institution_id', 'title', 'text').order_by('pk'):
+        titles[institution_id].append(title)
+        texts[institution_id].append(text)
+
+    return [
+        (
+            pk,
+            normalize_text(name),
+            normalize_text(f'{region} {country}'),
+            normalize_text('\n'.join(titles[pk])),
+            normalize_text('\n'.join(texts[pk]))
+        )
+        for pk, name, region, country in Institution.objects.filter(
+            is_active=True
+        ).values_list('id', 'name', 'region', 'country').order_by('pk')
+    ]
+
+
+def create_sqlite_index(cursor, documents):
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE {TABLE_NAME} USING fts5('
+        f'name, places, policy_titles, policy_texts, '
+        f"tokenize='unicode61 remove_diacritics 0', prefix='2 3')"
+    )
+    cursor.executemany(
+        f'INSERT INTO {TABLE_NAME} (rowid, name, places, '
+        f'policy_titles, policy_texts) VALUES (%s, %s, %s, %s, %s)',
+        documents
+    )
+
+
+def create_postgresql_index(cursor, documents):
+    cursor.execute(
+        f'CREATE TABLE {TABLE_NAME} ('
+        f'institution_id integer PRIMARY KEY, '
+        f'document tsvector NOT NULL)'
+    )
+    cursor.execute(
+        f'CREATE INDEX {TABLE_NAME}_document ON {TABLE_NAME} '
+        f'USING gin (document)'
+    )
+    document_sql = ' || '.join(
+        f"setweight(to_tsvector('simple', %s), '{label}')"
+        for label in ('A', 'B', 'C', 'D')
+    )
+    cursor.executemany(
+        f'INSERT INTO {TABLE_NAME} (institution_id, document) '
+        f'VALUES (%s, {document_sql})',
+        documents
+    )
+
+
+CREATE_INDEX = {
+    'sqlite': create_sqlite_index,
+    'postgresql': create_postgresql_index,
+}
+
+
+def create_search_index(apps, schema_editor):
+    create_index = CREATE_INDEX.get(schema_editor.connection.vendor)
+    if create_index is None:  # search falls back to the ranking snapshot
+        return
+    with schema_editor.connection.cursor() as cursor:
+        create_index(cursor, get_documents(apps))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comparer', '0026_region_country'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 3.1.13 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+def refresh_summaries(apps, institution_ids):
+    """
+    Recalculates score summaries of given institutions (maintained by model
+    signals, which do not run in migrations).
+    """
+    InstitutionScore = apps.get_model('comparer', 'InstitutionScore')
+    InstitutionScoreSummary = apps.get_model(
+        'comparer', 'InstitutionScoreSummary'
+    )
+
+    summaries = {
+        pk: InstitutionScoreSummary(institution_id=pk, category_scores={})
+        for pk in institution_ids
+    }
+    grouped_scores = InstitutionScore.objects.filter(
+        institution_id__in=institution_ids,
+        is_active=True,
+        criterion__is_active=True,
+        criterion__category__is_active=True
+    ).values(
+        'institution_id', 'criterion__category__slug'
+    ).annotate(sum=models.Sum('score')).order_by()
+
+    for row in grouped_scores:
+        summary = summaries[row['institution_id']]
+        summary.category_scores[row['criterion__category__slug']] = row['sum']
+        summary.score_total = (summary.score_total or 0) + row['sum']
+
+    InstitutionScoreSummary.objects.filter(
+        institution_id__in=institution_ids
+    ).delete()
+    InstitutionScoreSummary.objects.bulk_create(
+        summaries.values(), batch_size=500
+    )
+
+
+def bump_data_versions(apps, keys):
+    """
+    Makes processes reload data cached by versions of given keys
+    (bumped by model signals outside of migrations).
+    """
+    DataVersion = apps.get_model('common', 'DataVersion')
+
+    for key in keys:
+        DataVersion.objects.get_or_create(key=key)
+    DataVersion.objects.filter(key__in=keys).update(
+        version=models.F('version') + 1
+    )
+
+
+def merge_duplicate_scores(apps, schema_editor):
+    """
+    Keeps the oldest score of each institution and criterion, policies
+    of its duplicates are moved to it. Summaries of affected institutions
+    are recalculated.
+    """
+    Institution = apps.get_model('comparer', 'Institution')
+    InstitutionScore = apps.get_model('comparer', 'InstitutionScore')
+    InstitutionPolicy = apps.get_model('comparer', 'InstitutionPolicy')
+
+    kept = {}
+    duplicates = {}
+    institution_ids = set()
+    for pk, institution_id, criterion_id in InstitutionScore.objects.order_by(
+        'pk'
+    ).values_list('pk', 'institution_id', 'criterion_id'):
+        key = (institution_id, criterion_id)
+        if key in kept:
+            duplicates[pk] = kept[key]
+            institution_ids.add(institution_id)
+        else:
+            kept[key] = pk
+    if not duplicates:
+        return
+
+    for duplicate_pk, kept_pk in duplicates.items():
+        InstitutionPolicy.objects.filter(score_id=duplicate_pk).update(
+            score_id=kept_pk
+        )
+    InstitutionScore.objects.filter(pk__in=list(duplicates)).delete()
+    refresh_summaries(apps, list(institution_ids))
+    # models and institution pages, see comparer.signals
+    bump_data_versions(apps, [
+        'comparer.institutionscore', 'comparer.institutionscoresummary',
+        'comparer.institutionpolicy'
+    ] + [
+        f'comparer.institution:{slug}'
+        for slug in Institution.objects.filter(
+            pk__in=institution_ids
+        ).values_list('slug', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0007_dataversion'),
+        ('comparer', '0027_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_scores, migrations.RunPython.noop
+        ),
+        migrations.AlterUniqueTogether(
+            name='institutionscore',
+            unique_together={('institution', 'criterion')},
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.1.13 on 2026-10-18 09:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('comparer', '0028_institutionscore_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_timestamp', models.DateTimeField(auto_now_add=True, verbose_name='Creation time stamp')),
+                ('modification_timestamp', models.DateTimeField(auto_now=True, verbose_name='Modification time stamp')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'institutions from CSV'), (2, 'policies from CSV'), (3, 'logos from ZIP')], verbose_name='kind')),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'pending'), (2, 'running'), (3, 'done'), (4, 'failed')], default=1, verbose_name='status')),
+                ('file', models.FileField(upload_to='comparer/import', verbose_name='file')),
+                ('delimiter', models.CharField(blank=True, max_length=1, verbose_name='CSV column delimiter')),
+                ('override_existing', models.BooleanField(default=False, verbose_name='override existing')),
+                ('rows_total', models.PositiveIntegerField(blank=True, null=True, verbose_name='rows total')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='rows processed')),
+                ('message', models.TextField(blank=True, verbose_name='message')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='errors')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='started at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='finished at')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='created by')),
+            ],
+            options={
+                'verbose_name': 'Import job',
+                'verbose_name_plural': 'Import jobs',
+                'ordering': ('-pk',),
+            },
+        ),
+    ]
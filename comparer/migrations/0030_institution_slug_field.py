@@ -0,0 +1,19 @@
+# Generated by Django 3.1.13 on 2026-10-18 10:58
+
+import common.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comparer', '0029_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='institution',
+            name='slug',
+            field=common.fields.BulkAutoSlugField(editable=True, populate_from='name', unique=True, verbose_name='slug'),
+        ),
+    ]
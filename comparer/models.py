@@ -1,11 +1,13 @@
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import ugettext_lazy as _
-from django.db.models import Sum, Q
-from django.conf import settings
+from django.db.models import F, Sum, Window
+from django.utils import timezone
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import DenseRank, Rank
 
-from autoslug import AutoSlugField
 from djangocms_bootstrap4.fields import AttributesField, TagTypeField
 from imagekit.models import ProcessedImageField, ImageSpecField
 from imagekit.processors import ResizeToFit
@@ -14,13 +16,15 @@ from markdownfield.validators import VALIDATOR_STANDARD
 
 from cms.models import CMSPlugin
 
+from common.fields import BulkAutoSlugField
 from common.managers import ActivableModelQuerySet
 from common.models import TimestampedModel, ActivableModel, OrderedModel
 
 
 __all__ = (
-    'PolicyCategory', 'PolicyCriterion', 'Institution', 'SocialMediaLink', 'InstitutionEmail', 'InstitutionScore',
-    'InstitutionPolicy', 'MessageTemplate', 'RankingBoxPluginModel', 'RankingBrowserPluginModel'
+    'PolicyCategory', 'PolicyCriterion', 'Region', 'Country', 'Institution', 'SocialMediaLink', 'InstitutionEmail', 'InstitutionScore',
+    'InstitutionPolicy', 'InstitutionScoreSummary', 'MessageTemplate', 'ImportJob', 'RankingBoxPluginModel',
+    'RankingBrowserPluginModel'
 )
 
 
@@ -67,16 +71,137 @@ class PolicyCriterion(OrderedModel, ActivableModel, TimestampedModel):
         return self.name
 
 
+class LookupNameQuerySet(models.QuerySet):
+
+    @staticmethod
+    def get_key(name):
+        return name.strip().casefold()
+
+    def get_for_name(self, name):
+        """
+        Returns instance matching the name case-insensitively (created
+        if it does not exist) or None for empty name.
+        """
+        if not name or not name.strip():
+            return None
+        return self.get_or_create(
+            key=self.get_key(name), defaults={'name': name.strip()}
+        )[0]
+
+    def get_for_names(self, names):
+        """
+        Returns dictionary of instances matching the names case-insensitively
+        by key (missing instances are created), empty names are ignored.
+        Bulk variant of get_for_name() with constant number of queries.
+        """
+        names_by_key = {}
+        for name in names:
+            if name and name.strip():
+                names_by_key.setdefault(self.get_key(name), name.strip())
+        instances = {obj.key: obj for obj in self.filter(key__in=names_by_key)}
+        missing = [
+            self.model(key=key, name=name)
+            for key, name in names_by_key.items() if key not in instances
+        ]
+        if missing:
+            self.bulk_create(missing)
+            instances.update(
+                (obj.key, obj)
+                for obj in self.filter(key__in=[obj.key for obj in missing])
+            )
+        return instances
+
+    def filter_names(self, names):
+        """
+        Filters instances matching any of the names case-insensitively.
+        """
+        return self.filter(key__in=[self.get_key(name) for name in names])
+
+
+class Region(models.Model):
+    """
+    Normalized region of institutions. Kept in sync with Institution.region.
+    """
+    name = models.CharField(_('name'), max_length=100)
+    key = models.CharField(
+        _('key'), max_length=100, unique=True,
+        help_text=_('Case folded name.')
+    )
+
+    objects = LookupNameQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Region')
+        verbose_name_plural = _('Regions')
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class Country(models.Model):
+    """
+    Normalized country of institutions. Kept in sync with Institution.country.
+    """
+    name = models.CharField(_('name'), max_length=100)
+    key = models.CharField(
+        _('key'), max_length=100, unique=True,
+        help_text=_('Case folded name.')
+    )
+
+    objects = LookupNameQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Country')
+        verbose_name_plural = _('Countries')
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class InstitutionQuerySet(ActivableModelQuerySet):
 
     def with_scores(self):
+        """
+        Annotates institutions with total and per category scores read from
+        the denormalized InstitutionScoreSummary table. Score of each active
+        category is annotated as "score_<slug>".
+        """
+        from .registry import category_registry
+
         query_dict = {
-            'score_total': models.Sum('scores__score')
+            'score_total': F('score_summary__score_total')
         }
-        for slug in settings.POLICY_CATEGORY_SLUGS:
-            query_dict[f'score_{slug}'] = Sum(
-                'scores__score',
-                filter=Q(scores__criterion__category__slug=slug)
+        for slug in category_registry.slugs:
+            query_dict[f'score_{slug}'] = KeyTransform(
+                slug, 'score_summary__category_scores'
+            )
+        return self.annotate(**query_dict)
+
+    def with_ranks(self):
+        """
+        Annotates institutions with positions by total and per category
+        scores computed with SQL window functions: competition ranks
+        (1, 2, 2, 4) as "rank_total" and "rank_<slug>" and dense ranks
+        (1, 2, 2, 3) as "dense_rank_total" and "dense_rank_<slug>".
+        Requires with_scores() to be applied before.
+
+        Window functions are evaluated after filters, so positions are
+        relative to institutions matched by filters applied so far
+        (e.g. region or country). Institutions without scores are ranked
+        last.
+        """
+        from .registry import category_registry
+
+        query_dict = {}
+        for key in ['total'] + category_registry.slugs:
+            order_by = F(f'score_{key}').desc(nulls_last=True)
+            query_dict[f'rank_{key}'] = Window(
+                expression=Rank(), order_by=order_by
+            )
+            query_dict[f'dense_rank_{key}'] = Window(
+                expression=DenseRank(), order_by=order_by
             )
         return self.annotate(**query_dict)
 
@@ -86,12 +211,22 @@ class Institution(ActivableModel, TimestampedModel):
     LOGO_THUMB_WIDTH, LOGO_THUMB_HEIGHT = 30, 30
 
     name = models.CharField(_('name'), max_length=250)
-    slug = AutoSlugField(
+    slug = BulkAutoSlugField(
         _('slug'), editable=True, populate_from='name', unique=True
     )
     description = models.TextField(_('description'), blank=True)
     region = models.CharField(_('region'), max_length=100, blank=True)
     country = models.CharField(_('country'), max_length=100)
+    region_ref = models.ForeignKey(
+        Region, verbose_name=_('region (normalized)'),
+        null=True, blank=True, editable=False, on_delete=models.SET_NULL,
+        related_name='institutions'
+    )
+    country_ref = models.ForeignKey(
+        Country, verbose_name=_('country (normalized)'),
+        null=True, blank=True, editable=False, on_delete=models.SET_NULL,
+        related_name='institutions'
+    )
     logo = ProcessedImageField(
         verbose_name=_('logo'),
         upload_to='comparer/institution/logo',
@@ -117,6 +252,20 @@ class Institution(ActivableModel, TimestampedModel):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # keeping normalized region and country in sync with text fields
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'region' in update_fields:
+            self.region_ref = Region.objects.get_for_name(self.region)
+        if update_fields is None or 'country' in update_fields:
+            self.country_ref = Country.objects.get_for_name(self.country)
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                f'{name}_ref' for name in ('region', 'country')
+                if name in update_fields
+            }
+        super().save(*args, **kwargs)
+
     @property
     def total_score(self):
         return self.scores.active().aggregate(sum=models.Sum('score'))['sum']
@@ -179,10 +328,90 @@ class InstitutionScore(ActivableModel, TimestampedModel):
 
     # policies - defined in comparer.InstitutionPolicy.score
 
+    class Meta:
+        unique_together = [('institution', 'criterion')]
+
     def __str__(self):
         return f'{self.criterion.name}: {self.score}'
 
 
+class InstitutionScoreSummaryQuerySet(models.QuerySet):
+    REFRESH_CHUNK_SIZE = 500
+
+    def refresh(self, institution_ids=None):
+        """
+        Recalculates summaries of given institutions (or all institutions
+        if institution_ids is None). Only active scores of active criterions
+        and categories are counted. Old summaries are deleted without
+        signals, the refresh is reported as single change by the caller.
+        """
+        with transaction.atomic():
+            if institution_ids is None:
+                self.all()._raw_delete(self.db)
+                self._create_summaries(Institution.objects.all())
+                return
+
+            institution_ids = list(set(institution_ids))
+            for i in range(0, len(institution_ids), self.REFRESH_CHUNK_SIZE):
+                chunk = institution_ids[i:i + self.REFRESH_CHUNK_SIZE]
+                self.filter(institution_id__in=chunk)._raw_delete(self.db)
+                self._create_summaries(
+                    Institution.objects.filter(pk__in=chunk)
+                )
+
+    def _create_summaries(self, institutions):
+        """
+        Sums scores of given institutions per category with single grouped
+        query and saves the results.
+        """
+        summaries = {
+            pk: self.model(institution_id=pk, category_scores={})
+            for pk in institutions.values_list('pk', flat=True)
+        }
+        grouped_scores = InstitutionScore.objects.active().filter(
+            institution__in=institutions,
+            criterion__is_active=True,
+            criterion__category__is_active=True
+        ).values(
+            'institution_id', 'criterion__category__slug'
+        ).annotate(sum=Sum('score')).order_by()
+
+        for row in grouped_scores:
+            summary = summaries[row['institution_id']]
+            summary.category_scores[row['criterion__category__slug']] = \
+                row['sum']
+            summary.score_total = (summary.score_total or 0) + row['sum']
+
+        self.bulk_create(summaries.values(), batch_size=500)
+
+
+class InstitutionScoreSummary(models.Model):
+    """
+    Denormalized institution scores maintained by comparer.signals.
+    """
+    institution = models.OneToOneField(
+        verbose_name=_('institution'), to=Institution,
+        on_delete=models.CASCADE, primary_key=True,
+        related_name='score_summary'
+    )
+    score_total = models.IntegerField(
+        _('total score'), null=True, blank=True, db_index=True
+    )
+    category_scores = models.JSONField(
+        _('category scores'), default=dict, blank=True,
+        help_text=_('Sums of scores mapped by policy category slug.')
+    )
+
+    objects = InstitutionScoreSummaryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Institution score summary')
+        verbose_name_plural = _('Institution score summaries')
+
+    def __str__(self):
+        return f'{self.institution}: {self.score_total}'
+
+
 class InstitutionPolicy(ActivableModel, TimestampedModel):
     score = models.ForeignKey(
         verbose_name=_('score'), to=InstitutionScore, on_delete=models.CASCADE,
@@ -236,6 +465,89 @@ class MessageTemplate(ActivableModel, TimestampedModel):
         return '{} template'.format(self.get_kind_display())
 
 
+class ImportJobQuerySet(models.QuerySet):
+
+    def claim_next(self):
+        """
+        Marks the oldest pending job as running and returns it (None when
+        no job is pending). Status is changed by conditional update, so
+        every job is claimed by single worker.
+        """
+        while True:
+            pk = self.filter(status=ImportJob.PENDING).order_by(
+                'pk'
+            ).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            claimed = self.filter(pk=pk, status=ImportJob.PENDING).update(
+                status=ImportJob.RUNNING, started_at=timezone.now()
+            )
+            if claimed:
+                return self.get(pk=pk)
+
+
+class ImportJob(TimestampedModel):
+    """
+    Uploaded file waiting for (or processed by) the import worker
+    (see run_import_worker command).
+    """
+    INSTITUTIONS, POLICIES, LOGOS = range(1, 4)
+    KIND_CHOICES = (
+        (INSTITUTIONS, _('institutions from CSV')),
+        (POLICIES, _('policies from CSV')),
+        (LOGOS, _('logos from ZIP')),
+    )
+    PENDING, RUNNING, DONE, FAILED = range(1, 5)
+    STATUS_CHOICES = (
+        (PENDING, _('pending')),
+        (RUNNING, _('running')),
+        (DONE, _('done')),
+        (FAILED, _('failed')),
+    )
+
+    kind = models.PositiveSmallIntegerField(_('kind'), choices=KIND_CHOICES)
+    status = models.PositiveSmallIntegerField(
+        _('status'), choices=STATUS_CHOICES, default=PENDING
+    )
+    file = models.FileField(_('file'), upload_to='comparer/import')
+    delimiter = models.CharField(
+        _('CSV column delimiter'), max_length=1, blank=True
+    )
+    override_existing = models.BooleanField(
+        _('override existing'), default=False
+    )
+    created_by = models.ForeignKey(
+        verbose_name=_('created by'), to=settings.AUTH_USER_MODEL,
+        null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    rows_total = models.PositiveIntegerField(
+        _('rows total'), null=True, blank=True
+    )
+    rows_processed = models.PositiveIntegerField(
+        _('rows processed'), default=0
+    )
+    message = models.TextField(_('message'), blank=True)
+    errors = models.JSONField(_('errors'), default=list, blank=True)
+    started_at = models.DateTimeField(_('started at'), null=True, blank=True)
+    finished_at = models.DateTimeField(
+        _('finished at'), null=True, blank=True
+    )
+
+    objects = ImportJobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('Import job')
+        verbose_name_plural = _('Import jobs')
+        ordering = ('-pk',)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.pk}'
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
 class RankingBoxPluginModel(CMSPlugin):
     title = models.CharField(_('title'), max_length=250, blank=True)
     items_count = models.PositiveSmallIntegerField(_('items count'), default=5)
@@ -333,16 +645,20 @@ class RankingBrowserPluginModel(CMSPlugin):
         validators=[MaxValueValidator(100)]
     )
 
+    page_size = models.PositiveSmallIntegerField(
+        _('page size'),
+        help_text=_(
+            'Number of institutions loaded at once while scrolling down '
+            '(infinite scroll). Set 0 to load all institutions at once.'
+        ),
+        default=0
+    )
+
     @staticmethod
     def _get_ordering_choices():
-        items = [
-            'name',
-            'score_total',
-            'country'
-        ]
-        for category in PolicyCategory.objects.active():
-            items.append(f'score_{category.slug}')
-        return items
+        from .registry import category_registry
+
+        return ['name', 'country'] + category_registry.score_fields
 
     def clean(self):
         order_items = self.order_by.split(',')
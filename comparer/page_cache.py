@@ -0,0 +1,124 @@
+"""
+Cache of rendered institution detail pages.
+
+Pages are cached per institution slug and language and keyed by data
+version of the institution (its scores, policies, e-mails and links, see
+comparer.signals.get_institution_version_key) and by data versions shared
+by all pages: categories, criterions, content placeholders and CMS content
+(menu and static placeholders). Changes committed by any process (web
+workers, the import worker, shell) invalidate cached pages of all processes,
+a change of single institution invalidates only its page.
+
+Versions of each page are checked at most once per REVALIDATE_INTERVAL,
+so serving a cached page usually needs no database query.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.dispatch import receiver
+
+from cms.toolbar.utils import get_toolbar_from_request
+
+from common.models import DataVersion
+from common.placeholders import (
+    CMS_VERSION_KEY, VERSION_KEY, placeholders_changed
+)
+
+from .models import PolicyCategory, PolicyCriterion
+from .signals import data_changed, get_institution_version_key
+
+
+__all__ = ('SHARED_MODELS', 'InstitutionPageCache', 'institution_page_cache')
+
+
+# Changes of these models invalidate all cached pages.
+SHARED_MODELS = (PolicyCategory, PolicyCriterion)
+
+
+class InstitutionPageCache(object):
+    key_prefix = 'institution-page'
+    # Changes made by other processes are noticed after this many seconds.
+    REVALIDATE_INTERVAL = 1.0
+    shared_version_keys = tuple(
+        model._meta.label_lower for model in SHARED_MODELS
+    ) + (VERSION_KEY, CMS_VERSION_KEY)
+
+    def __init__(self):
+        # version and time of validation by slug
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[settings.PAGE_CACHE_ALIAS]
+
+    def invalidate(self):
+        """
+        Makes the next requests check data versions again.
+        """
+        with self._lock:
+            self._versions = {}
+
+    def get_version(self, slug):
+        """
+        Returns data versions of the page of given institution.
+        """
+        now = time.monotonic()
+        version, validated_at = self._versions.get(slug, (None, None))
+        if (
+            validated_at is not None and
+            now - validated_at < self.REVALIDATE_INTERVAL
+        ):
+            return version
+
+        version = ','.join(
+            str(version) for version in DataVersion.objects.get_signature(
+                *self.shared_version_keys, get_institution_version_key(slug)
+            )
+        )
+        with self._lock:
+            self._versions[slug] = (version, now)
+        return version
+
+    def get_key(self, slug, language):
+        return f'{self.key_prefix}:{slug}:{language}:{self.get_version(slug)}'
+
+    @staticmethod
+    def is_enabled(request):
+        """
+        Returns False for requests of staff users and CMS toolbar sessions.
+        """
+        toolbar = get_toolbar_from_request(request)
+        return not (
+            request.user.is_staff or
+            toolbar.show_toolbar or
+            toolbar.edit_mode_active
+        )
+
+    def get(self, slug, language):
+        """
+        Returns cached tuple of page content, dict of response headers and
+        flag of disabled caching of CMS content (or None).
+        """
+        return self.cache.get(self.get_key(slug, language))
+
+    def set(self, slug, language, content, headers, cache_disabled=False):
+        self.cache.set(
+            self.get_key(slug, language), (content, headers, cache_disabled)
+        )
+
+
+institution_page_cache = InstitutionPageCache()
+
+
+@receiver(data_changed)
+def page_data_changed(sender, models, **kwargs):
+    # sent also for changes of single institutions
+    institution_page_cache.invalidate()
+
+
+@receiver(placeholders_changed)
+def content_placeholders_changed(sender, **kwargs):
+    institution_page_cache.invalidate()
@@ -0,0 +1,131 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+__all__ = ('RankingCursorPagination', )
+
+
+class RankingCursorPagination(object):
+    """
+    Opt-in keyset pagination of ranking snapshot rows. Enabled when
+    page_size or cursor query parameter is given.
+
+    The cursor holds ordering and sort values of the last row of the page
+    (with id as a tiebreaker), so the next page is found by seeking the key
+    in ordered rows instead of skipping an offset.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, request, base_path=None):
+        """
+        :param base_path: [str] path of next page links
+         (defaults to the path of the request)
+        """
+        self.request = request
+        self.base_path = base_path
+
+    def is_enabled(self):
+        params = self.request.query_params
+        return (
+            self.page_size_query_param in params or
+            self.cursor_query_param in params
+        )
+
+    def get_page_size(self):
+        try:
+            page_size = int(
+                self.request.query_params[self.page_size_query_param]
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(ordering, key):
+        data = json.dumps({'o': list(ordering), 'k': key}).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, ordering):
+        encoded = self.request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            key = data['k']
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if (
+            data.get('o') != list(ordering) or not isinstance(key, list) or
+            len(key) != len(ordering) + 1 or not all(
+                self.is_valid_key_value(item.lstrip('-'), value)
+                for item, value in zip(list(ordering) + ['id'], key)
+            )
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    @staticmethod
+    def is_valid_key_value(field, value):
+        """
+        Checks type of cursor key value of the ordering field, values of
+        other types could not be compared with sort values of rows.
+        """
+        if isinstance(value, bool):
+            return False
+        if field == 'id':
+            return isinstance(value, int)
+        if field.startswith('score_'):
+            return value is None or isinstance(value, (int, float))
+        return isinstance(value, str)
+
+    def paginate_rows(self, snapshot, rows, ordering):
+        """
+        Returns rows of the requested page.
+        :param snapshot: [RankingSnapshot] snapshot the rows come from
+        :param rows: [ndarray] ordered indexes of all matching rows
+        :param ordering: [list of str] ordering applied to rows
+        """
+        key = self.decode_cursor(ordering)
+        start = snapshot.seek(rows, ordering, key) if key is not None else 0
+        page_size = self.get_page_size()
+        page = rows[start:start + page_size]
+
+        self.next_cursor = None
+        if start + page_size < len(rows):
+            self.next_cursor = self.encode_cursor(
+                ordering, snapshot.get_cursor_key(page[-1], ordering)
+            )
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.base_path:
+            url = self.request.build_absolute_uri(
+                self.base_path + url[len(url.split('?')[0]):]
+            )
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
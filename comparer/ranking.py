@@ -0,0 +1,729 @@
+"""
+In-process ranking engine.
+
+Ranking data of all active institutions is loaded into NumPy arrays together
+with precomputed sort orders of every orderable column, so ordered and
+searched institution lists are answered from memory. The snapshot is rebuilt
+lazily, on the first request after data version of any ranking related model
+has changed. Data version is checked at most once per REVALIDATE_INTERVAL.
+
+When settings.RANKING_SNAPSHOT_FILE is set, the snapshot is shared between
+worker processes as a memory-mapped binary file, replaced atomically by the
+first process which finds it outdated (or by build_ranking_snapshot command).
+"""
+from collections import OrderedDict
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.dispatch import receiver
+
+from .models import (
+    Institution, InstitutionScore, InstitutionScoreSummary, PolicyCategory,
+    PolicyCriterion
+)
+from .registry import category_registry
+from .signals import data_changed, get_data_signature
+
+
+__all__ = ('RANKING_MODELS', 'RankingSnapshot', 'RankingEngine', 'ranking_engine')
+
+
+# Changes of these models invalidate ranking snapshot.
+RANKING_MODELS = (
+    Institution, InstitutionScore, InstitutionScoreSummary, PolicyCategory,
+    PolicyCriterion
+)
+
+# Orderings stored in the snapshot file in addition to single columns.
+DEFAULT_ORDERINGS = (('-score_total', 'name'), )
+
+SEARCH_FIELDS = ('name', 'region', 'country')
+SEARCH_FIELD_SEPARATOR = '\x1f'
+SEARCH_ROW_SEPARATOR = '\x1e'
+
+
+class TextColumn(object):
+    """
+    Compact column of strings stored as single UTF-8 buffer with offsets.
+    """
+
+    def __init__(self, data, offsets):
+        """
+        :param data: [ndarray of uint8] concatenated UTF-8 encoded values
+        :param offsets: [ndarray of int64] n + 1 offsets of values in data
+        """
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.data[start:end].tobytes().decode('utf-8')
+
+    def find_rows(self, term):
+        """
+        Returns boolean mask of rows containing given term.
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        pattern = re.compile(re.escape(term.encode('utf-8')))
+        positions = np.fromiter(
+            (m.start() for m in pattern.finditer(memoryview(self.data))),
+            dtype=np.int64
+        )
+        if len(positions):
+            mask[np.searchsorted(self.offsets, positions, side='right') - 1] = True
+        return mask
+
+
+class RankingSnapshot(object):
+    """
+    Immutable ranking data of active institutions ordered by id.
+    """
+    TEXT_FIELDS = ('slug', 'name', 'region', 'country', 'logo', 'logo_thumb')
+
+    # Snapshot file layout: MAGIC, header length (uint64), JSON header
+    # describing arrays, array buffers aligned to FILE_ALIGNMENT bytes.
+    MAGIC = b'RANKSNP3'
+    FILE_ALIGNMENT = 64
+
+    def __init__(
+        self, version, category_slugs, ids, region_ids, country_ids, texts,
+        search, scores, positions, ranks
+    ):
+        """
+        :param version: data signature the snapshot has been built from
+        :param category_slugs: [list of str] slugs of score columns 1..k
+        :param ids: [ndarray of int64] institution ids
+        :param region_ids: [ndarray of int64] ids of normalized regions
+         (0 where region is missing)
+        :param country_ids: [ndarray of int64] ids of normalized countries
+         (0 where country is missing)
+        :param texts: [dict of TextColumn] columns listed in TEXT_FIELDS
+        :param search: [TextColumn] lowercase searchable text of each row
+        :param scores: [ndarray of float64] n x (k + 1) matrix with total
+         score in the first column, NaN where score is missing
+        :param positions: [ndarray of int64] n x (k + 1) matrix of ranking
+         positions by scores in the same columns
+        :param ranks: [dict of ndarray] dense rank of each row
+         for every orderable field
+        """
+        self.version = version
+        self.category_slugs = list(category_slugs)
+        self.ids = ids
+        self.region_ids = region_ids
+        self.country_ids = country_ids
+        self.texts = texts
+        self.search = search
+        self.scores = scores
+        self.positions = positions
+        self.ranks = ranks
+        self._orders = {}
+
+    def _get_arrays(self):
+        arrays = {
+            'ids': self.ids, 'region_ids': self.region_ids,
+            'country_ids': self.country_ids, 'scores': self.scores,
+            'positions': self.positions
+        }
+        for field, column in self.texts.items():
+            arrays[f'text:{field}:data'] = column.data
+            arrays[f'text:{field}:offsets'] = column.offsets
+        arrays['search:data'] = self.search.data
+        arrays['search:offsets'] = self.search.offsets
+        for field, ranks in self.ranks.items():
+            arrays[f'rank:{field}'] = ranks
+        for ordering, order in self._orders.items():
+            arrays['order:' + ','.join(ordering)] = order
+        return arrays
+
+    def save(self, path):
+        """
+        Writes the snapshot with precomputed orders to given file.
+        The file is replaced atomically.
+        """
+        for field in self.ordering_fields:
+            self.get_order([field])
+            self.get_order([f'-{field}'])
+        for ordering in DEFAULT_ORDERINGS:
+            self.get_order(ordering)
+
+        arrays = self._get_arrays()
+        header = {
+            'version': list(self.version),
+            'category_slugs': self.category_slugs,
+            'arrays': {}
+        }
+        offset = 0
+        for name, array in arrays.items():
+            offset = -(-offset // self.FILE_ALIGNMENT) * self.FILE_ALIGNMENT
+            header['arrays'][name] = {
+                'dtype': array.dtype.str,
+                'shape': list(array.shape),
+                'offset': offset
+            }
+            offset += array.nbytes
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_start = len(self.MAGIC) + 8 + len(header_bytes)
+        data_start = -(-data_start // self.FILE_ALIGNMENT) * self.FILE_ALIGNMENT
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.MAGIC)
+                f.write(struct.pack('<Q', len(header_bytes)))
+                f.write(header_bytes)
+                for name, array in arrays.items():
+                    f.seek(data_start + header['arrays'][name]['offset'])
+                    f.write(np.ascontiguousarray(array).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Opens snapshot file read-only. Arrays are zero-copy views
+        of the memory-mapped file shared by all processes.
+        """
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if buffer[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError(f'"{path}" is not a ranking snapshot file.')
+        header_len, = struct.unpack_from('<Q', buffer, len(cls.MAGIC))
+        header_start = len(cls.MAGIC) + 8
+        header = json.loads(buffer[header_start:header_start + header_len])
+        data_start = header_start + header_len
+        data_start = -(-data_start // cls.FILE_ALIGNMENT) * cls.FILE_ALIGNMENT
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            if not count:
+                arrays[name] = np.empty(spec['shape'], dtype=dtype)
+                continue
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count,
+                offset=data_start + spec['offset']
+            ).reshape(spec['shape'])
+
+        snapshot = cls(
+            version=tuple(header['version']),
+            category_slugs=header['category_slugs'],
+            ids=arrays['ids'],
+            region_ids=arrays['region_ids'],
+            country_ids=arrays['country_ids'],
+            texts={
+                field: TextColumn(
+                    arrays[f'text:{field}:data'],
+                    arrays[f'text:{field}:offsets']
+                )
+                for field in cls.TEXT_FIELDS
+            },
+            search=TextColumn(
+                arrays['search:data'], arrays['search:offsets']
+            ),
+            scores=arrays['scores'],
+            positions=arrays['positions'],
+            ranks={
+                name.split(':', 1)[1]: array
+                for name, array in arrays.items() if name.startswith('rank:')
+            }
+        )
+        for name, array in arrays.items():
+            if name.startswith('order:'):
+                snapshot._orders[tuple(name.split(':', 1)[1].split(','))] = \
+                    array
+        return snapshot
+
+    @property
+    def score_fields(self):
+        return ['score_total'] + [f'score_{s}' for s in self.category_slugs]
+
+    @property
+    def ordering_fields(self):
+        return ['name', 'country'] + self.score_fields
+
+    @classmethod
+    def build(cls, version):
+        """
+        Loads ranking data from the database.
+        """
+        category_registry.invalidate()  # version may be newer than registry
+        category_slugs = category_registry.slugs
+        score_fields = ['score_total'] + [f'score_{s}' for s in category_slugs]
+        rank_fields = ['rank_total'] + [f'rank_{s}' for s in category_slugs]
+
+        ids, region_ids, country_ids, scores, positions = [], [], [], [], []
+        texts = {field: [] for field in cls.TEXT_FIELDS}
+        rows = Institution.objects.active().with_scores().with_ranks(
+        ).order_by('pk').values_list(
+            'pk', 'region_ref_id', 'country_ref_id', 'slug', 'name', 'region',
+            'country', 'logo', *score_fields, *rank_fields
+        )
+        for pk, region_id, country_id, slug, name, region, country, logo, \
+                *values in rows.iterator(chunk_size=2000):
+            ids.append(pk)
+            region_ids.append(region_id or 0)
+            country_ids.append(country_id or 0)
+            scores.append(values[:len(score_fields)])
+            positions.append(values[len(score_fields):])
+            texts['slug'].append(slug)
+            texts['name'].append(name)
+            texts['region'].append(region)
+            texts['country'].append(country)
+            if logo:
+                # unsaved instance is enough to resolve file urls
+                institution = Institution(pk=pk, logo=logo)
+                texts['logo'].append(institution.logo.url)
+                texts['logo_thumb'].append(institution.logo_thumb.url)
+            else:
+                texts['logo'].append('')
+                texts['logo_thumb'].append('')
+
+        score_matrix = np.array(
+            scores, dtype=np.float64
+        ).reshape(len(ids), len(score_fields))
+        position_matrix = np.array(
+            positions, dtype=np.int64
+        ).reshape(len(ids), len(score_fields))
+
+        ranks = {
+            field: cls._text_ranks(texts[field])
+            for field in ('name', 'country')
+        }
+        for i, field in enumerate(score_fields):
+            ranks[field] = cls._score_ranks(score_matrix[:, i])
+
+        search = TextColumn.from_strings([
+            SEARCH_FIELD_SEPARATOR.join(
+                texts[field][i] for field in SEARCH_FIELDS
+            ).lower() + SEARCH_ROW_SEPARATOR
+            for i in range(len(ids))
+        ])
+
+        return cls(
+            version=version,
+            category_slugs=category_slugs,
+            ids=np.array(ids, dtype=np.int64),
+            region_ids=np.array(region_ids, dtype=np.int64),
+            country_ids=np.array(country_ids, dtype=np.int64),
+            texts={
+                field: TextColumn.from_strings(values)
+                for field, values in texts.items()
+            },
+            search=search,
+            scores=score_matrix,
+            positions=position_matrix,
+            ranks=ranks
+        )
+
+    @staticmethod
+    def _dense_ranks(order, is_new_value):
+        """
+        Converts sort order to dense ranks of the rows.
+        :param order: [ndarray] stable ascending argsort of the column
+        :param is_new_value: [ndarray of bool] whether sorted value differs
+         from the previous one
+        """
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.cumsum(is_new_value) - 1
+        return ranks
+
+    @classmethod
+    def _text_ranks(cls, values):
+        order = np.array(
+            sorted(range(len(values)), key=values.__getitem__), dtype=np.int64
+        )
+        is_new_value = np.ones(len(values), dtype=bool)
+        for i in range(1, len(order)):
+            is_new_value[i] = values[order[i]] != values[order[i - 1]]
+        return cls._dense_ranks(order, is_new_value)
+
+    @classmethod
+    def _score_ranks(cls, column):
+        # Missing scores are placed first in ascending order like in SQLite.
+        keys = np.where(np.isnan(column), -np.inf, column)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        is_new_value = np.ones(len(order), dtype=bool)
+        is_new_value[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        return cls._dense_ranks(order, is_new_value)
+
+    def get_order(self, ordering):
+        """
+        Returns row indexes sorted by given fields with optional "-" prefix
+        for descending order. Ties are always resolved by ascending id.
+        Results are memoized per ordering.
+        """
+        ordering = tuple(ordering)
+        order = self._orders.get(ordering)
+        if order is None:
+            keys = [np.arange(len(self.ids))]  # rows are sorted by id
+            for item in reversed(ordering):
+                field = item.lstrip('-')
+                ranks = self.ranks[field]
+                keys.insert(0, -ranks if item.startswith('-') else ranks)
+            order = np.lexsort(keys[::-1])
+            order.flags.writeable = False
+            self._orders[ordering] = order
+        return order
+
+    def get_filter_mask(self, region_ids=None, country_ids=None):
+        """
+        Returns boolean mask of rows in any of given regions and any of given
+        countries (None means no filter).
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        if region_ids is not None:
+            mask &= np.isin(self.region_ids, region_ids)
+        if country_ids is not None:
+            mask &= np.isin(self.country_ids, country_ids)
+        return mask
+
+    def get_search_mask(self, search_terms=(), institution_ids=None):
+        """
+        Returns boolean mask of rows containing all search terms (as
+        substrings of name, region or country) and given institution ids
+        (e.g. results of full-text search, None means no filter).
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        if institution_ids is not None:
+            mask &= np.isin(self.ids, institution_ids)
+        for term in search_terms:
+            mask &= self.search.find_rows(term.lower())
+        return mask
+
+    @staticmethod
+    def _count_ids(values):
+        ids, counts = np.unique(values[values != 0], return_counts=True)
+        return {int(pk): int(count) for pk, count in zip(ids, counts)}
+
+    def get_facets(
+        self, max_scores, search_terms=(), institution_ids=None,
+        region_ids=None, country_ids=None, bucket_count=10
+    ):
+        """
+        Returns numbers of rows matching search and filters in total,
+        per region id, per country id and per score bucket of every score
+        column keyed by 'total' and category slugs (equal parts of the max
+        score of the column, missing score counts as 0). Counts per region
+        and country ignore their own filter, so they show results of
+        selecting another value.
+
+        :param max_scores: [dict] max score per 'total' and category slug
+        """
+        search_mask = self.get_search_mask(search_terms, institution_ids)
+        region_mask = self.get_filter_mask(region_ids=region_ids)
+        country_mask = self.get_filter_mask(country_ids=country_ids)
+        mask = search_mask & region_mask & country_mask
+
+        score_buckets = OrderedDict()
+        for column, key in enumerate(['total'] + self.category_slugs):
+            scores = np.nan_to_num(self.scores[mask, column])
+            max_score = max_scores.get(key)
+            buckets = np.clip(
+                (scores * bucket_count // max_score).astype(np.int64)
+                if max_score else np.zeros(len(scores), dtype=np.int64),
+                0, bucket_count - 1
+            )
+            score_buckets[key] = [
+                int(count)
+                for count in np.bincount(buckets, minlength=bucket_count)
+            ]
+
+        return {
+            'count': int(mask.sum()),
+            'regions': self._count_ids(
+                self.region_ids[search_mask & country_mask]
+            ),
+            'countries': self._count_ids(
+                self.country_ids[search_mask & region_mask]
+            ),
+            'score_buckets': score_buckets
+        }
+
+    def query(
+        self, ordering=(), search_terms=(), institution_ids=None,
+        region_ids=None, country_ids=None
+    ):
+        """
+        Returns indexes of rows matching all search terms, institution ids
+        and region and country filters in given ordering.
+        """
+        order = self.get_order(ordering)
+        if (
+            not search_terms and institution_ids is None and
+            region_ids is None and country_ids is None
+        ):
+            return order
+
+        mask = self.get_filter_mask(region_ids, country_ids)
+        mask &= self.get_search_mask(search_terms, institution_ids)
+        return order[mask[order]]
+
+    def get_sort_value(self, index, field):
+        """
+        Returns comparable value of the row for given orderable field.
+        Missing scores are returned as None.
+        """
+        if field == 'id':
+            return int(self.ids[index])
+        if field in self.texts:
+            return self.texts[field][index]
+        value = self.scores[index, self.score_fields.index(field)]
+        return None if np.isnan(value) else float(value)
+
+    def get_cursor_key(self, index, ordering):
+        """
+        Returns values of the row identifying its position in given ordering.
+        """
+        return [
+            self.get_sort_value(index, item.lstrip('-'))
+            for item in list(ordering) + ['id']
+        ]
+
+    def _compare_key(self, index, ordering, key):
+        """
+        Compares row with cursor key. Returns negative number if the row
+        precedes the key in given ordering, 0 if equal, positive otherwise.
+        """
+        for item, key_value in zip(list(ordering) + ['id'], key):
+            value = self.get_sort_value(index, item.lstrip('-'))
+            if value == key_value:
+                continue
+            # Missing scores precede all values in ascending order.
+            if value is None:
+                result = -1
+            elif key_value is None:
+                result = 1
+            else:
+                result = -1 if value < key_value else 1
+            return -result if item.startswith('-') else result
+        return 0
+
+    def seek(self, rows, ordering, key):
+        """
+        Returns position of the first of ordered rows which follows given
+        cursor key. Uses binary search, so it costs the same for any key.
+        """
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self._compare_key(rows[middle], ordering, key) <= 0:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_scores(self, index):
+        scores = {}
+        for key, value in zip(
+            ['total'] + self.category_slugs, self.scores[index]
+        ):
+            scores[key] = None if np.isnan(value) else int(value)
+        return scores
+
+    def get_positions(self, mask=None):
+        """
+        Returns matrix of ranking positions like the positions matrix,
+        computed only among rows of given mask (like positions of
+        InstitutionQuerySet.with_ranks() applied after filters).
+        Positions of other rows are 0.
+        """
+        if mask is None:
+            return self.positions
+        positions = np.zeros(self.positions.shape, dtype=np.int64)
+        # higher score precedes, missing scores are ranked last
+        scores = self.scores[mask]
+        keys = np.where(np.isnan(scores), np.inf, -scores)
+        sorted_keys = np.sort(keys, axis=0)
+        for column in range(keys.shape[1]):
+            positions[mask, column] = np.searchsorted(
+                sorted_keys[:, column], keys[:, column]
+            ) + 1
+        return positions
+
+    def get_ranks(self, index, positions=None):
+        """
+        :param positions: [ndarray] matrix returned by get_positions()
+         (defaults to positions among all rows)
+        """
+        if positions is None:
+            positions = self.positions
+        return dict(zip(
+            ['total'] + self.category_slugs,
+            (int(value) for value in positions[index])
+        ))
+
+    def get_index(self, institution_id):
+        """
+        Returns row index of the institution or None if it is not present.
+        """
+        index = int(np.searchsorted(self.ids, institution_id))
+        if index < len(self.ids) and self.ids[index] == institution_id:
+            return index
+        return None
+
+    def annotate_ranks(self, institution):
+        """
+        Sets "rank_total" and "rank_<slug>" attributes of the institution
+        (None if it is not ranked) like InstitutionQuerySet.with_ranks().
+        """
+        index = self.get_index(institution.pk)
+        for key in ['total'] + self.category_slugs:
+            setattr(institution, f'rank_{key}', None)
+        if index is not None:
+            for key, value in self.get_ranks(index).items():
+                setattr(institution, f'rank_{key}', value)
+        return institution
+
+    def serialize(self, indexes, request=None, fields=None, positions=None):
+        """
+        Returns list of rows in the format of InstitutionListSerializer
+        built directly from snapshot arrays.
+        :param fields: [list of str] limits output to given fields
+        :param positions: [ndarray] ranks returned by get_positions()
+        """
+        url_prefix = request.build_absolute_uri('/')[:-1] if request else ''
+
+        def build_url(url):
+            if not url:
+                return None
+            return url_prefix + url if url.startswith('/') else url
+
+        texts = self.texts
+        getters = {
+            'id': lambda i: int(self.ids[i]),
+            'slug': texts['slug'].__getitem__,
+            'name': texts['name'].__getitem__,
+            'region': texts['region'].__getitem__,
+            'country': texts['country'].__getitem__,
+            'logo': lambda i: build_url(texts['logo'][i]),
+            'logo_thumb': lambda i: build_url(texts['logo_thumb'][i]),
+            'scores': self.get_scores,
+            'ranks': lambda i: self.get_ranks(i, positions),
+        }
+        if fields is not None:
+            getters = {
+                field: getter for field, getter in getters.items()
+                if field in fields
+            }
+        getters = list(getters.items())
+
+        return [
+            {field: getter(i) for field, getter in getters}
+            for i in indexes
+        ]
+
+
+class RankingEngine(object):
+    """
+    Holds ranking snapshot of the process and replaces it atomically when
+    ranking data version changes.
+    """
+    # Changes made by other processes are noticed after this many seconds.
+    REVALIDATE_INTERVAL = 1.0
+
+    def __init__(self):
+        self._snapshot = None
+        self._file_stat = None
+        self._validated_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._snapshot = None
+        self._file_stat = None
+        self._validated_at = None
+
+    @property
+    def snapshot_file(self):
+        return getattr(settings, 'RANKING_SNAPSHOT_FILE', None)
+
+    def open_shared_snapshot(self):
+        """
+        Maps the shared snapshot file if it has been replaced since it was
+        opened last time. Returns the snapshot or None if there is no file.
+        """
+        try:
+            stat = os.stat(self.snapshot_file)
+        except (TypeError, FileNotFoundError):
+            return None
+
+        file_stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if file_stat != self._file_stat:
+            self._snapshot = RankingSnapshot.load(self.snapshot_file)
+            self._file_stat = file_stat
+        return self._snapshot
+
+    def write_shared_snapshot(self, version=None):
+        """
+        Builds snapshot from the database and replaces the shared file.
+        """
+        version = version or get_data_signature(*RANKING_MODELS)
+        snapshot = RankingSnapshot.build(version)
+        snapshot.save(self.snapshot_file)
+        return snapshot
+
+    def get_snapshot(self):
+        snapshot = self._snapshot
+        validated_at = self._validated_at
+        if (
+            snapshot is not None and validated_at is not None and
+            time.monotonic() - validated_at < self.REVALIDATE_INTERVAL
+        ):
+            return snapshot
+
+        version = get_data_signature(*RANKING_MODELS)
+        if snapshot is None or snapshot.version != version:
+            with self._lock:
+                if self.snapshot_file:
+                    snapshot = self.open_shared_snapshot()
+                    if snapshot is None or snapshot.version != version:
+                        # File is missing or its refresh is still pending.
+                        snapshot = self.write_shared_snapshot(version)
+                        self._snapshot = snapshot
+                else:
+                    snapshot = self._snapshot
+                    if snapshot is None or snapshot.version != version:
+                        snapshot = RankingSnapshot.build(version)
+                        self._snapshot = snapshot
+        self._validated_at = time.monotonic()
+        return snapshot
+
+
+ranking_engine = RankingEngine()
+
+
+@receiver(data_changed)
+def ranking_data_changed(sender, models, **kwargs):
+    # the snapshot is rebuilt by the next get_snapshot() call, so committing
+    # requests do not wait for it
+    if models & set(RANKING_MODELS):
+        ranking_engine.invalidate()
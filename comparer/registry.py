@@ -0,0 +1,84 @@
+"""
+Process-wide registry of active policy categories.
+
+Category slugs determine score annotations, serialized score keys and
+allowed orderings, so they are read on every ranking request. The registry
+keeps them in memory and reloads them when PolicyCategory data version
+changes.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.dispatch import receiver
+
+from .models import PolicyCategory
+from .signals import data_changed, get_data_signature
+
+
+__all__ = ('CategoryInfo', 'CategoryRegistry', 'category_registry')
+
+
+CategoryInfo = namedtuple(
+    'CategoryInfo', ['id', 'slug', 'name', 'short_name', 'order', 'max_score']
+)
+
+
+class CategoryRegistry(object):
+    # Changes made by other processes are noticed after this many seconds.
+    REVALIDATE_INTERVAL = 1.0
+
+    def __init__(self):
+        self._categories = None
+        self._version = None
+        self._validated_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._categories = None
+        self._validated_at = None
+
+    def get_categories(self):
+        """
+        Returns tuple of CategoryInfo of active categories in their order.
+        """
+        validated_at = self._validated_at
+        if (
+            validated_at is not None and
+            time.monotonic() - validated_at < self.REVALIDATE_INTERVAL
+        ):
+            return self._categories
+
+        with self._lock:
+            version = get_data_signature(PolicyCategory)
+            if self._categories is None or version != self._version:
+                self._categories = tuple(
+                    CategoryInfo(*values)
+                    for values in PolicyCategory.objects.active().order_by(
+                        'order', 'pk'
+                    ).values_list(*CategoryInfo._fields)
+                )
+                self._version = version
+            self._validated_at = time.monotonic()
+        return self._categories
+
+    @property
+    def slugs(self):
+        return [category.slug for category in self.get_categories()]
+
+    @property
+    def score_fields(self):
+        return ['score_total'] + [f'score_{slug}' for slug in self.slugs]
+
+    @property
+    def max_score(self):
+        return sum(category.max_score for category in self.get_categories())
+
+
+category_registry = CategoryRegistry()
+
+
+@receiver(data_changed)
+def categories_changed(sender, models, **kwargs):
+    if PolicyCategory in models:
+        category_registry.invalidate()
@@ -0,0 +1,360 @@
+"""
+Full-text search index of institutions.
+
+Every active institution has one document in the index made of its name,
+places (region and country), titles and texts of its active policies
+of active scores.
+The index is stored in the database, as FTS5 virtual table on SQLite and as
+table with weighted tsvector column (and GIN index) on PostgreSQL. Text is
+normalized (accents removed, case folded) before indexing and searching,
+every search term matches word prefixes and results are ordered by
+relevance (name matches weigh more than places, policy titles and texts).
+
+Documents of changed institutions are rebuilt once the transaction which
+changed them is committed.
+"""
+import re
+import threading
+import unicodedata
+from collections import defaultdict, namedtuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Institution, InstitutionPolicy, InstitutionScore
+
+
+__all__ = (
+    'SearchDocument', 'SearchBackend', 'SqliteSearchBackend',
+    'PostgresSearchBackend', 'SearchIndex', 'search_index',
+    'schedule_index_update', 'normalize_text', 'collect_documents'
+)
+
+
+TABLE_NAME = 'comparer_search_index'
+
+WORD_RE = re.compile(r'\w+')
+
+
+# Texts of single institution indexed in separate columns, so matches can be
+# weighted by column.
+SearchDocument = namedtuple('SearchDocument', [
+    'institution_id', 'name', 'places', 'policy_titles', 'policy_texts'
+])
+
+
+def normalize_text(text):
+    """
+    Returns case folded text without accents.
+    """
+    return ''.join(
+        char for char in unicodedata.normalize('NFKD', text.casefold())
+        if not unicodedata.combining(char)
+    )
+
+
+def get_words(terms):
+    """
+    Returns normalized words of search terms (punctuation is dropped,
+    so words can be embedded in query syntax safely).
+    """
+    return [
+        word
+        for term in terms
+        for word in WORD_RE.findall(normalize_text(term))
+    ]
+
+
+def collect_documents(institutions, policies):
+    """
+    Returns list of SearchDocument of given institutions.
+    :param institutions: [QuerySet] institutions to index
+    :param policies: [QuerySet] policies to index (policies of other
+        institutions are ignored)
+    """
+    titles = defaultdict(list)
+    texts = defaultdict(list)
+    for institution_id, title, text in policies.values_list(
+        'score__institution_id', 'title', 'text'
+    ).order_by('pk'):
+        titles[institution_id].append(title)
+        texts[institution_id].append(text)
+
+    return [
+        SearchDocument(
+            institution_id=pk,
+            name=normalize_text(name),
+            places=normalize_text(f'{region} {country}'),
+            policy_titles=normalize_text('\n'.join(titles[pk])),
+            policy_texts=normalize_text('\n'.join(texts[pk]))
+        )
+        for pk, name, region, country in institutions.values_list(
+            'id', 'name', 'region', 'country'
+        ).order_by('pk')
+    ]
+
+
+class SearchBackend(object):
+    """
+    Database specific storage and query of the search index.
+    """
+    # Relevance weights of SearchDocument text columns.
+    weights = (10.0, 4.0, 2.0, 1.0)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_index(self):
+        raise NotImplementedError
+
+    def drop_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLE_NAME}')
+
+    def delete(self, institution_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {TABLE_NAME} WHERE {self.id_column} = %s',
+                [(pk, ) for pk in institution_ids]
+            )
+
+    def insert(self, documents):
+        raise NotImplementedError
+
+    def search(self, words, limit=None):
+        """
+        Returns list of (institution id, relevance) of documents containing
+        prefixes of all given words, the most relevant first.
+        :param words: [list of str] normalized words
+        :param limit: [int] maximal number of returned documents
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def get_limit_sql(limit):
+        return '' if limit is None else f' LIMIT {int(limit)}'
+
+
+class SqliteSearchBackend(SearchBackend):
+    id_column = 'rowid'
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            # text is normalized already, the prefix option builds extra
+            # indexes of short prefixes used while typing
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {TABLE_NAME} USING fts5('
+                f'name, places, policy_titles, policy_texts, '
+                f"tokenize='unicode61 remove_diacritics 0', prefix='2 3')"
+            )
+
+    def insert(self, documents):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE_NAME} (rowid, name, places, '
+                f'policy_titles, policy_texts) VALUES (%s, %s, %s, %s, %s)',
+                documents
+            )
+
+    def search(self, words, limit=None):
+        query = ' '.join(f'"{word}"*' for word in words)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with self.connection.cursor() as cursor:
+            # bm25() is lower for more relevant documents
+            cursor.execute(
+                f'SELECT rowid, -bm25({TABLE_NAME}, {weights}) AS relevance '
+                f'FROM {TABLE_NAME} WHERE {TABLE_NAME} MATCH %s '
+                f'ORDER BY relevance DESC, rowid' + self.get_limit_sql(limit),
+                [query]
+            )
+            return cursor.fetchall()
+
+
+class PostgresSearchBackend(SearchBackend):
+    id_column = 'institution_id'
+    # tsvector weights of SearchDocument text columns, relevance weights
+    # are given in ts_rank() array as {D, C, B, A}
+    labels = ('A', 'B', 'C', 'D')
+
+    def create_index(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE {TABLE_NAME} ('
+                f'institution_id integer PRIMARY KEY, '
+                f'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX {TABLE_NAME}_document ON {TABLE_NAME} '
+                f'USING gin (document)'
+            )
+
+    def insert(self, documents):
+        document_sql = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{label}')"
+            for label in self.labels
+        )
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE_NAME} (institution_id, document) '
+                f'VALUES (%s, {document_sql})',
+                documents
+            )
+
+    def search(self, words, limit=None):
+        query = ' & '.join(f'{word}:*' for word in words)
+        max_weight = max(self.weights)
+        weights = ', '.join(
+            str(weight / max_weight) for weight in reversed(self.weights)
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT institution_id, ts_rank('{{{weights}}}', document, "
+                f"query) AS relevance "
+                f"FROM {TABLE_NAME}, to_tsquery('simple', %s) query "
+                f'WHERE document @@ query '
+                f'ORDER BY relevance DESC, institution_id'
+                + self.get_limit_sql(limit),
+                [query]
+            )
+            return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(connection):
+    """
+    Returns search backend of the database connection or None when
+    the database is not supported.
+    """
+    backend_class = BACKENDS.get(connection.vendor)
+    return None if backend_class is None else backend_class(connection)
+
+
+class SearchIndex(object):
+
+    @property
+    def backend(self):
+        return get_backend(connection)
+
+    @property
+    def is_available(self):
+        return self.backend is not None
+
+    @staticmethod
+    def get_documents(institution_ids=None):
+        institutions = Institution.objects.active()
+        policies = InstitutionPolicy.objects.active().filter(
+            score__is_active=True
+        )
+        if institution_ids is not None:
+            institutions = institutions.filter(pk__in=institution_ids)
+            policies = policies.filter(score__institution__in=institution_ids)
+        return collect_documents(institutions, policies)
+
+    def update(self, institution_ids):
+        """
+        Rebuilds documents of given institutions (documents of deleted
+        and inactive institutions are removed).
+        """
+        backend = self.backend
+        if backend is None:
+            return
+        documents = self.get_documents(institution_ids)
+        with transaction.atomic():
+            backend.delete(institution_ids)
+            backend.insert(documents)
+
+    def rebuild(self):
+        """
+        Rebuilds the whole index. Returns number of indexed documents.
+        Raises ImproperlyConfigured when the database is not supported.
+        """
+        backend = self.backend
+        if backend is None:
+            raise ImproperlyConfigured(
+                f'Full-text search is not supported by '
+                f'{connection.vendor} database.'
+            )
+        documents = self.get_documents()
+        with transaction.atomic():
+            backend.drop_index()
+            backend.create_index()
+            backend.insert(documents)
+        return len(documents)
+
+    def search(self, terms, limit=None):
+        """
+        Returns list of (institution id, relevance) of institutions matching
+        all search terms, the most relevant first (nothing when the database
+        is not supported).
+        :param terms: [list of str] search terms, matched as word prefixes
+        :param limit: [int] maximal number of returned institutions
+        """
+        backend = self.backend
+        words = get_words(terms)
+        if backend is None or not words:
+            return []
+        return backend.search(words, limit)
+
+
+search_index = SearchIndex()
+
+
+class _PendingUpdate(threading.local):
+
+    def __init__(self):
+        self.institution_ids = set()
+        self.score_ids = set()
+
+
+_pending = _PendingUpdate()
+
+
+def _update_pending_documents():
+    institution_ids = _pending.institution_ids
+    score_ids = _pending.score_ids
+    _pending.institution_ids = set()
+    _pending.score_ids = set()
+
+    if score_ids:
+        institution_ids.update(InstitutionScore.objects.filter(
+            pk__in=score_ids
+        ).values_list('institution_id', flat=True))
+    if institution_ids:
+        search_index.update(institution_ids)
+
+
+def schedule_index_update(institution_ids=(), score_ids=()):
+    """
+    Rebuilds search documents of given institutions (identified by ids or
+    ids of their scores) once the current transaction is committed
+    (or immediately outside of transaction).
+    """
+    _pending.institution_ids.update(institution_ids)
+    _pending.score_ids.update(score_ids)
+    transaction.on_commit(_update_pending_documents)
+
+
+@receiver(post_save, sender=Institution)
+@receiver(post_delete, sender=Institution)
+def institution_changed(sender, instance, **kwargs):
+    schedule_index_update(institution_ids=[instance.pk])
+
+
+@receiver(post_save, sender=InstitutionScore)
+@receiver(post_delete, sender=InstitutionScore)
+def institution_score_changed(sender, instance, **kwargs):
+    # policies of inactive and deleted scores are not indexed
+    schedule_index_update(institution_ids=[instance.institution_id])
+
+
+@receiver(post_save, sender=InstitutionPolicy)
+@receiver(post_delete, sender=InstitutionPolicy)
+def institution_policy_changed(sender, instance, **kwargs):
+    schedule_index_update(score_ids=[instance.score_id])
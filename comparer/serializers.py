@@ -1,16 +1,51 @@
-from django.conf import settings
-
 from rest_framework.serializers import ModelSerializer, SerializerMethodField, ImageField
 
 from comparer.models import *
+from comparer.registry import category_registry
 
 
 __all__ = (
     'PolicyCategorySerializer', 'InstitutionListSerializer', 'InstitutionDetailSerializer',
-    'MessageTemplateSerializer'
+    'InstitutionComparisonSerializer', 'MessageTemplateSerializer', 'get_sparse_fields'
 )
 
 
+def get_sparse_fields(request, available_fields):
+    """
+    Returns available fields limited with "fields" and "omit" query
+    parameters (comma separated field names) preserving their order.
+    """
+    fields = list(available_fields)
+    if request is None:
+        return fields
+
+    requested = request.query_params.get('fields')
+    if requested:
+        requested = {name.strip() for name in requested.split(',')}
+        fields = [name for name in fields if name in requested]
+
+    omitted = request.query_params.get('omit')
+    if omitted:
+        omitted = {name.strip() for name in omitted.split(',')}
+        fields = [name for name in fields if name not in omitted]
+
+    return fields
+
+
+class SparseFieldsMixin(object):
+    """
+    Removes fields not requested with "fields" / "omit" query parameters.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        sparse_fields = get_sparse_fields(
+            self.context.get('request'), self.fields
+        )
+        for name in set(self.fields) - set(sparse_fields):
+            self.fields.pop(name)
+
+
 class PolicyCriterionNestedSerializer(ModelSerializer):
 
     class Meta:
@@ -31,29 +66,44 @@ class PolicyCategorySerializer(ModelSerializer):
         ]
 
     def get_criterions(self, obj):
-        return PolicyCriterionNestedSerializer(
-            obj.criterions.active(), many=True
-        ).data
+        criterions = getattr(obj, 'active_criterions', None)
+        if criterions is None:
+            criterions = obj.criterions.active()
+        return PolicyCriterionNestedSerializer(criterions, many=True).data
 
 
-class InstitutionListSerializer(ModelSerializer):
+class InstitutionListSerializer(SparseFieldsMixin, ModelSerializer):
+    """
+    Requires institutions annotated with InstitutionQuerySet.with_scores()
+    and ranks (see InstitutionQuerySet.with_ranks()).
+    """
     scores = SerializerMethodField()
+    ranks = SerializerMethodField()
     logo_thumb = ImageField()
 
     class Meta:
         model = Institution
         fields = [
-            'id', 'slug', 'name', 'region', 'country', 'logo', 'logo_thumb', 'scores'
+            'id', 'slug', 'name', 'region', 'country', 'logo', 'logo_thumb', 'scores',
+            'ranks'
         ]
 
     def get_scores(self, obj):
         scores = {
             'total': obj.score_total
         }
-        for slug in settings.POLICY_CATEGORY_SLUGS:
-            scores[slug] = getattr(obj, f'score_{slug}')
+        for slug in category_registry.slugs:
+            scores[slug] = getattr(obj, f'score_{slug}', None)
         return scores
 
+    def get_ranks(self, obj):
+        ranks = {
+            'total': getattr(obj, 'rank_total', None)
+        }
+        for slug in category_registry.slugs:
+            ranks[slug] = getattr(obj, f'rank_{slug}', None)
+        return ranks
+
 
 class SocialMediaLinkSerializer(ModelSerializer):
     kind_name = SerializerMethodField()
@@ -84,6 +134,36 @@ class InstitutionDetailSerializer(InstitutionListSerializer):
         ]
 
 
+class InstitutionComparisonSerializer(InstitutionListSerializer):
+    """
+    Requires institutions with active related objects prefetched to
+    active_scores, active_social_media_links and active_emails attributes.
+    """
+    criterion_scores = SerializerMethodField()
+    social_media_links = SerializerMethodField()
+    emails = SerializerMethodField()
+
+    class Meta:
+        model = Institution
+        fields = [
+            'id', 'slug', 'name', 'region', 'country', 'scores', 'ranks',
+            'criterion_scores', 'social_media_links', 'emails'
+        ]
+
+    def get_criterion_scores(self, obj):
+        return {
+            score.criterion_id: score.score for score in obj.active_scores
+        }
+
+    def get_social_media_links(self, obj):
+        return SocialMediaLinkSerializer(
+            obj.active_social_media_links, many=True
+        ).data
+
+    def get_emails(self, obj):
+        return InstitutionEmailSerializer(obj.active_emails, many=True).data
+
+
 class MessageTemplateSerializer(ModelSerializer):
 
     class Meta:
@@ -0,0 +1,224 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver, Signal
+
+from common.models import DataVersion
+
+from .models import (
+    Country, Institution, InstitutionEmail, InstitutionPolicy, InstitutionScore,
+    InstitutionScoreSummary, MessageTemplate, PolicyCategory, PolicyCriterion,
+    Region, SocialMediaLink
+)
+
+
+# Models which changes are tracked with common.models.DataVersion
+VERSIONED_MODELS = (
+    Country, Institution, InstitutionEmail, InstitutionPolicy,
+    InstitutionScore, InstitutionScoreSummary, MessageTemplate, PolicyCategory,
+    PolicyCriterion, Region, SocialMediaLink
+)
+
+
+# Sent after committed changes of VERSIONED_MODELS have been processed.
+# Arguments: models - set of changed model classes.
+data_changed = Signal()
+
+
+# Institutions (or scores) resolved with single query.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def get_institution_version_key(slug):
+    """
+    Returns DataVersion key of data shown on detail page of the institution
+    (the institution, its scores, policies, e-mails and links).
+    """
+    return f'{Institution._meta.label_lower}:{slug}'
+
+
+class _PendingChanges(threading.local):
+    """
+    Changes waiting to be processed at transaction commit.
+    """
+
+    def __init__(self):
+        self.institution_ids = set()
+        self.version_keys = set()
+        self.changed_institution_ids = set()
+        self.changed_score_ids = set()
+        self.changed_slugs = set()
+
+
+_pending = _PendingChanges()
+
+
+def _get_values(queryset, field, pk_values):
+    """
+    Returns set of values of the field of objects with given primary keys.
+    """
+    pk_values = list(pk_values)
+    values = set()
+    for i in range(0, len(pk_values), LOOKUP_CHUNK_SIZE):
+        values.update(queryset.filter(
+            pk__in=pk_values[i:i + LOOKUP_CHUNK_SIZE]
+        ).values_list(field, flat=True))
+    return values
+
+
+def _get_changed_institution_keys():
+    institution_ids = _pending.changed_institution_ids
+    score_ids = _pending.changed_score_ids
+    slugs = _pending.changed_slugs
+    _pending.changed_institution_ids = set()
+    _pending.changed_score_ids = set()
+    _pending.changed_slugs = set()
+
+    if score_ids:
+        institution_ids |= _get_values(
+            InstitutionScore.objects.all(), 'institution_id', score_ids
+        )
+    if institution_ids:
+        slugs |= _get_values(Institution.objects.all(), 'slug', institution_ids)
+    return {get_institution_version_key(slug) for slug in slugs}
+
+
+def _process_pending_changes():
+    institution_ids = _pending.institution_ids
+    version_keys = _pending.version_keys
+    _pending.institution_ids = set()
+    _pending.version_keys = set()
+
+    if institution_ids:
+        InstitutionScoreSummary.objects.refresh(institution_ids)
+        version_keys.add(InstitutionScoreSummary._meta.label_lower)
+    version_keys |= _get_changed_institution_keys()
+    if version_keys:
+        DataVersion.objects.bump(*sorted(version_keys))
+        data_changed.send(
+            sender=None,
+            models={
+                model for model in VERSIONED_MODELS
+                if model._meta.label_lower in version_keys
+            }
+        )
+
+
+def schedule_summary_refresh(institution_ids):
+    """
+    Refreshes score summaries of given institutions once the current
+    transaction is committed (or immediately outside of transaction).
+    Repeated calls within the same transaction are merged into single refresh.
+    """
+    _pending.institution_ids.update(institution_ids)
+    transaction.on_commit(_process_pending_changes)
+
+
+def schedule_version_bump(*models):
+    """
+    Increments data versions of given models once the current transaction
+    is committed (or immediately outside of transaction).
+    """
+    _pending.version_keys.update(model._meta.label_lower for model in models)
+    transaction.on_commit(_process_pending_changes)
+
+
+def schedule_institution_version_bump(
+    institution_ids=(), score_ids=(), slugs=()
+):
+    """
+    Increments data versions of given institutions (identified by ids,
+    ids of their scores or slugs) once the current transaction is committed
+    (or immediately outside of transaction).
+    """
+    _pending.changed_institution_ids.update(institution_ids)
+    _pending.changed_score_ids.update(score_ids)
+    _pending.changed_slugs.update(slugs)
+    transaction.on_commit(_process_pending_changes)
+
+
+def get_data_signature(*models):
+    """
+    Returns tuple of current data versions of given models.
+    """
+    return DataVersion.objects.get_signature(
+        *[model._meta.label_lower for model in models]
+    )
+
+
+def versioned_model_changed(sender, **kwargs):
+    schedule_version_bump(sender)
+
+
+# connected per model, receivers of all senders would disable fast deletes
+# of unrelated models
+for model in VERSIONED_MODELS:
+    post_save.connect(versioned_model_changed, sender=model)
+    post_delete.connect(versioned_model_changed, sender=model)
+
+
+@receiver(post_save, sender=Institution)
+def institution_saved(sender, instance, created, **kwargs):
+    if created:
+        schedule_summary_refresh([instance.pk])
+    schedule_institution_version_bump(slugs=[instance.slug])
+
+
+@receiver(pre_save, sender=Institution)
+def institution_slug_changed(sender, instance, **kwargs):
+    # page of the previous slug has to disappear as well
+    if instance.pk is not None:
+        schedule_institution_version_bump(
+            slugs=Institution.objects.filter(
+                pk=instance.pk
+            ).exclude(slug=instance.slug).values_list('slug', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Institution)
+def institution_deleted(sender, instance, **kwargs):
+    schedule_institution_version_bump(slugs=[instance.slug])
+
+
+@receiver(post_save, sender=InstitutionScore)
+@receiver(post_delete, sender=InstitutionScore)
+def institution_score_changed(sender, instance, **kwargs):
+    schedule_summary_refresh([instance.institution_id])
+    schedule_institution_version_bump(
+        institution_ids=[instance.institution_id]
+    )
+
+
+@receiver(post_save, sender=InstitutionPolicy)
+@receiver(post_delete, sender=InstitutionPolicy)
+def institution_policy_changed(sender, instance, **kwargs):
+    schedule_institution_version_bump(score_ids=[instance.score_id])
+
+
+@receiver(post_save, sender=InstitutionEmail)
+@receiver(post_delete, sender=InstitutionEmail)
+@receiver(post_save, sender=SocialMediaLink)
+@receiver(post_delete, sender=SocialMediaLink)
+def institution_contact_changed(sender, instance, **kwargs):
+    schedule_institution_version_bump(
+        institution_ids=[instance.institution_id]
+    )
+
+
+@receiver(post_save, sender=PolicyCriterion)
+def policy_criterion_saved(sender, instance, **kwargs):
+    schedule_summary_refresh(
+        InstitutionScore.objects.filter(
+            criterion=instance
+        ).values_list('institution_id', flat=True).distinct()
+    )
+
+
+@receiver(post_save, sender=PolicyCategory)
+def policy_category_saved(sender, instance, **kwargs):
+    schedule_summary_refresh(
+        InstitutionScore.objects.filter(
+            criterion__category=instance
+        ).values_list('institution_id', flat=True).distinct()
+    )
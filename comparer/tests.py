@@ -1,3 +1,1652 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from cms.api import add_plugin
+from cms.models import Placeholder, StaticPlaceholder
+
+from common.import_tools import CsvImportError
+from common.models import ContentPlaceholder, DataVersion
+from common.placeholders import placeholder_registry
+
+from .admin import CsvInstitutionImporter, CsvPolicyImporter
+
+from .autocomplete import autocomplete_index
+from .cms_plugins import RankingBoxPluginPublisher
+from .management.commands.benchmark_importer import (
+    INSTITUTION_HEADER, POLICY_HEADER, get_institution_rows, get_policy_rows
+)
+from .management.commands import prerender
+from .management.commands.prerender import get_output_path, get_targets
+from .models import *
+from .page_cache import institution_page_cache
+from .pagination import RankingCursorPagination
+from .ranking import RANKING_MODELS, RankingSnapshot, ranking_engine
+from .registry import category_registry
+from .search import search_index
+from .serializers import InstitutionListSerializer
+from .signals import (
+    VERSIONED_MODELS, data_changed, get_data_signature,
+    get_institution_version_key
+)
+
+
+class RankingTestMixin(object):
+    """
+    Active institutions with tied and missing scores in two categories.
+    """
+    # name: (region, country, score of category a, score of category b)
+    ranking_data = {
+        'Alpha': ('Bohemia', 'Czechia', 3, 2),
+        'Beta': ('Tyrol', 'Austria', 3, 2),
+        'Gamma': ('Moravia', 'Czechia', 1, None),
+        'Delta': ('', 'Austria', None, None),
+        'Epsilon': ('Bohemia', 'Czechia', 4, 4),
+    }
+
+    def create_ranking_data(self):
+        self.criteria = []
+        for slug in ('a', 'b'):
+            category = PolicyCategory.objects.create(
+                name=f'Category {slug}', slug=slug, max_score=10
+            )
+            self.criteria.append(PolicyCriterion.objects.create(
+                category=category, name=f'Criterion {slug}'
+            ))
+        self.institutions = {}
+        for name, (region, country, *scores) in self.ranking_data.items():
+            institution = Institution.objects.create(
+                name=name, region=region, country=country
+            )
+            for criterion, score in zip(self.criteria, scores):
+                if score is not None:
+                    InstitutionScore.objects.create(
+                        institution=institution, criterion=criterion,
+                        score=score
+                    )
+            self.institutions[name] = institution
+        Institution.objects.create(
+            name='Inactive', country='Czechia', is_active=False
+        )
+        # data versions start again after flush of the previous test
+        for registry in (ranking_engine, category_registry):
+            registry.invalidate()
+            self.addCleanup(registry.invalidate)
+        caches[settings.API_CACHE_ALIAS].clear()
+        search_index.rebuild()  # table is not flushed between tests
+
+    def get_names(self, ids):
+        names = {pk: name for name, pk in Institution.objects.values_list(
+            'name', 'pk'
+        )}
+        return [names[pk] for pk in ids]
+
+
+class InstitutionScoreSummaryTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        self.alpha = self.institutions['Alpha']
+
+    def get_summary(self, institution):
+        summary = InstitutionScoreSummary.objects.get(institution=institution)
+        return summary.score_total, summary.category_scores
+
+    def test_score_changes(self):
+        self.assertEqual(self.get_summary(self.alpha), (5, {'a': 3, 'b': 2}))
+        score = self.alpha.scores.get(criterion=self.criteria[1])
+        score.score = 5
+        score.save()
+        self.assertEqual(self.get_summary(self.alpha), (8, {'a': 3, 'b': 5}))
+        score.delete()
+        self.assertEqual(self.get_summary(self.alpha), (3, {'a': 3}))
+        self.alpha.scores.update(is_active=False)
+        self.alpha.scores.get().save()
+        self.assertEqual(self.get_summary(self.alpha), (None, {}))
+
+    def test_criterion_and_category_changes(self):
+        criterion = self.criteria[1]
+        criterion.is_active = False
+        criterion.save()
+        self.assertEqual(self.get_summary(self.alpha), (3, {'a': 3}))
+        criterion.is_active = True
+        criterion.save()
+        self.assertEqual(self.get_summary(self.alpha), (5, {'a': 3, 'b': 2}))
+
+        category = self.criteria[0].category
+        category.is_active = False
+        category.save()
+        self.assertEqual(self.get_summary(self.alpha), (2, {'b': 2}))
+        self.assertEqual(
+            self.get_summary(self.institutions['Gamma']), (None, {})
+        )
+        category.is_active = True
+        category.slug = 'c'
+        category.save()
+        self.assertEqual(self.get_summary(self.alpha), (5, {'b': 2, 'c': 3}))
+
+    def test_change_is_reported_once(self):
+        handler = mock.Mock()
+        data_changed.connect(handler)
+        self.addCleanup(data_changed.disconnect, handler)
+        summary_version = DataVersion.objects.get_signature(
+            InstitutionScoreSummary._meta.label_lower
+        )[0]
+
+        score = self.alpha.scores.first()
+        score.score = 0
+        with transaction.atomic():  # like saves in admin
+            score.save()
+        handler.assert_called_once()
+        self.assertEqual(
+            handler.call_args[1]['models'],
+            {InstitutionScore, InstitutionScoreSummary}
+        )
+        self.assertEqual(
+            DataVersion.objects.get_signature(
+                InstitutionScoreSummary._meta.label_lower
+            )[0],
+            summary_version + 1
+        )
+
+
+class CategoryRegistryTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+
+    def get_list(self, **params):
+        response = self.client.get(reverse('institution-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_serialized_scores(self):
+        institution = Institution.objects.with_scores().get(name='Gamma')
+        return InstitutionListSerializer(institution).data['scores']
+
+    def test_categories_are_applied_without_restart(self):
+        self.assertEqual(
+            self.get_serialized_scores(), {'total': 1, 'a': 1, 'b': None}
+        )
+        self.assertEqual(
+            self.get_list(ordering='-score_c')[0]['name'], 'Epsilon'
+        )
+
+        category = PolicyCategory.objects.create(
+            name='Category c', slug='c', max_score=10
+        )
+        criterion = PolicyCriterion.objects.create(
+            category=category, name='Criterion c'
+        )
+        InstitutionScore.objects.create(
+            institution=self.institutions['Gamma'], criterion=criterion,
+            score=9
+        )
+        self.assertEqual(category_registry.slugs, ['a', 'b', 'c'])
+        self.assertTrue(hasattr(
+            Institution.objects.with_scores().first(), 'score_c'
+        ))
+        self.assertEqual(
+            self.get_serialized_scores(),
+            {'total': 10, 'a': 1, 'b': None, 'c': 9}
+        )
+        rows = self.get_list(ordering='-score_c')
+        self.assertEqual(rows[0]['name'], 'Gamma')
+        self.assertEqual(list(rows[0]['scores']), ['total', 'a', 'b', 'c'])
+
+        category = PolicyCategory.objects.get(slug='b')
+        category.is_active = False
+        category.save()
+        self.assertEqual(category_registry.slugs, ['a', 'c'])
+        self.assertFalse(hasattr(
+            Institution.objects.with_scores().first(), 'score_b'
+        ))
+        self.assertEqual(
+            self.get_serialized_scores(), {'total': 10, 'a': 1, 'c': 9}
+        )
+        rows = self.get_list(ordering='score_b')
+        self.assertEqual(rows, self.get_list())  # ordering is ignored
+        self.assertEqual(list(rows[0]['scores']), ['total', 'a', 'c'])
+
+
+class RankingSnapshotTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+
+    def test_order_matches_database(self):
+        snapshot = ranking_engine.get_snapshot()
+        for ordering in (
+            ['-score_total', 'name'], ['score_total'], ['-score_a'],
+            ['score_b', '-name'], ['country', '-score_total'], ['-name'],
+        ):
+            expected = list(Institution.objects.active().with_scores(
+            ).order_by(*ordering, 'pk').values_list('pk', flat=True))
+            self.assertEqual(
+                list(snapshot.ids[snapshot.get_order(ordering)]), expected,
+                ordering
+            )
+
+    def test_revalidation_is_throttled(self):
+        snapshot = ranking_engine.get_snapshot()
+        with CaptureQueriesContext(connection) as context:
+            self.assertIs(ranking_engine.get_snapshot(), snapshot)
+        self.assertEqual(len(context.captured_queries), 0)
+
+        # change made by another process is not noticed before the interval
+        InstitutionScoreSummary.objects.filter(
+            institution=self.institutions['Gamma']
+        ).update(score_total=9)
+        DataVersion.objects.bump('comparer.institutionscoresummary')
+        self.assertIs(ranking_engine.get_snapshot(), snapshot)
+        ranking_engine._validated_at -= ranking_engine.REVALIDATE_INTERVAL
+        snapshot = ranking_engine.get_snapshot()
+        self.assertEqual(
+            self.get_names(snapshot.ids[snapshot.get_order(['-score_total'])]),
+            ['Gamma', 'Epsilon', 'Alpha', 'Beta', 'Delta']
+        )
+
+    def test_change_is_applied_lazily(self):
+        ranking_engine.get_snapshot()
+        with mock.patch.object(
+            RankingSnapshot, 'build', wraps=RankingSnapshot.build
+        ) as build:
+            InstitutionScore.objects.create(
+                institution=self.institutions['Delta'],
+                criterion=self.criteria[0], score=10
+            )
+            self.assertFalse(build.called)
+            snapshot = ranking_engine.get_snapshot()
+            self.assertEqual(build.call_count, 1)
+        index = snapshot.get_index(self.institutions['Delta'].pk)
+        self.assertEqual(snapshot.get_scores(index)['total'], 10)
+
+
+class RankingSnapshotFileTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'ranking.snapshot')
+
+    def test_round_trip(self):
+        snapshot = RankingSnapshot.build(get_data_signature(*RANKING_MODELS))
+        snapshot.save(self.path)
+        loaded = RankingSnapshot.load(self.path)
+
+        self.assertEqual(loaded.version, snapshot.version)
+        self.assertEqual(loaded.category_slugs, ['a', 'b'])
+        np.testing.assert_array_equal(loaded.ids, snapshot.ids)
+        np.testing.assert_array_equal(loaded.scores, snapshot.scores)
+        np.testing.assert_array_equal(loaded.positions, snapshot.positions)
+        for field, column in snapshot.texts.items():
+            self.assertEqual(
+                [loaded.texts[field][i] for i in range(len(loaded.ids))],
+                [column[i] for i in range(len(snapshot.ids))]
+            )
+        for ordering in (['-score_total', 'name'], ['score_a'], ['-country']):
+            np.testing.assert_array_equal(
+                loaded.get_order(ordering), snapshot.get_order(ordering)
+            )
+        self.assertEqual(
+            loaded.serialize(range(len(loaded.ids))),
+            snapshot.serialize(range(len(snapshot.ids)))
+        )
+
+    def test_outdated_file_is_replaced(self):
+        with override_settings(RANKING_SNAPSHOT_FILE=self.path):
+            snapshot = ranking_engine.get_snapshot()
+            self.assertEqual(
+                RankingSnapshot.load(self.path).version, snapshot.version
+            )
+            InstitutionScore.objects.create(
+                institution=self.institutions['Delta'],
+                criterion=self.criteria[0], score=10
+            )
+            self.assertEqual(
+                RankingSnapshot.load(self.path).version, snapshot.version
+            )
+            snapshot = ranking_engine.get_snapshot()
+            loaded = RankingSnapshot.load(self.path)
+            self.assertEqual(
+                loaded.version, get_data_signature(*RANKING_MODELS)
+            )
+            self.assertEqual(snapshot.version, loaded.version)
+            index = loaded.get_index(self.institutions['Delta'].pk)
+            self.assertEqual(loaded.get_scores(index)['total'], 10)
+
+
+class RankingCursorPaginationTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+
+    def get_pages(self, **params):
+        url, query, pages = reverse('institution-list'), params, []
+        while url:
+            response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append([row['name'] for row in data['results']])
+            url, query = data['next'], None
+        return pages
+
+    def get_cursor(self):
+        response = self.client.get(
+            reverse('institution-list'), {'page_size': 1}
+        )
+        return parse_qs(urlparse(response.json()['next']).query)['cursor'][0]
+
+    def test_pages_are_complete(self):
+        for ordering in (
+            '-score_total,name', 'score_total', '-score_b', 'country'
+        ):
+            expected = [
+                row['name'] for row in self.client.get(
+                    reverse('institution-list'), {'ordering': ordering}
+                ).json()
+            ]
+            pages = self.get_pages(ordering=ordering, page_size=2)
+            self.assertEqual([len(page) for page in pages], [2, 2, 1])
+            self.assertEqual(sum(pages, []), expected, ordering)
+
+    def test_filtered_pages(self):
+        self.assertEqual(
+            self.get_pages(search='a', ordering='-score_total', page_size=1),
+            [['Alpha'], ['Beta'], ['Delta']]
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('institution-list'), {'cursor': 'invalid'}
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('institution-list'), {
+            'cursor': self.get_cursor(), 'ordering': 'name'
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_value_types(self):
+        ordering = ['-score_total', 'name']
+        for key, status_code in (
+            ([8.0, 'Epsilon', 1], 200),
+            ([None, 'Delta', 1], 200),
+            (['8', 'Epsilon', 1], 404),
+            ([8.0, 1, 1], 404),
+            ([8.0, 'Epsilon', '1'], 404),
+            ([8.0, 'Epsilon', True], 404),
+            ({'k': 1}, 404),
+        ):
+            response = self.client.get(reverse('institution-list'), {
+                'cursor': RankingCursorPagination.encode_cursor(ordering, key)
+            })
+            self.assertEqual(response.status_code, status_code, key)
+
+
+class SparseFieldsTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        self.alpha = self.institutions['Alpha']
+        InstitutionEmail.objects.create(
+            institution=self.alpha, address='info@alpha.cz'
+        )
+        self.detail_url = f'/api/institutions/{self.alpha.pk}/'
+        ranking_engine.get_snapshot()  # not built in measured requests
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_fields(self):
+        url = reverse('institution-list')
+        rows = self.get_json(url, fields='name,id,unknown')
+        self.assertEqual([list(row) for row in rows[:1]], [['id', 'name']])
+        rows = self.get_json(url, omit='logo,logo_thumb,scores,ranks')
+        self.assertEqual(
+            list(rows[0]), ['id', 'slug', 'name', 'region', 'country']
+        )
+        self.assertEqual(
+            list(self.get_json(url, fields='name,region', omit='name')[0]),
+            ['region']
+        )
+
+    def test_list_matches_serializer(self):
+        rows = {row['id']: row for row in self.get_json(
+            reverse('institution-list')
+        )}
+        institutions = Institution.objects.active().with_scores().with_ranks()
+        for institution in institutions:
+            data = InstitutionListSerializer(institution).data
+            self.assertEqual(rows[institution.pk], data)
+        self.assertEqual(rows[self.institutions['Delta'].pk]['region'], '')
+
+    def test_detail_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_json(self.detail_url, fields='id,name,emails')
+        self.assertEqual(data, {
+            'id': self.alpha.pk, 'name': 'Alpha', 'emails': [
+                {'id': self.alpha.emails.get().pk, 'address': 'info@alpha.cz'}
+            ]
+        })
+        sql = [query['sql'] for query in context.captured_queries]
+        institution_sql = [
+            query for query in sql
+            if query.startswith('SELECT') and
+            'FROM "comparer_institution"' in query
+        ]
+        self.assertEqual(len(institution_sql), 1)
+        self.assertNotIn('"description"', institution_sql[0])
+        self.assertTrue([
+            query for query in sql if 'FROM "comparer_institutionemail"' in query
+        ])
+
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_json(self.detail_url, omit='emails')
+        self.assertNotIn('emails', data)
+        self.assertEqual(data['ranks'], {'total': 2, 'a': 2, 'b': 2})
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'comparer_institutionemail' in query['sql']
+        ])
+
+
+class RankingBootstrapTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+
+    def test_response(self):
+        response = self.client.get(reverse('ranking-bootstrap'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            list(data), ['categories', 'max_score', 'institutions']
+        )
+        self.assertEqual(
+            [(c['slug'], c['max_score']) for c in data['categories']],
+            [('a', 10), ('b', 10)]
+        )
+        self.assertEqual(
+            [c['name'] for c in data['categories'][0]['criterions']],
+            ['Criterion a']
+        )
+        self.assertEqual(data['max_score'], 20)
+        self.assertEqual(
+            data['institutions'],
+            self.client.get(reverse('institution-list')).json()
+        )
+
+    def test_next_links_point_to_list(self):
+        response = self.client.get(
+            reverse('ranking-bootstrap'), {'page_size': 2}
+        )
+        institutions = response.json()['institutions']
+        self.assertEqual(
+            [row['name'] for row in institutions['results']],
+            ['Epsilon', 'Alpha']
+        )
+        next_url = urlparse(institutions['next'])
+        self.assertEqual(next_url.path, reverse('institution-list'))
+        self.assertEqual(parse_qs(next_url.query)['page_size'], ['2'])
+        response = self.client.get(institutions['next'])
+        self.assertEqual(
+            [row['name'] for row in response.json()['results']],
+            ['Beta', 'Gamma']
+        )
+
+
+class ConditionalGetTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        self.url = reverse('institution-list')
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'comparer_' in query['sql']
+        ])
+
+        response = self.client.get(
+            self.url, {'ordering': 'name'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_with_data(self):
+        etag = self.client.get(self.url)['ETag']
+        InstitutionScore.objects.create(
+            institution=self.institutions['Delta'],
+            criterion=self.criteria[0], score=10
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Delta')
+
+
+class CachedResponseTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        self.url = reverse('institution-list')
+
+    def get_names(self, **extra):
+        response = self.client.get(self.url, {'fields': 'name'}, **extra)
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_hit_does_not_query_data(self):
+        names = self.get_names()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.get_names(), names)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'comparer_' in query['sql']
+        ])
+
+    def test_invalidation(self):
+        self.assertEqual(self.get_names()[0], 'Epsilon')
+        InstitutionScore.objects.create(
+            institution=self.institutions['Delta'],
+            criterion=self.criteria[0], score=10
+        )
+        self.assertEqual(self.get_names()[0], 'Delta')
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_absolute_urls_are_not_shared_between_hosts(self):
+        for host in ('a.example.com', 'b.example.com'):
+            response = self.client.get(
+                self.url, {'page_size': 1}, HTTP_HOST=host
+            )
+            self.assertTrue(
+                response.json()['next'].startswith(f'http://{host}/')
+            )
+
+
+class InstitutionCompareTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        self.url = reverse('institution-compare')
+
+    def compare(self, *names):
+        ids = ','.join(str(self.institutions[name].pk) for name in names)
+        response = self.client.get(self.url, {'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_results(self):
+        epsilon, gamma = self.compare('Epsilon', 'Gamma', 'Epsilon')
+        self.assertEqual(epsilon['name'], 'Epsilon')
+        self.assertEqual(epsilon['scores'], {'total': 8, 'a': 4, 'b': 4})
+        self.assertEqual(epsilon['ranks']['total'], 1)
+        self.assertEqual(epsilon['criterion_scores'], {
+            str(self.criteria[0].pk): 4, str(self.criteria[1].pk): 4
+        })
+        self.assertEqual(gamma['scores'], {'total': 1, 'a': 1, 'b': None})
+        self.assertEqual(gamma['ranks']['total'], 4)
+
+    def test_invalid_ids(self):
+        for ids in ('', 'a,b', ','.join(['1'] * 51)):
+            response = self.client.get(self.url, {'ids': ids})
+            self.assertEqual(response.status_code, 400, ids)
+            self.assertIn('ids', response.json())
+
+    def test_query_count_is_constant(self):
+        self.compare('Alpha')  # warm up snapshot and registries
+        counts = []
+        for names in (['Alpha'], list(self.institutions)):
+            caches[settings.API_CACHE_ALIAS].clear()
+            with CaptureQueriesContext(connection) as context:
+                self.compare(*names)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class RankingPositionsTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+
+    def get_api_ranks(self, key='total'):
+        response = self.client.get(reverse('institution-list'))
+        return {row['name']: row['ranks'][key] for row in response.json()}
+
+    def test_competition_ranks_with_ties(self):
+        expected = {
+            'Epsilon': 1, 'Alpha': 2, 'Beta': 2, 'Gamma': 4, 'Delta': 5
+        }
+        self.assertEqual(self.get_api_ranks(), expected)
+        self.assertEqual(self.get_api_ranks('b'), {
+            'Epsilon': 1, 'Alpha': 2, 'Beta': 2, 'Gamma': 4, 'Delta': 4
+        })
+        self.assertEqual(dict(
+            Institution.objects.active().with_scores().with_ranks(
+            ).values_list('name', 'rank_total')
+        ), expected)
+
+        pk = self.institutions['Gamma'].pk
+        response = self.client.get(
+            reverse('institution-detail', kwargs={'pk': pk})
+        )
+        self.assertEqual(response.json()['ranks']['total'], 4)
+
+    def test_ranking_box_ranks_match_api(self):
+        instance = RankingBoxPluginModel(items_count=10)
+        institutions = RankingBoxPluginPublisher.get_institutions(instance)
+        self.assertEqual(
+            {obj.name: obj.rank_total for obj in institutions},
+            self.get_api_ranks()
+        )
+
+    def test_dense_ranks(self):
+        self.assertEqual(dict(
+            Institution.objects.active().with_scores().with_ranks(
+            ).values_list('name', 'dense_rank_total')
+        ), {'Epsilon': 1, 'Alpha': 2, 'Beta': 2, 'Gamma': 3, 'Delta': 4})
+
+    def test_filtered_ranks_match_ranking_box(self):
+        czechia = Country.objects.get(key='czechia')
+        params = {'country': czechia.pk}
+        expected = {'Epsilon': 1, 'Alpha': 2, 'Gamma': 3}
+
+        response = self.client.get(reverse('institution-list'), params)
+        self.assertEqual(
+            {row['name']: row['ranks']['total'] for row in response.json()},
+            expected
+        )
+        response = self.client.get(
+            reverse('ranking-bootstrap'), dict(params, page_size=2)
+        )
+        page = response.json()['institutions']
+        self.assertEqual(
+            [row['ranks']['total'] for row in page['results']], [1, 2]
+        )
+        response = self.client.get(page['next'])
+        self.assertEqual(
+            [row['ranks']['total'] for row in response.json()['results']],
+            [3]
+        )
+
+        instance = RankingBoxPluginModel(
+            items_count=10, country_filter=czechia.name
+        )
+        institutions = RankingBoxPluginPublisher.get_institutions(instance)
+        self.assertEqual(
+            {obj.name: obj.rank_total for obj in institutions}, expected
+        )
+
+    def test_prerendered_api_details_depend_on_all_scores(self):
+        def get_signatures():
+            return {
+                target.url: target.signature for target in get_targets()
+                if target.kind == 'API payloads'
+            }
+
+        signatures = get_signatures()
+        score = InstitutionScore.objects.get(
+            institution=self.institutions['Gamma'], criterion=self.criteria[0]
+        )
+        score.score = 10
+        score.save()
+        url = reverse(
+            'institution-detail', kwargs={'pk': self.institutions['Alpha'].pk}
+        )
+        self.assertNotEqual(get_signatures()[url], signatures[url])
+
+
+class RankingBoxCacheTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        caches[settings.PLUGIN_CACHE_ALIAS].clear()
+        self.instance = add_plugin(
+            Placeholder.objects.create(slot='content'),
+            'RankingBoxPluginPublisher', 'en', items_count=3
+        )
+
+    def render(self):
+        context = RankingBoxPluginPublisher().render(
+            {}, self.instance, self.instance.placeholder
+        )
+        return str(context['content'])
+
+    def test_hit_does_not_query_ranking(self):
+        content = self.render()
+        self.assertIn('Epsilon', content)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.render(), content)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'comparer_' in query['sql']
+        ])
+
+    def test_config_changes(self):
+        key = RankingBoxPluginPublisher.get_cache_key(self.instance)
+        self.assertNotIn('Gamma', self.render())
+        self.instance.items_count = 4
+        self.instance.save()
+        self.assertNotEqual(
+            RankingBoxPluginPublisher.get_cache_key(self.instance), key
+        )
+        self.assertIn('Gamma', self.render())
+
+    def test_data_changes(self):
+        key = RankingBoxPluginPublisher.get_cache_key(self.instance)
+        self.assertNotIn('Delta', self.render())
+        InstitutionScore.objects.create(
+            institution=self.institutions['Delta'],
+            criterion=self.criteria[0], score=10
+        )
+        self.assertNotEqual(
+            RankingBoxPluginPublisher.get_cache_key(self.instance), key
+        )
+        self.assertIn('Delta', self.render())
+
+
+class PrerenderCommandTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+        # worker processes would not see the in-memory test database
+        patcher = mock.patch(
+            'comparer.management.commands.prerender.ProcessPoolExecutor',
+            ThreadPoolExecutor
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def prerender(self):
+        stdout = io.StringIO()
+        # single worker, concurrent first renders would race in creation
+        # of missing static placeholders
+        call_command(
+            'prerender', output=self.output, processes=1, stdout=stdout,
+            stderr=io.StringIO()
+        )
+        return stdout.getvalue()
+
+    def get_paths(self, institution):
+        return [
+            os.path.join(self.output, path) for path in (
+                get_output_path(reverse(
+                    'institution-detail', kwargs={'slug': institution.slug}
+                ), 'html'),
+                get_output_path(reverse(
+                    'institution-detail', kwargs={'pk': institution.pk}
+                ), 'json'),
+            )
+        ]
+
+    def test_render(self):
+        targets = get_targets()
+        output = self.prerender()
+        self.assertIn(
+            f'{len(targets)} of {len(targets)} targets changed', output
+        )
+        html_path, json_path = self.get_paths(self.institutions['Alpha'])
+        suffixes = ('', '.gz') + (('.br',) if prerender.brotli else ())
+        for path in (html_path, json_path):
+            for suffix in suffixes:
+                self.assertTrue(os.path.isfile(path + suffix), path + suffix)
+        with open(html_path, 'rb') as f:
+            content = f.read()
+        self.assertIn(b'Alpha', content)
+        with open(f'{html_path}.gz', 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), content)
+        with open(json_path) as f:
+            self.assertEqual(json.load(f)['name'], 'Alpha')
+
+        self.assertIn(f'0 of {len(targets)} targets changed', self.prerender())
+
+    def test_deactivated_institution_is_removed(self):
+        self.prerender()
+        beta = self.institutions['Beta']
+        paths = self.get_paths(beta)
+        beta.is_active = False
+        beta.save()
+        self.prerender()
+        for path in paths:
+            self.assertFalse(os.path.exists(path), path)
+            self.assertFalse(os.path.exists(f'{path}.gz'), path)
+        self.assertTrue(all(
+            os.path.isfile(path)
+            for path in self.get_paths(self.institutions['Alpha'])
+        ))
+
+    def test_cms_content_changes(self):
+        def get_signatures():
+            return {
+                target.path: target.signature for target in get_targets()
+                if target.kind == 'institution pages'
+            }
+
+        signatures = get_signatures()
+        StaticPlaceholder.objects.create(code='bottom_bar')
+        new_signatures = get_signatures()
+        self.assertTrue(signatures)
+        for path, signature in signatures.items():
+            self.assertNotEqual(new_signatures[path], signature)
+
+
+class RegionCountryTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+
+    def list_names(self, **params):
+        response = self.client.get(reverse('institution-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['name'] for row in response.json())
+
+    def test_sync(self):
+        self.assertEqual(
+            sorted(Region.objects.values_list('name', flat=True)),
+            ['Bohemia', 'Moravia', 'Tyrol']
+        )
+        alpha = self.institutions['Alpha']
+        self.assertEqual(alpha.region_ref, Region.objects.get(key='bohemia'))
+        self.assertIsNone(self.institutions['Delta'].region_ref)
+
+        alpha.region = ' MORAVIA '
+        alpha.country = 'czechia'
+        alpha.save(update_fields=['region', 'country'])
+        alpha.refresh_from_db()
+        self.assertEqual(alpha.region_ref.name, 'Moravia')
+        self.assertEqual(alpha.country_ref.name, 'Czechia')
+        self.assertEqual(Country.objects.count(), 2)
+
+    def test_filter(self):
+        bohemia = Region.objects.get(key='bohemia')
+        tyrol = Region.objects.get(key='tyrol')
+        czechia = Country.objects.get(key='czechia')
+        self.assertEqual(
+            self.list_names(region=bohemia.pk), ['Alpha', 'Epsilon']
+        )
+        self.assertEqual(
+            self.list_names(region=f'{bohemia.pk},{tyrol.pk}'),
+            ['Alpha', 'Beta', 'Epsilon']
+        )
+        self.assertEqual(
+            self.list_names(region=tyrol.pk, country=czechia.pk), []
+        )
+        self.assertEqual(
+            self.list_names(country=czechia.pk), ['Alpha', 'Epsilon', 'Gamma']
+        )
+        for param in ('region', 'country'):
+            response = self.client.get(
+                reverse('institution-list'), {param: 'bohemia'}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(param, response.json())
+
+
+class InstitutionFacetsTest(RankingTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_ranking_data()
+
+    def get_facets(self, **params):
+        response = self.client.get(reverse('institution-facets'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    @staticmethod
+    def get_counts(buckets):
+        return [bucket['count'] for bucket in buckets]
+
+    def test_score_buckets(self):
+        data = self.get_facets()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(
+            [(b['from'], b['to']) for b in data['scores'][:2]],
+            [(0, 10), (10, 20)]
+        )
+        self.assertEqual(
+            self.get_counts(data['scores']), [2, 0, 2, 0, 1, 0, 0, 0, 0, 0]
+        )
+        self.assertEqual(list(data['category_scores']), ['a', 'b'])
+        self.assertEqual(
+            self.get_counts(data['category_scores']['a']),
+            [1, 1, 0, 2, 1, 0, 0, 0, 0, 0]
+        )
+        self.assertEqual(
+            self.get_counts(data['category_scores']['b']),
+            [2, 0, 2, 0, 1, 0, 0, 0, 0, 0]
+        )
+
+    def test_filtered_buckets(self):
+        czechia = Country.objects.get(key='czechia')
+        data = self.get_facets(country=czechia.pk)
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(
+            self.get_counts(data['category_scores']['a']),
+            [0, 1, 0, 1, 1, 0, 0, 0, 0, 0]
+        )
+        self.assertEqual(
+            self.get_counts(data['category_scores']['b']),
+            [1, 0, 1, 0, 1, 0, 0, 0, 0, 0]
+        )
+        self.assertEqual(
+            sum(self.get_counts(data['scores'])), data['count']
+        )
+
+
+class DataVersionTest(TestCase):
+
+    def test_bump_many_keys(self):
+        DataVersion.objects.bump('a', 'b')
+        keys = ['a', 'b'] + [f'key-{i}' for i in range(700)]
+        DataVersion.objects.bump(*keys)
+        self.assertEqual(
+            DataVersion.objects.get_signature('a', 'key-0', 'key-699', 'c'),
+            (2, 1, 1, 0)
+        )
+        with self.assertNumQueries(2):  # single update per chunk
+            DataVersion.objects.bump(*keys)
+        self.assertEqual(
+            DataVersion.objects.get_signature('a', 'key-0', 'key-699'),
+            (3, 2, 2)
+        )
+
+
+class ContentPlaceholderTest(TransactionTestCase):
+
+    def setUp(self):
+        placeholder_registry.invalidate()
+        self.addCleanup(placeholder_registry.invalidate)
+
+    def get_version(self):
+        return DataVersion.objects.get_signature(
+            ContentPlaceholder._meta.label_lower
+        )[0]
+
+    def test_plugin_changes_bump_version(self):
+        placeholder = placeholder_registry.get('test').placeholder
+        version = self.get_version()
+        plugin = add_plugin(placeholder, 'RankingBoxPluginPublisher', 'en')
+        self.assertEqual(self.get_version(), version + 1)
+        plugin.title = 'Top'
+        plugin.save()
+        self.assertEqual(self.get_version(), version + 2)
+        plugin.delete()
+        self.assertEqual(self.get_version(), version + 3)
+
+        other = Placeholder.objects.create(slot='other')
+        add_plugin(other, 'CriteriaPluginPublisher', 'en')
+        self.assertEqual(self.get_version(), version + 3)
+
+    def test_unrelated_models_keep_fast_delete(self):
+        for model in (Session, DataVersion, Region):
+            self.assertEqual(
+                post_delete.has_listeners(model),
+                model in VERSIONED_MODELS,
+                model
+            )
+
+
+class InstitutionDetailTestMixin(object):
+
+    def setUp(self):
+        for registry in (category_registry, placeholder_registry):
+            registry.invalidate()
+            self.addCleanup(registry.invalidate)
+
+    @staticmethod
+    def create_institution(name, size):
+        institution = Institution.objects.create(name=name, country='Czechia')
+        for i in range(size):
+            InstitutionEmail.objects.create(
+                institution=institution, address=f'{i}@{institution.slug}.cz'
+            )
+            SocialMediaLink.objects.create(
+                institution=institution, kind=SocialMediaLink.FACEBOOK,
+                url=f'https://facebook.com/{institution.slug}-{i}'
+            )
+        for category in PolicyCategory.objects.all():
+            for criterion in category.criterions.all():
+                score = InstitutionScore.objects.create(
+                    institution=institution, criterion=criterion, score=1
+                )
+                for i in range(size):
+                    InstitutionPolicy.objects.create(
+                        score=score, title=f'Policy {i}',
+                        link='https://example.com/'
+                    )
+        return institution
+
+    def create_categories(self, count, criterion_count):
+        for i in range(PolicyCategory.objects.count(), count):
+            category = PolicyCategory.objects.create(
+                name=f'Category {i}', slug=f'category-{i}', max_score=10
+            )
+            for j in range(criterion_count):
+                PolicyCriterion.objects.create(
+                    category=category, name=f'Criterion {i}.{j}'
+                )
+
+
+class InstitutionDetailViewQueryCountTest(InstitutionDetailTestMixin, TestCase):
+    """
+    Number of queries of the institution detail page must not depend
+    on the number of categories, criterions, scores, policies, e-mails
+    and social media links.
+    """
+
+    def count_queries(self, institution):
+        category_registry.invalidate()
+        url = reverse('institution-detail', kwargs={'slug': institution.slug})
+        self.client.get(url)  # warm up caches that are independent on data
+        institution_page_cache.cache.delete(
+            institution_page_cache.get_key(institution.slug, 'en')
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_is_constant(self):
+        self.create_categories(1, 1)
+        small = self.count_queries(self.create_institution('Small', 1))
+
+        self.create_categories(4, 3)
+        large = self.count_queries(self.create_institution('Large', 3))
+
+        self.assertEqual(small, large)
+
+    def test_content_placeholders_are_not_queried(self):
+        self.create_categories(1, 1)
+        institution = self.create_institution('Institution', 1)
+        url = reverse('institution-detail', kwargs={'slug': institution.slug})
+        self.client.get(url)
+        institution_page_cache.cache.delete(
+            institution_page_cache.get_key(institution.slug, 'en')
+        )
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'common_contentplaceholder' in query['sql'] or
+            'cms_cmsplugin' in query['sql']
+        ])
+
+
+class InstitutionPageCacheTest(InstitutionDetailTestMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # data versions start again after flush of the previous test
+        caches[settings.PAGE_CACHE_ALIAS].clear()
+        institution_page_cache.invalidate()
+        self.create_categories(1, 1)
+        self.institution = self.create_institution('Institution', 1)
+        self.other = self.create_institution('Other', 1)
+        self.url = reverse(
+            'institution-detail', kwargs={'slug': self.institution.slug}
+        )
+
+    def get_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode('utf-8')
+
+    def test_hit_does_not_query_data(self):
+        self.get_page()
+        with CaptureQueriesContext(connection) as context:
+            self.get_page()
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'comparer_' in query['sql'] or 'common_' in query['sql']
+        ])
+
+    def test_invalidation(self):
+        self.assertNotIn('New policy', self.get_page())
+        InstitutionPolicy.objects.create(
+            score=self.institution.scores.first(), title='New policy',
+            link='https://example.com/'
+        )
+        self.assertIn('New policy', self.get_page())
+
+        self.institution.description = 'New description'
+        self.institution.save()
+        self.assertIn('New description', self.get_page())
+
+        criterion = PolicyCriterion.objects.first()
+        criterion.name = 'Renamed criterion'
+        criterion.save()
+        self.assertIn('Renamed criterion', self.get_page())
+
+    def test_changes_of_other_processes_are_noticed(self):
+        self.get_page()
+        # changes of other processes are seen only through data versions
+        Institution.objects.filter(pk=self.institution.pk).update(
+            description='New description'
+        )
+        DataVersion.objects.bump(
+            get_institution_version_key(self.institution.slug)
+        )
+        self.assertNotIn('New description', self.get_page())
+        institution_page_cache.invalidate()  # REVALIDATE_INTERVAL elapsed
+        self.assertIn('New description', self.get_page())
+
+    def test_pages_of_other_institutions_are_kept(self):
+        other_url = reverse(
+            'institution-detail', kwargs={'slug': self.other.slug}
+        )
+        self.client.get(other_url)
+        self.get_page()
+        for obj in (
+            self.institution.emails.first(),
+            self.institution.social_media_links.first(),
+            self.institution.scores.first(),
+            self.institution.scores.first().policies.first(),
+        ):
+            obj.save()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(other_url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([
+                query for query in context.captured_queries
+                if 'comparer_' in query['sql']
+            ], obj)
+            with CaptureQueriesContext(connection) as context:
+                self.get_page()
+            self.assertTrue([
+                query for query in context.captured_queries
+                if 'comparer_' in query['sql']
+            ], obj)
+
+    def test_shared_content_changes(self):
+        key = institution_page_cache.get_key(self.institution.slug, 'en')
+        StaticPlaceholder.objects.create(name='bottom_bar', code='bottom_bar')
+        self.assertNotEqual(
+            institution_page_cache.get_key(self.institution.slug, 'en'), key
+        )
+
+    def test_renamed_institution(self):
+        self.get_page()
+        self.institution.slug = 'renamed'
+        self.institution.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_headers_are_kept(self):
+        miss = self.client.get(self.url)
+        hit = self.client.get(self.url)
+        self.assertEqual(hit.content, miss.content)
+        hit_headers, miss_headers = dict(hit.items()), dict(miss.items())
+        for headers in (hit_headers, miss_headers):
+            headers.pop('Expires', None)  # time of the response
+        self.assertEqual(hit_headers, miss_headers)
+
+
+class SearchIndexTest(TransactionTestCase):
+
+    def setUp(self):
+        category = PolicyCategory.objects.create(
+            name='Category', slug='category', max_score=10
+        )
+        self.criterion = PolicyCriterion.objects.create(
+            category=category, name='Criterion'
+        )
+        self.university = Institution.objects.create(
+            name='Université de Lyon', region='Auvergne-Rhône-Alpes',
+            country='France'
+        )
+        self.institute = Institution.objects.create(
+            name='Climate Institute', country='Czechia'
+        )
+        self.score = InstitutionScore.objects.create(
+            institution=self.university, criterion=self.criterion, score=1
+        )
+        InstitutionPolicy.objects.create(
+            score=self.score, title='Climate plan', text='Net zero by 2030.'
+        )
+        search_index.rebuild()  # table is not flushed between tests
+        ranking_engine.invalidate()
+
+    def search(self, *terms):
+        return [pk for pk, _relevance in search_index.search(terms)]
+
+    def test_prefix_and_accent_insensitive_match(self):
+        for term in ('univ', 'UNIVERSITE', 'rhone', 'Lyo'):
+            self.assertEqual(self.search(term), [self.university.pk])
+        self.assertEqual(self.search('univ', 'czech'), [])
+        self.assertEqual(self.search('!'), [])
+
+    def test_name_match_is_more_relevant(self):
+        self.assertEqual(
+            self.search('climate'), [self.institute.pk, self.university.pk]
+        )
+
+    def test_incremental_update(self):
+        policy = InstitutionPolicy.objects.create(
+            score=self.score, title='Biodiversity', text='Urban gardens.'
+        )
+        self.assertEqual(self.search('garden'), [self.university.pk])
+        policy.delete()
+        self.assertEqual(self.search('garden'), [])
+
+        self.institute.name = 'Energy Institute'
+        self.institute.save()
+        self.assertEqual(self.search('energy'), [self.institute.pk])
+        self.institute.is_active = False
+        self.institute.save()
+        self.assertEqual(self.search('energy'), [])
+
+    def test_score_activation_updates_index(self):
+        self.score.is_active = False
+        self.score.save()
+        self.assertEqual(self.search('net zero'), [])
+        self.score.is_active = True
+        self.score.save()
+        self.assertEqual(self.search('net zero'), [self.university.pk])
+        self.score.delete()
+        self.assertEqual(self.search('net zero'), [])
+
+    def test_unsupported_database(self):
+        with mock.patch.dict('comparer.search.BACKENDS', clear=True):
+            self.assertFalse(search_index.is_available)
+            self.assertEqual(self.search('climate'), [])
+            with self.assertRaises(ImproperlyConfigured):
+                search_index.rebuild()
+
+    def test_institution_list_search(self):
+        response = self.client.get(
+            reverse('institution-list'), {'search': 'net zero'}
+        )
+        self.assertEqual(
+            [row['id'] for row in response.json()], [self.university.pk]
+        )
+        response = self.client.get(
+            reverse('institution-search'), {'search': 'clim'}
+        )
+        self.assertEqual(
+            [row['id'] for row in response.json()],
+            [self.institute.pk, self.university.pk]
+        )
+
+
+class InstitutionAutocompleteTest(TransactionTestCase):
+
+    def setUp(self):
+        category = PolicyCategory.objects.create(
+            name='Category', slug='category', max_score=10
+        )
+        criterion = PolicyCriterion.objects.create(
+            category=category, name='Criterion'
+        )
+        self.institutions = {}
+        for name, score in (
+            ('Université de Lyon', 3), ('University of Leeds', 8),
+            ('Lund University', 5), ('Uppsala Municipality', 1),
+        ):
+            institution = Institution.objects.create(name=name, country='EU')
+            InstitutionScore.objects.create(
+                institution=institution, criterion=criterion, score=score
+            )
+            self.institutions[name] = institution
+        # data versions start again after flush of the previous test
+        ranking_engine.invalidate()
+        autocomplete_index.invalidate()
+        self.url = reverse('institution-autocomplete')
+
+    def suggest(self, query, **params):
+        response = self.client.get(self.url, dict(params, q=query))
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_prefix_match_ordered_by_score(self):
+        self.assertEqual(self.suggest('univ'), [
+            'University of Leeds', 'Lund University', 'Université de Lyon'
+        ])
+        self.assertEqual(self.suggest('UNIVERSIT L'), [
+            'University of Leeds', 'Lund University', 'Université de Lyon'
+        ])
+        self.assertEqual(self.suggest('universite'), ['Université de Lyon'])
+        self.assertEqual(self.suggest('univ ly'), ['Université de Lyon'])
+        self.assertEqual(self.suggest('univ', limit=1), ['University of Leeds'])
+        self.assertEqual(self.suggest('xyz'), [])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_response_fields(self):
+        institution = self.institutions['Lund University']
+        response = self.client.get(self.url, {'q': 'lund'})
+        self.assertEqual(response.json(), [{
+            'id': institution.pk, 'name': institution.name,
+            'slug': institution.slug, 'score_total': 5
+        }])
+        response = self.client.get(self.url, {'q': 'lund', 'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_data_is_not_queried(self):
+        self.suggest('univ')
+        with CaptureQueriesContext(connection) as context:
+            self.suggest('uppsala')
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'comparer_' in query['sql'] or 'common_' in query['sql']
+        ])
+
+
+class CsvInstitutionImporterTest(TransactionTestCase):
+    header = (
+        'name;region;country;email;facebook;twitter;instagram;linkedin;'
+        'youtube;site'
+    )
+
+    def get_csv(self, rows):
+        lines = [self.header] + [
+            f'{name};{region};Czechia;{name[:3]}@a.cz;fb.com/{name};;;;;'
+            for name, region in rows
+        ]
+        return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+    def import_rows(self, rows, override_existing=False):
+        with CaptureQueriesContext(connection) as context:
+            instances = CsvInstitutionImporter().import_data(
+                self.get_csv(rows), override_existing=override_existing
+            )
+        return instances, len(context.captured_queries)
+
+    def test_import(self):
+        instances, _count = self.import_rows([
+            ('Brno', 'South Moravia'), ('Praha', 'Prague'), ('Praha.', 'Prague')
+        ])
+        self.assertEqual(len(instances), 3)
+        institution = Institution.objects.get(name='Brno')
+        self.assertEqual(institution.region_ref.name, 'South Moravia')
+        self.assertEqual(institution.country_ref.name, 'Czechia')
+        self.assertEqual(list(institution.emails.values_list(
+            'address', flat=True
+        )), ['Brn@a.cz'])
+        self.assertEqual(list(institution.social_media_links.values_list(
+            'url', flat=True
+        )), ['https://fb.com/Brno'])
+        self.assertEqual(
+            sorted(Institution.objects.values_list('slug', flat=True)),
+            ['brno', 'praha', 'praha-2']
+        )
+        self.assertTrue(InstitutionScoreSummary.objects.filter(
+            institution=institution
+        ).exists())
+
+        with self.assertRaises(CsvImportError):
+            self.import_rows([('Brno', 'South Moravia')])
+
+    def test_create_query_count_is_constant(self):
+        # regions and data versions are created by the first import
+        self.import_rows([(f'Warm {i}', f'Region {i}') for i in range(3)])
+        _instances, small_count = self.import_rows([
+            (f'Small {i}', f'Region {i % 3}') for i in range(10)
+        ])
+        # larger chunks are inserted in more batches on SQLite, which limits
+        # number of query parameters
+        _instances, large_count = self.import_rows([
+            (f'Large {i}', f'Region {i % 3}') for i in range(60)
+        ])
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(Institution.objects.filter(
+            slug__in=['small-1', 'large-59']
+        ).count(), 2)
+
+    def test_override_query_count_is_constant(self):
+        rows = [(f'Institution {i}', f'Region {i % 3}') for i in range(30)]
+        self.import_rows(rows)
+        _instances, small_count = self.import_rows(rows[:10], True)
+        _instances, large_count = self.import_rows([
+            (f'Institution {i}', f'Region {(i + 1) % 3}') for i in range(30)
+        ], True)
+        self.assertEqual(small_count, large_count)
+
+        institution = Institution.objects.get(name='Institution 1')
+        self.assertEqual(institution.region_ref.name, 'Region 2')
+        self.assertEqual(institution.emails.count(), 1)
+        self.assertEqual(institution.social_media_links.count(), 1)
+
+
+class CsvPolicyImporterTest(TransactionTestCase):
+    header = (
+        'institution name;criterion;policy;link of policy;text of policy;'
+        'comment;score'
+    )
+
+    def setUp(self):
+        category = PolicyCategory.objects.create(
+            name='Category', slug='category', max_score=10
+        )
+        for name in ('Criterion A', 'Criterion B'):
+            PolicyCriterion.objects.create(category=category, name=name)
+        for name in ('Brno', 'Praha'):
+            Institution.objects.create(name=name, country='Czechia')
+
+    def import_rows(self, rows):
+        lines = [self.header] + [
+            f'{institution};{criterion};Policy;example.com;Text;;1'
+            for institution, criterion in rows
+        ]
+        csv_file = io.BytesIO('\n'.join(lines).encode('utf-8'))
+        with CaptureQueriesContext(connection) as context:
+            CsvPolicyImporter().import_data(csv_file)
+        return context.captured_queries
+
+    def test_related_lookups_are_loaded_once(self):
+        queries = self.import_rows([
+            ('brno', 'criterion a'), ('PRAHA', 'Criterion B'),
+            ('Brno', 'CRITERION B'), ('praha', 'criterion a'),
+        ])
+        self.assertEqual(InstitutionPolicy.objects.count(), 4)
+        # iexact lookups would be compiled to LIKE
+        self.assertFalse([
+            query for query in queries if '"name" LIKE' in query['sql']
+        ])
+
+    def test_scores_are_merged(self):
+        rows = [
+            ('Brno', 'Criterion A'), ('brno', 'criterion a'),
+            ('Praha', 'Criterion A'), ('Brno', 'Criterion B'),
+        ]
+        self.import_rows(rows)
+        queries = self.import_rows(rows * 10)
+        self.assertEqual(InstitutionPolicy.objects.count(), 44)
+        self.assertEqual(InstitutionScore.objects.count(), 3)
+        score = InstitutionScore.objects.get(
+            institution__name='Brno', criterion__name='Criterion A'
+        )
+        self.assertEqual(score.score, 1)
+        self.assertEqual(score.policies.count(), 22)
+        self.assertFalse([
+            query for query in queries
+            if 'comparer_institutionscore' in query['sql'] and
+            query['sql'].startswith(('INSERT', 'UPDATE'))
+        ])
+        summary = InstitutionScoreSummary.objects.get(
+            institution=score.institution
+        )
+        self.assertEqual(summary.score_total, 2)
+
+    def test_lookup_errors(self):
+        with self.assertRaisesMessage(CsvImportError, 'does not exist'):
+            self.import_rows([('Ostrava', 'Criterion A')])
+        Institution.objects.create(name='BRNO', country='Czechia')
+        with self.assertRaisesMessage(CsvImportError, 'More than one'):
+            self.import_rows([('brno', 'Criterion A')])
+
+
+class CsvImportPlanTest(TestCase):
+    """
+    Compiled plans have to clean rows like columns looked up by name and
+    processed one by one.
+    """
+
+    @staticmethod
+    def clean_row_by_row(importer, header, row):
+        cleaned_data = {}
+        for i, (name, value) in enumerate(zip(header, row)):
+            column = importer.get_column_by_name(name)
+            if column is None:
+                continue
+            is_valid, error = column.is_valid(value)
+            if not is_valid:
+                return error
+            cleaned_data[column.name] = column.process_value(value)
+        return cleaned_data
+
+    def assert_plan_equivalent(self, importer_class, header, rows):
+        importer = importer_class()
+        importer.process_header(header)
+        self.assertEqual(
+            [column for stage in importer.plan.stages
+             for column in stage.columns],
+            sorted(importer.columns, key=lambda column: column.priority)
+        )
+        for row_index, row in enumerate(rows, start=1):
+            expected = self.clean_row_by_row(importer, header, row)
+            if isinstance(expected, dict):
+                self.assertEqual(importer.clean_row(row_index, row), expected)
+            else:
+                with self.assertRaisesMessage(CsvImportError, expected):
+                    importer.clean_row(row_index, row)
+
+    def test_institution_rows(self):
+        header = ['Country', 'unknown'] + INSTITUTION_HEADER[::-1]
+        rows = [
+            ['Czechia', 'x'] + row[::-1]
+            for row in get_institution_rows(20)
+        ]
+        rows[3][-1] = ' '  # name is required
+        rows[5] = rows[5][:6]  # short row
+        rows[7][4] = 'https://example.com '
+        self.assert_plan_equivalent(CsvInstitutionImporter, header, rows)
+
+    def test_policy_rows(self):
+        rows = get_policy_rows(20)
+        rows[2][-1] = 'x'  # score is not a number
+        rows[4][-1] = ''
+        rows[6][4] = '* list\n* of *items*'
+        self.assert_plan_equivalent(CsvPolicyImporter, POLICY_HEADER, rows)
+
+    def test_benchmark_rows_are_validated(self):
+        with self.assertRaisesMessage(CommandError, 'at least 1'):
+            call_command('benchmark_importer', rows=0)
+
+
+@override_settings(IMPORT_PROGRESS_CACHE_ALIAS='default')
+class ImportJobTest(TransactionTestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        user = User.objects.create_superuser('admin', 'admin@a.cz', 'pass')
+        self.client.force_login(user)
+
+    def upload_institutions(self, lines):
+        csv_file = SimpleUploadedFile('institutions.csv', '\n'.join(
+            [CsvInstitutionImporterTest.header] + lines
+        ).encode('utf-8'))
+        return self.client.post(reverse('admin:import-institutions-csv'), {
+            'csv_file': csv_file, 'delimiter': ';'
+        })
+
+    def run_worker(self):
+        call_command('run_import_worker', once=True, stdout=io.StringIO())
+
+    def test_import_is_queued(self):
+        response = self.upload_institutions([
+            'Brno;South Moravia;Czechia;;;;;;;',
+            'Praha;Prague;Czechia;;;;;;;',
+        ])
+        job = ImportJob.objects.get()
+        status_url = reverse('admin:comparer_importjob_status', args=[job.pk])
+        self.assertRedirects(response, status_url)
+        self.assertEqual(job.status, ImportJob.PENDING)
+        self.assertFalse(Institution.objects.exists())
+
+        self.run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.DONE)
+        self.assertEqual((job.rows_processed, job.rows_total), (2, 2))
+        self.assertEqual(Institution.objects.count(), 2)
+        self.assertIsNone(ImportJob.objects.claim_next())
+
+        response = self.client.get(status_url)
+        self.assertContains(response, job.message)
+        self.assertNotContains(response, 'http-equiv="refresh"')
+
+    def test_cached_pages_are_replaced(self):
+        self.upload_institutions(['Brno;South Moravia;Czechia;old@a.cz;;;;;;'])
+        self.run_worker()
+        caches[settings.PAGE_CACHE_ALIAS].clear()
+        institution_page_cache.invalidate()
+        url = reverse('institution-detail', kwargs={'slug': 'brno'})
+        user = User.objects.get()
+        self.client.logout()  # pages of staff users are not cached
+        self.assertContains(self.client.get(url), 'old@a.cz')
+
+        self.client.force_login(user)
+        csv_file = SimpleUploadedFile('institutions.csv', '\n'.join([
+            CsvInstitutionImporterTest.header,
+            'Brno;South Moravia;Czechia;new@a.cz;;;;;;'
+        ]).encode('utf-8'))
+        self.client.post(reverse('admin:import-institutions-csv'), {
+            'csv_file': csv_file, 'delimiter': ';', 'override_existing': True
+        })
+        # the worker runs in another process, its changes are seen only
+        # through data versions
+        with mock.patch.object(institution_page_cache, 'invalidate'):
+            self.run_worker()
+            self.client.logout()
+            self.assertContains(self.client.get(url), 'old@a.cz')
+        institution_page_cache.invalidate()  # REVALIDATE_INTERVAL elapsed
+        response = self.client.get(url)
+        self.assertContains(response, 'new@a.cz')
+        self.assertNotContains(response, 'old@a.cz')
+
+    def test_row_errors_are_collected(self):
+        self.upload_institutions([
+            'Brno;South Moravia;;;;;;;;',
+            'Praha;Prague;Czechia;;;;;;;',
+            'Ostrava;;Czechia;;;;;;;',
+        ])
+        self.run_worker()
+        job = ImportJob.objects.get()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertEqual(len(job.errors), 2)
+        self.assertFalse(Institution.objects.exists())
@@ -1,8 +1,16 @@
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.utils.translation import get_language
 from django.views.generic import DetailView
-from django.db import models
 
-from common.models import ContentPlaceholder
-from .models import Institution, PolicyCategory
+from cms.toolbar.utils import get_toolbar_from_request
+
+from .models import (
+    Institution, InstitutionEmail, InstitutionPolicy, InstitutionScore,
+    SocialMediaLink
+)
+from .page_cache import institution_page_cache
+from .registry import category_registry
 
 
 __all__ = ('InstitutionDetailView', )
@@ -10,47 +18,96 @@ __all__ = ('InstitutionDetailView', )
 
 class InstitutionDetailView(DetailView):
     model = Institution
-    queryset = Institution.objects.active().with_scores()
+    queryset = Institution.objects.active()
     context_object_name = 'institution'
     template_name = 'comparer/institution_detail.html'
 
+    def get(self, request, *args, **kwargs):
+        """
+        Serves the page from institution_page_cache (except for staff users
+        and CMS toolbar sessions) and caches rendered pages.
+        """
+        if not institution_page_cache.is_enabled(request):
+            return super().get(request, *args, **kwargs)
+
+        slug, language = kwargs['slug'], get_language()
+        toolbar = get_toolbar_from_request(request)
+        cached = institution_page_cache.get(slug, language)
+        if cached is not None:
+            content, headers, cache_disabled = cached
+            response = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            # ToolbarMiddleware adds no-cache headers like for rendered page
+            toolbar._cache_disabled = cache_disabled
+            return response
+
+        response = super().get(request, *args, **kwargs)
+        response.add_post_render_callback(
+            lambda r: institution_page_cache.set(
+                slug, language, r.content, dict(r.items()),
+                toolbar._cache_disabled
+            )
+        )
+        return response
+
+    def get_queryset(self):
+        """
+        Loads the institution with its active scores (with criterions and
+        active policies), e-mails and social media links, so the number
+        of queries does not depend on the number of categories or scores.
+        """
+        scores = InstitutionScore.objects.active().filter(
+            criterion__is_active=True,
+            criterion__category__is_active=True
+        ).select_related('criterion').prefetch_related(
+            Prefetch(
+                'policies', queryset=InstitutionPolicy.objects.active(),
+                to_attr='active_policies'
+            )
+        ).order_by('criterion__order', 'pk')
+
+        return super().get_queryset().with_scores().prefetch_related(
+            Prefetch('scores', queryset=scores, to_attr='active_scores'),
+            Prefetch(
+                'emails', queryset=InstitutionEmail.objects.active(),
+                to_attr='active_emails'
+            ),
+            Prefetch(
+                'social_media_links',
+                queryset=SocialMediaLink.objects.active(),
+                to_attr='active_social_media_links'
+            )
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        categories = [
-            {'instance': obj} for obj in PolicyCategory.objects.active()
-        ]
-        context['score_max'] = PolicyCategory.objects.active().aggregate(
-            models.Sum('max_score')
-        )['max_score__sum']
+
+        scores_by_category = {}
+        for score in self.object.active_scores:
+            scores_by_category.setdefault(
+                score.criterion.category_id, []
+            ).append(score)
+
+        context['score_max'] = category_registry.max_score
         context['score_current'] = self.object.score_total
         context['score_percentage'] = round(
             (context['score_current'] or 0) * 100 / context['score_max']
-        )
+        ) if context['score_max'] else 0
 
         # gathering additional data
-        for cat_dict in categories:
-            cat = cat_dict['instance']
-            cat_dict['score_max'] = cat.max_score
-            cat_dict['score_current'] = getattr(
-                self.object, f'score_{cat.slug}'
-            )
-
-            cat_dict['score_percentage'] = round(
-                (cat_dict['score_current'] or 0) * 100 / cat_dict['score_max']
-            ) if cat_dict['score_max'] else 0
-            cat_dict['scores'] = self.object.scores.active().filter(
-                criterion__category=cat
-            )
+        categories = []
+        for cat in category_registry.get_categories():
+            score_current = getattr(self.object, f'score_{cat.slug}')
+            categories.append({
+                'instance': cat,
+                'score_max': cat.max_score,
+                'score_current': score_current,
+                'score_percentage': round(
+                    (score_current or 0) * 100 / cat.max_score
+                ) if cat.max_score else 0,
+                'scores': scores_by_category.get(cat.id, []),
+            })
 
         context['categories'] = categories
-
-        context['placeholders'] = {}
-        for slug in [
-            'inst_detail_card_header_bg',
-            'inst_detail_policy_name_header',
-            'inst_detail_policy_text_header'
-        ]:
-            context['placeholders'][slug] = \
-                ContentPlaceholder.objects.get_or_create(slug=slug)[0]
-
         return context